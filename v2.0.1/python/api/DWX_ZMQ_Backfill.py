@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+    DWX_ZMQ_Backfill.py
+    --
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+import numpy as np
+from collections import deque
+from threading import Thread, Event
+
+from api.DWX_ZMQ_BarStore import DWX_ZMQ_BarBuffer
+from api.DWX_ZMQ_HistCache import _hist_bars_, _to_epoch_, _to_server_time_
+
+##############################################################################
+
+class DWX_ZMQ_Backfill():
+
+    """
+    Downloads the bars of a long date range as a series of HIST requests
+    for _chunk_bars bars each, instead of one enormous reply.
+
+    Up to _in_flight chunk requests are queued at the server at any time
+    (it answers them in order), chunks answered without data (or not
+    answered) are requested again up to _retries times, and the bars of
+    each chunk are appended to self._bars (a DWX_ZMQ_BarBuffer) as soon as
+    it arrives, e.g.:
+
+        _backfill = DWX_ZMQ_Backfill(_zmq, 'EURUSD', 1, '2015.01.01')
+        _backfill._start_()
+        ...
+        _backfill._bars.latest()    # bars received so far
+        _backfill._wait_()
+
+    Chunks are also merged into the connector's _hist_cache, if any, in
+    time order (so that an interrupted backfill resumes where it stopped).
+    The cached range never spans a failed window, so that it is fetched
+    again later.
+    _on_chunk(backfill, bars) is called from the backfill's thread after
+    every chunk. Windows still empty after all retries (e.g. weekends, or
+    before the start of the server's history) are listed in self._empty,
+    those never answered with their own bars (timeouts, replies to other
+    requests) in self._failed.
+
+    HIST replies only carry their request's id with correlation ids on
+    (_zmq._correlation_ids): without them, they are told apart by their
+    '_action' alone, so one chunk request is sent at a time.
+    """
+
+    def __init__(self,
+                 _zmq,                      # DWX_ZeroMQ_Connector
+                 _symbol='EURUSD',
+                 _timeframe=1,              # Minutes
+                 _start='2020.01.01 00:00:00',
+                 _end='2020.02.01 00:00:00',
+                 _chunk_bars=10000,         # Bars (at most) per HIST request
+                 _in_flight=4,              # Max. HIST requests queued at the server
+                 _retries=3,                # Max. retries of a chunk without data
+                 _timeout=30.0,             # Max. wait (s) for each reply
+                 _on_chunk=None):           # Callable(backfill, bars) after each chunk
+
+        self._zmq = _zmq
+        self._symbol = _symbol
+        self._timeframe = int(_timeframe)
+
+        # Without correlation ids, concurrent HIST requests may be resolved
+        # with each other's replies
+        if getattr(_zmq, '_correlation_ids', False):
+            self._in_flight = max(1, _in_flight)
+        else:
+            self._in_flight = 1
+
+        self._retries = _retries
+        self._timeout = _timeout
+        self._on_chunk = _on_chunk
+
+        self._start, self._end = _to_epoch_(_start), _to_epoch_(_end)
+
+        # [(FROM, TO)] inclusive, epoch seconds
+        _step = max(1, _chunk_bars) * 60 * self._timeframe
+        self._windows = [(_from, min(_from + _step - 1, self._end))
+                         for _from in range(self._start, self._end + 1, _step)]
+
+        self._bars = DWX_ZMQ_BarBuffer('{}_{}'.format(_symbol, self._timeframe))
+        self._empty = []
+        self._failed = []
+
+        # Chunk bars by window index (empty: no bars, None: failed), until
+        # merged into the cache in order
+        self._chunks = {}
+        self._cached = 0
+
+        # First window of the run of windows merged without failures
+        self._covered = 0
+
+        self._done = 0
+        self._stop = Event()
+        self._finished = Event()
+        self._thread = None
+
+    ##########################################################################
+
+    def _progress_(self):
+
+        """
+        Returns (WINDOWS_DONE, WINDOWS_TOTAL).
+        """
+
+        return self._done, len(self._windows)
+
+    ##########################################################################
+
+    def _start_(self):
+
+        """
+        Runs the backfill on a daemon thread, returns immediately.
+        """
+
+        self._thread = Thread(target=self._run_, name='DWX_ZMQ_Backfill')
+        self._thread.daemon = True
+        self._thread.start()
+
+        return self
+
+    ##########################################################################
+
+    def _wait_(self, _timeout=None):
+
+        """
+        Blocks until the backfill is done (or _timeout seconds), returns
+        True if it is.
+        """
+
+        return self._finished.wait(_timeout)
+
+    ##########################################################################
+
+    def _cancel_(self):
+
+        """
+        Stops sending chunk requests (those in flight are still received).
+        """
+
+        self._stop.set()
+
+    ##########################################################################
+
+    def _run_(self):
+
+        """
+        Runs the backfill on the calling thread, returns self._bars.
+        """
+
+        try:
+            _queue = deque((_index, 0) for _index in range(len(self._windows)))
+            _sent = deque()
+
+            while _queue or _sent:
+
+                # Keep the server busy with the next chunks
+                while _queue and len(_sent) < self._in_flight and not self._stop.is_set():
+
+                    _index, _attempt = _queue.popleft()
+                    _from, _to = self._windows[_index]
+
+                    _sent.append((_index, _attempt,
+                                  self._zmq._DWX_MTX_SEND_HIST_REQUEST_(self._symbol,
+                                                                        self._timeframe,
+                                                                        _to_server_time_(_from),
+                                                                        _to_server_time_(_to))))
+
+                if not _sent:
+                    break
+
+                _index, _attempt, _future = _sent.popleft()
+
+                _bars = self._receive_(_index, self._zmq._wait_response_(_future, self._timeout))
+
+                if _bars is not None and len(_bars) > 0:
+                    self._chunks[_index] = _bars
+
+                elif _attempt < self._retries:
+                    _queue.append((_index, _attempt + 1))
+                    continue
+
+                else:
+                    self._chunks[_index] = _bars
+
+                    if _bars is None:
+                        self._failed.append(self._windows[_index])
+                    else:
+                        self._empty.append(self._windows[_index])
+
+                self._done += 1
+                self._commit_()
+
+                if self._on_chunk is not None and _bars is not None and len(_bars) > 0:
+                    self._on_chunk(self, _bars)
+
+        finally:
+            self._finished.set()
+
+        return self._bars
+
+    ##########################################################################
+
+    def _receive_(self, _index, _response):
+
+        """
+        Returns the bars of a chunk's response (empty if the server has
+        none), None if it is not a reply to this chunk's request.
+        """
+
+        if not isinstance(_response, dict):
+            return None
+
+        # e.g. {'_action': 'HIST', '_response': 'NOT_AVAILABLE'}, but not
+        # {'_response': 'TRADE_CONTEXT_BUSY__ABORTED_COMMAND'}
+        if '_data' not in _response:
+            return _hist_bars_([]) if _response.get('_action') == 'HIST' else None
+
+        # e.g. 'EURUSD_M1'
+        if not str(_response.get('_symbol', '')).startswith(self._symbol + '_'):
+            return None
+
+        _bars = _hist_bars_(_response['_data'])
+
+        if len(_bars) == 0:
+            return _bars
+
+        self._bars._extend_(_bars)
+
+        # A late response to an earlier (timed out) request is kept, but
+        # does not count for this window
+        _from, _to = self._windows[_index]
+
+        if _bars['time'][0] < _from or _bars['time'][-1] > _to:
+            return None
+
+        return _bars
+
+    ##########################################################################
+
+    def _commit_(self):
+
+        """
+        Merges the chunks done since the last call, in window order, into 
+        the connector's HIST cache.
+        """
+
+        _bars = []
+
+        while self._cached in self._chunks:
+
+            _chunk = self._chunks.pop(self._cached)
+
+            # Failed window: the run before it is merged, the next one
+            # starts after it
+            if _chunk is None:
+                self._merge_(_bars, self._cached - 1)
+                _bars = []
+                self._covered = self._cached + 1
+
+            elif len(_chunk) > 0:
+                _bars.append(_chunk)
+
+            self._cached += 1
+
+        self._merge_(_bars, self._cached - 1)
+
+    ##########################################################################
+
+    def _merge_(self, _bars, _last):
+
+        _cache = getattr(self._zmq, '_hist_cache', None)
+
+        if _cache is None or not _bars:
+            return
+
+        # Windows are contiguous: everything from the run's first one is fetched
+        _cache._merge_(self._symbol, self._timeframe, np.concatenate(_bars),
+                       self._windows[self._covered][0], self._windows[_last][1])
+
+    ##########################################################################
+
+    def __repr__(self):
+        return 'DWX_ZMQ_Backfill({}, {}/{} chunks)'.format(self._bars._instrument,
+                                                           *self._progress_())
+
+##############################################################################
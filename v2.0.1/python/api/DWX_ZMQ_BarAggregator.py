@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+    DWX_ZMQ_BarAggregator.py
+    --
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+from time import time_ns
+from threading import Lock
+
+from api.DWX_ZMQ_BarStore import DWX_ZMQ_BarBuffer
+
+##############################################################################
+
+# Forming bar: [BUCKET, OPEN, HIGH, LOW, CLOSE, TICKS], BUCKET = time // period
+_BUCKET, _OPEN, _HIGH, _LOW, _CLOSE, _TICKS = range(6)
+
+##############################################################################
+
+class DWX_ZMQ_BarAggregator():
+
+    """
+    SUB data handler building OHLC bars from BID/ASK ticks as they arrive,
+    at several timeframes (seconds) per symbol, e.g.:
+
+        _bars = DWX_ZMQ_BarAggregator(_timeframes=(1, 5, 60),
+                                      _on_bar=print)
+        _zmq = DWX_ZeroMQ_Connector(_subdata_handlers=[_bars])
+        ...
+        _bars.bars('EURUSD', 5, 100)        # last 100 completed 5s bars
+
+    Bars are aligned to multiples of their timeframe since the epoch, on
+    the ticks' receive time (UTC), and built from BID, ASK or 'mid' prices.
+    tick_volume is the number of ticks; spread and real_volume are 0. A
+    bar is completed by the first tick of a later bar, or by _close_due_()
+    (e.g. from a strategy's timer); periods without ticks have no bar.
+    Ticks stamped in a bar already completed are dropped, never publishing
+    that bar twice.
+
+    Each tick costs a few comparisons per timeframe. Completed bars are
+    kept in a DWX_ZMQ_BarBuffer per symbol and timeframe (up to _max_bars)
+    and passed to subscribers as callback(SYMBOL, TIMEFRAME, BAR), with 
+    BAR = (TIME, OPEN, HIGH, LOW, CLOSE, TICKS), on the thread that 
+    delivered the tick.
+    """
+
+    def __init__(self,
+                 _timeframes=(1, 5, 60),    # Bar timeframes, in seconds
+                 _price='bid',              # 'bid', 'ask' or 'mid'
+                 _max_bars=10000,           # Completed bars kept per symbol and timeframe
+                 _on_bar=None):             # Callable(symbol, timeframe, bar) for completed bars
+
+        if _price not in ('bid', 'ask', 'mid'):
+            raise ValueError("_price must be 'bid', 'ask' or 'mid'")
+
+        self._timeframes = tuple(sorted(set(int(_tf) for _tf in _timeframes)))
+        self._periods = tuple(_tf * 10**9 for _tf in self._timeframes)
+        self._price = _price
+        self._max_bars = _max_bars
+
+        self._subscribers = [] if _on_bar is None else [_on_bar]
+
+        # {SYMBOL: [FORMING BAR or None, one per timeframe]}
+        self._forming = {}
+
+        # {SYMBOL: [BUCKET of the last bar completed by _close_due_() or
+        # None, one per timeframe]}
+        self._closed = {}
+
+        # {(SYMBOL, TIMEFRAME): DWX_ZMQ_BarBuffer} of completed bars
+        self._bars = {}
+
+        # Ticks (poller thread) vs. _close_due_() (strategy thread)
+        self._lock = Lock()
+
+    ##########################################################################
+
+    def _subscribe_(self, _callback):
+        self._subscribers.append(_callback)
+
+    ##########################################################################
+
+    def _unsubscribe_(self, _callback):
+        self._subscribers.remove(_callback)
+
+    ##########################################################################
+
+    def onSubDataBatch(self, _symbol, _times, _bids, _asks):
+
+        if self._price == 'bid':
+            _prices = _bids.tolist()
+        elif self._price == 'ask':
+            _prices = _asks.tolist()
+        else:
+            _prices = ((_bids + _asks) / 2).tolist()
+
+        _completed = []
+
+        with self._lock:
+
+            _forming = self._forming.get(_symbol)
+
+            if _forming is None:
+                _forming = self._forming[_symbol] = [None] * len(self._periods)
+                self._closed[_symbol] = [None] * len(self._periods)
+
+            _closed = self._closed[_symbol]
+
+            for _time, _price in zip(_times.tolist(), _prices):
+
+                for _i, _period in enumerate(self._periods):
+
+                    _bar = _forming[_i]
+                    _bucket = _time // _period
+
+                    # Same bar (or a tick stamped earlier, e.g. clock adjusted)
+                    if _bar is not None and _bucket <= _bar[_BUCKET]:
+                        if _price > _bar[_HIGH]:
+                            _bar[_HIGH] = _price
+                        elif _price < _bar[_LOW]:
+                            _bar[_LOW] = _price
+                        _bar[_CLOSE] = _price
+                        _bar[_TICKS] += 1
+                        continue
+
+                    if _bar is not None:
+                        _completed.append(self._complete_(_symbol, _i, _bar))
+
+                    # Late tick of a bar completed by _close_due_()
+                    elif _closed[_i] is not None and _bucket <= _closed[_i]:
+                        continue
+
+                    _forming[_i] = [_bucket, _price, _price, _price, _price, 1]
+
+        self._notify_(_symbol, _completed)
+
+    ##########################################################################
+
+    def _complete_(self, _symbol, _index, _bar):
+
+        _timeframe = self._timeframes[_index]
+        _key = (_symbol, _timeframe)
+
+        try:
+            _buffer = self._bars[_key]
+        except KeyError:
+            _buffer = self._bars[_key] = DWX_ZMQ_BarBuffer('{}_{}s'.format(_symbol, _timeframe),
+                                                           self._max_bars)
+
+        _completed = (_bar[_BUCKET] * _timeframe, _bar[_OPEN], _bar[_HIGH],
+                      _bar[_LOW], _bar[_CLOSE], _bar[_TICKS])
+
+        _buffer._append_(*_completed, 0, 0)
+
+        return _timeframe, _completed
+
+    ##########################################################################
+
+    def _notify_(self, _symbol, _completed):
+
+        for _timeframe, _bar in _completed:
+            for _callback in self._subscribers:
+                _callback(_symbol, _timeframe, _bar)
+
+    ##########################################################################
+
+    def _close_due_(self, _now=None):
+
+        """
+        Completes the forming bars whose period ended before _now (UTC
+        nanoseconds, default: now), without waiting for the next tick.
+        """
+
+        _now = time_ns() if _now is None else _now
+
+        for _symbol in list(self._forming):
+
+            _completed = []
+
+            with self._lock:
+
+                _forming = self._forming[_symbol]
+                _closed = self._closed[_symbol]
+
+                for _i, _period in enumerate(self._periods):
+
+                    _bar = _forming[_i]
+
+                    if _bar is not None and (_bar[_BUCKET] + 1) * _period <= _now:
+                        _completed.append(self._complete_(_symbol, _i, _bar))
+                        _forming[_i] = None
+                        _closed[_i] = _bar[_BUCKET]
+
+            self._notify_(_symbol, _completed)
+
+    ##########################################################################
+
+    def bars(self, _symbol, _timeframe, _n=None):
+
+        """
+        Returns a view over the last _n completed bars (BAR_DTYPE records,
+        time in epoch seconds), None if there are none yet.
+        """
+
+        _buffer = self._bars.get((_symbol, _timeframe))
+
+        return None if _buffer is None else _buffer.latest(_n)
+
+    ##########################################################################
+
+    def forming(self, _symbol, _timeframe):
+
+        """
+        Returns the bar being formed, (TIME, OPEN, HIGH, LOW, CLOSE, TICKS),
+        or None.
+        """
+
+        _forming = self._forming.get(_symbol)
+
+        if _forming is None:
+            return None
+
+        _bar = _forming[self._timeframes.index(_timeframe)]
+
+        if _bar is None:
+            return None
+
+        return (_bar[_BUCKET] * _timeframe,) + tuple(_bar[_OPEN:])
+
+    ##########################################################################
+
+    def as_dataframe(self, _symbol, _timeframe, _n=None):
+
+        _buffer = self._bars.get((_symbol, _timeframe))
+
+        return None if _buffer is None else _buffer.as_dataframe(_n)
+
+    ##########################################################################
+
+    def __repr__(self):
+        return 'DWX_ZMQ_BarAggregator({}s, {} symbols)'.format(
+            '/'.join(map(str, self._timeframes)), len(self._forming))
+
+##############################################################################
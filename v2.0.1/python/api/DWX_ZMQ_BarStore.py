@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+    DWX_ZMQ_BarStore.py
+    --
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+import numpy as np
+from pandas import DataFrame, to_datetime
+
+##############################################################################
+
+# One OHLC rate, as published by the server for TRACK_RATES instruments:
+# "INSTRUMENT TIME;OPEN;HIGH;LOW;CLOSE;TICKVOL;SPREAD;REALVOL"
+BAR_DTYPE = np.dtype([('time', np.int64),           # Bar open time (server time, seconds)
+                      ('open', np.float64),
+                      ('high', np.float64),
+                      ('low', np.float64),
+                      ('close', np.float64),
+                      ('tick_volume', np.int64),
+                      ('spread', np.int64),
+                      ('real_volume', np.int64)])
+
+##############################################################################
+
+class DWX_ZMQ_BarBuffer():
+
+    """
+    Typed, time-ordered OHLC bars for one instrument (e.g. EURUSD_M1).
+
+    Bars are deduplicated on their open time: a rate whose time already
+    exists replaces the stored bar (MetaTrader publishes the current bar
+    again while it is still forming). Lookups by time are binary searches.
+
+    If _max_bars is set, memory is bounded at 2 x _max_bars bars: once the
+    buffer is full the oldest bars are dropped, keeping the most recent
+    _max_bars. Views returned by latest() / range() are invalidated when
+    that happens, or when the buffer grows.
+    """
+
+    def __init__(self,
+                 _instrument='EURUSD_M1',
+                 _max_bars=None,            # Max. bars kept (None = unbounded)
+                 _capacity=1024):           # Initial allocation
+
+        self._instrument = _instrument
+        self._max_bars = _max_bars
+
+        if _max_bars is not None:
+            _capacity = 2 * _max_bars
+
+        self._data = np.zeros(_capacity, dtype=BAR_DTYPE)
+        self._count = 0
+
+    ##########################################################################
+
+    def __len__(self):
+        return self._count
+
+    ##########################################################################
+
+    def _times_(self):
+        return self._data['time'][:self._count]
+
+    ##########################################################################
+
+    def _reserve_(self, _n=1):
+
+        if self._count + _n <= len(self._data):
+            return
+
+        # Bounded: drop the oldest bars, keeping room for _n more.
+        if self._max_bars is not None and _n <= self._max_bars:
+            _keep = min(self._count, self._max_bars - _n)
+            self._data[:_keep] = self._data[self._count - _keep:self._count]
+            self._count = _keep
+            return
+
+        # Unbounded (or bulk insert larger than the bound): grow.
+        _data = np.zeros(max(2 * len(self._data), self._count + _n), dtype=BAR_DTYPE)
+        _data[:self._count] = self._data[:self._count]
+        self._data = _data
+
+    ##########################################################################
+
+    def _append_(self, _time, _open, _high, _low, _close,
+                 _tick_vol, _spread, _real_vol):
+
+        _bar = (_time, _open, _high, _low, _close, _tick_vol, _spread, _real_vol)
+        _n = self._count
+
+        # Most common cases first: a new bar, or an update of the last one.
+        if _n == 0 or _time > self._data['time'][_n - 1]:
+            self._reserve_()
+            self._data[self._count] = _bar
+            self._count += 1
+            return
+
+        _i = int(np.searchsorted(self._times_(), _time))
+
+        if self._data['time'][_i] == _time:
+            self._data[_i] = _bar
+            return
+
+        # Late bar: insert in place.
+        self._reserve_()
+        _n = self._count
+        _i = int(np.searchsorted(self._times_(), _time))
+        self._data[_i + 1:_n + 1] = self._data[_i:_n]
+        self._data[_i] = _bar
+        self._count += 1
+
+    ##########################################################################
+
+    def _extend_(self, _bars):
+
+        """
+        Merges an array of BAR_DTYPE records (in any order) into the buffer.
+        Incoming bars win over stored bars with the same time.
+        """
+
+        _bars = np.asarray(_bars, dtype=BAR_DTYPE)
+
+        if len(_bars) == 0:
+            return
+
+        _times = _bars['time']
+
+        # Most common case (e.g. HIST chunks arriving in order): sorted,
+        # unique bars, all newer than the stored ones. Append in place.
+        if ((self._count == 0 or _times[0] > self._data['time'][self._count - 1])
+            and (len(_bars) == 1 or bool(np.all(_times[1:] > _times[:-1])))):
+
+            if self._max_bars is not None:
+                _bars = _bars[-self._max_bars:]
+
+            self._reserve_(len(_bars))
+            self._data[self._count:self._count + len(_bars)] = _bars
+            self._count += len(_bars)
+            return
+
+        _merged = np.concatenate((self._data[:self._count], _bars))
+
+        # Stable sort keeps the incoming bar last among equal times, then
+        # keep the last occurrence of every time.
+        _merged = _merged[np.argsort(_merged['time'], kind='stable')]
+        _last = np.ones(len(_merged), dtype=bool)
+        _last[:-1] = _merged['time'][1:] != _merged['time'][:-1]
+        _merged = _merged[_last]
+
+        if self._max_bars is not None:
+            _merged = _merged[-self._max_bars:]
+
+        self._count = 0
+        self._reserve_(len(_merged))
+        self._data[:len(_merged)] = _merged
+        self._count = len(_merged)
+
+    ##########################################################################
+
+    def latest(self, _n=None):
+
+        """
+        Returns a view over the last _n bars (all bars if _n is None).
+        """
+
+        _n = self._count if _n is None else max(0, min(_n, self._count))
+
+        return self._data[self._count - _n:self._count]
+
+    ##########################################################################
+
+    def range(self, _start=None, _end=None):
+
+        """
+        Returns a view over the bars with _start <= time <= _end (epoch
+        seconds, either bound may be None).
+        """
+
+        _times = self._times_()
+
+        _i = 0 if _start is None else int(np.searchsorted(_times, _start, side='left'))
+        _j = self._count if _end is None else int(np.searchsorted(_times, _end, side='right'))
+
+        return self._data[_i:max(_i, _j)]
+
+    ##########################################################################
+
+    def as_dataframe(self, _n=None):
+
+        _bars = self.latest(_n)
+
+        return DataFrame(_bars[list(BAR_DTYPE.names[1:])],
+                         index=to_datetime(_bars['time'], unit='s'))
+
+    ##########################################################################
+
+    def __repr__(self):
+        return 'DWX_ZMQ_BarBuffer({}, {} bars)'.format(self._instrument, self._count)
+
+##############################################################################
+
+class DWX_ZMQ_BarStore(dict):
+
+    """
+    Market Rates DB: {INSTRUMENT: DWX_ZMQ_BarBuffer}
+    """
+
+    def __init__(self, _max_bars=None):
+
+        super().__init__()
+
+        self._max_bars = _max_bars
+
+    ##########################################################################
+
+    def _buffer_(self, _instrument):
+
+        try:
+            return self[_instrument]
+        except KeyError:
+            _buffer = self[_instrument] = DWX_ZMQ_BarBuffer(_instrument, self._max_bars)
+            return _buffer
+
+    ##########################################################################
+
+    def _append_(self, _instrument, *_bar):
+        self._buffer_(_instrument)._append_(*_bar)
+
+    ##########################################################################
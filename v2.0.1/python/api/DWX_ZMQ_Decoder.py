@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+    DWX_ZMQ_Decoder.py
+    --
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+import re
+import struct
+
+##############################################################################
+
+# Tokens of the single-quoted dict format emitted by the MQL4 server, e.g.
+# {'_action': 'OPEN_TRADES', '_trades': {12345: {'_magic': 123456, ...}}}
+#
+# The last alternative catches any other character, so that malformed
+# (or malicious) input is rejected instead of being silently skipped.
+_TOKEN_RE = re.compile(r"""\s*(?:
+                            '([^']*)'
+                           |(-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)
+                           |([{}\[\]:,])
+                           |(True|False|None)
+                           |(\S)
+                           )""", re.VERBOSE)
+
+# One bar of a HIST reply, exactly as built by DWX_GetHist() in the server.
+_HIST_BAR_RE = re.compile(r"\{'time':'([^']*)', "
+                          r"'open':(-?[\d.]+), "
+                          r"'high':(-?[\d.]+), "
+                          r"'low':(-?[\d.]+), "
+                          r"'close':(-?[\d.]+), "
+                          r"'tick_volume':(-?\d+), "
+                          r"'spread':(-?\d+), "
+                          r"'real_volume':(-?\d+)\}")
+
+_HIST_DATA_KEY = "'_data': ["
+
+_NAMES = {'True': True, 'False': False, 'None': None}
+
+# Payload of a binary SUB message (see SUB_FORMAT), after the topic frame:
+# little-endian BID, ASK (and TIME with PUBLISH_TICK_TIME) for ticks, and
+# BAR_DTYPE's layout for rates.
+SUB_TICK = struct.Struct('<2d')
+SUB_TICK_TIME = struct.Struct('<2dq')
+SUB_RATE = struct.Struct('<q4d3q')
+
+# '_action' of the reply sent by the server for each command. SUB_FORMAT
+# is left out: DWX_ZeroMQ_Server_v2.0.1_RC8.mq4 never replies to it.
+_REPLY_ACTIONS = {'OPEN': 'EXECUTION',
+                  'MODIFY': 'MODIFY',
+                  'CLOSE': 'CLOSE',
+                  'CLOSE_PARTIAL': 'CLOSE',
+                  'CLOSE_MAGIC': 'CLOSE_ALL_MAGIC',
+                  'CLOSE_ALL': 'CLOSE_ALL',
+                  'GET_OPEN_TRADES': 'OPEN_TRADES',
+                  'HIST': 'HIST',
+                  'TRACK_PRICES': 'TRACK_PRICES',
+                  'TRACK_RATES': 'TRACK_RATES',
+                  'HEARTBEAT': 'heartbeat'}
+
+# Replies of the commands the server may abort with an '_action'-less
+# {'_response': '..._ABORTED_COMMAND'} (CheckOpsStatus() in the EA)
+_ABORTABLE_ACTIONS = frozenset(_REPLY_ACTIONS[_command] for _command in
+                               ('OPEN', 'MODIFY', 'CLOSE', 'CLOSE_PARTIAL',
+                                'CLOSE_MAGIC', 'CLOSE_ALL', 'GET_OPEN_TRADES',
+                                'HIST', 'TRACK_PRICES', 'TRACK_RATES'))
+
+##############################################################################
+
+class DWX_ZMQ_Decoder():
+
+    """
+    Decoder for messages received through the PULL port.
+
+    Replaces eval() on the poller thread: nothing in the message is ever
+    executed, only literals (dicts, lists, strings, numbers, True/False/None)
+    are accepted, and HIST replies take a regex fast path that does not
+    tokenize each bar individually.
+    """
+
+    ##########################################################################
+
+    def _decode_(self, msg):
+
+        # HIST replies can hold tens of thousands of bars
+        if "'_action': 'HIST'" in msg[:64]:
+            _data = self._decode_hist_(msg)
+            if _data is not None:
+                return _data
+
+        return self._parse_(msg)
+
+    ##########################################################################
+
+    def _decode_hist_(self, msg):
+
+        _start = msg.find(_HIST_DATA_KEY)
+        _end = msg.rfind(']')
+
+        if _start < 0 or _end < _start:
+            return None
+
+        _body = msg[_start + len(_HIST_DATA_KEY):_end]
+        _bars = _HIST_BAR_RE.findall(_body)
+
+        # Every bar must have matched, otherwise use the generic parser.
+        if len(_bars) != _body.count('{'):
+            return None
+
+        # Parse the remaining (small) header, e.g. _action and _symbol.
+        _data = self._parse_(msg[:_start].rstrip(', ') + msg[_end + 1:])
+
+        _data['_data'] = [{'time': _time,
+                           'open': float(_open),
+                           'high': float(_high),
+                           'low': float(_low),
+                           'close': float(_close),
+                           'tick_volume': int(_tick_vol),
+                           'spread': int(_spread),
+                           'real_volume': int(_real_vol)}
+                          for _time, _open, _high, _low, _close,
+                              _tick_vol, _spread, _real_vol in _bars]
+
+        return _data
+
+    ##########################################################################
+
+    def _parse_(self, msg):
+
+        _tokens = _TOKEN_RE.findall(msg)
+
+        if len(_tokens) == 0:
+            raise ValueError('Empty message')
+
+        try:
+            _value, _pos = self._parse_value_(_tokens, 0)
+        except IndexError:
+            raise ValueError('Unexpected end of message')
+
+        if _pos != len(_tokens):
+            raise ValueError('Unexpected data after position {}'.format(_pos))
+
+        return _value
+
+    ##########################################################################
+
+    def _parse_value_(self, _tokens, _pos):
+
+        _str, _num, _punct, _name, _err = _tokens[_pos]
+
+        # Strings are matched with their quotes, so an empty _str is valid.
+        if _punct == '' and _num == '' and _name == '' and _err == '':
+            return _str, _pos + 1
+
+        if _num:
+            if '.' in _num or 'e' in _num or 'E' in _num:
+                return float(_num), _pos + 1
+            return int(_num), _pos + 1
+
+        if _name:
+            return _NAMES[_name], _pos + 1
+
+        if _punct == '{':
+            return self._parse_dict_(_tokens, _pos + 1)
+
+        if _punct == '[':
+            return self._parse_list_(_tokens, _pos + 1)
+
+        raise ValueError('Unexpected token {!r} at position {}'.format(_punct or _err, _pos))
+
+    ##########################################################################
+
+    def _parse_dict_(self, _tokens, _pos):
+
+        _dict = {}
+
+        while True:
+
+            if _tokens[_pos][2] == '}':
+                return _dict, _pos + 1
+
+            _key, _pos = self._parse_value_(_tokens, _pos)
+
+            if _tokens[_pos][2] != ':':
+                raise ValueError('Expected \':\' at position {}'.format(_pos))
+
+            _dict[_key], _pos = self._parse_value_(_tokens, _pos + 1)
+
+            # Trailing commas are accepted, as they are by eval()
+            _punct = _tokens[_pos][2]
+            if _punct == ',':
+                _pos += 1
+            elif _punct != '}':
+                raise ValueError('Expected \',\' or \'}}\' at position {}'.format(_pos))
+
+    ##########################################################################
+
+    def _parse_list_(self, _tokens, _pos):
+
+        _list = []
+
+        while True:
+
+            if _tokens[_pos][2] == ']':
+                return _list, _pos + 1
+
+            _value, _pos = self._parse_value_(_tokens, _pos)
+            _list.append(_value)
+
+            _punct = _tokens[_pos][2]
+            if _punct == ',':
+                _pos += 1
+            elif _punct != ']':
+                raise ValueError('Expected \',\' or \']\' at position {}'.format(_pos))
+
+    ##########################################################################
+
+    def _decode_sub_(self, msg, _delimiter=';'):
+
+        """
+        Splits a SUB message into (topic, values):
+
+            "EURUSD 1.10234;1.10236"         -> ('EURUSD', (BID, ASK))
+            "EURUSD 1.10234;1.10236;TIME"    -> ('EURUSD', (BID, ASK, TIME))
+            "EURUSD_M1 TIME;OPEN;...;REALVOL" -> ('EURUSD_M1', (TIME, OPEN, ..., REALVOL))
+
+        Returns (topic, None) for any other payload.
+        """
+
+        _topic, _payload = msg.split(' ', 1)
+        _fields = _payload.split(_delimiter)
+
+        if len(_fields) == 2:
+            return _topic, (float(_fields[0]), float(_fields[1]))
+
+        if len(_fields) == 3:
+            return _topic, (float(_fields[0]), float(_fields[1]), int(_fields[2]))
+
+        if len(_fields) == 8:
+            return _topic, (int(_fields[0]), float(_fields[1]), float(_fields[2]),
+                            float(_fields[3]), float(_fields[4]), int(_fields[5]),
+                            int(_fields[6]), int(_fields[7]))
+
+        return _topic, None
+
+    ##########################################################################
+
+    def _decode_sub_binary_(self, _topic, _payload):
+
+        """
+        Same as _decode_sub_() for a binary SUB message, received as two
+        frames: [b'EURUSD', SUB_TICK] or [b'EURUSD_M1', SUB_RATE]. _topic
+        may already be decoded (str), _payload may be any buffer (e.g. a
+        memoryview over a ZeroMQ frame).
+        """
+
+        if not isinstance(_topic, str):
+            _topic = _topic.decode('ascii')
+
+        if len(_payload) == SUB_TICK.size:
+            return _topic, SUB_TICK.unpack(_payload)
+
+        if len(_payload) == SUB_TICK_TIME.size:
+            return _topic, SUB_TICK_TIME.unpack(_payload)
+
+        if len(_payload) == SUB_RATE.size:
+            return _topic, SUB_RATE.unpack(_payload)
+
+        return _topic, None
+
+    ##########################################################################
+
+    def _encode_sub_(self, _topic, _values, _delimiter=';'):
+
+        """
+        Inverse of _decode_sub_(), e.g. for SUB handlers expecting text
+        when the server publishes in binary.
+        """
+
+        return _topic + ' ' + _delimiter.join(map(str, _values))
+
+    ##########################################################################
+
+    def _reply_action_(self, msg, _delimiter=';'):
+
+        """
+        Returns the '_action' of the reply the server will send for the
+        command msg (e.g. 'TRADE;OPEN;...' -> 'EXECUTION'), or None if the
+        server does not reply to it.
+        """
+
+        _command = msg.split(_delimiter, 2)
+
+        if _command[0] == 'TRADE' and len(_command) > 1:
+            return _REPLY_ACTIONS.get(_command[1])
+
+        return _REPLY_ACTIONS.get(_command[0])
+
+    ##########################################################################
@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+"""
+    DWX_ZMQ_Dispatcher.py
+    --
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import count
+from threading import Lock, RLock, Condition
+from time import time_ns
+
+##############################################################################
+
+# What to do with a new message when a handler's queue is full
+POLICIES = ('drop_oldest',     # Discard the oldest queued message
+            'conflate',        # Keep only the latest SUB message per symbol
+            'block')           # Wait for room (holds up the poller thread!)
+
+# Handler callbacks that can be dispatched
+_CALLBACKS = ('onPullData', 'onSubData', 'onSubDataBatch')
+
+##############################################################################
+
+class DWX_ZMQ_HandlerQueue():
+
+    """
+    Bounded queue of calls for one PULL / SUB handler.
+
+    Stands in for the handler in the connector's handler lists: it exposes
+    the same callbacks as the handler, but they only queue the call and
+    return. Queued calls are run on the dispatcher's workers, one at a time
+    and in order, so a handler never runs concurrently with itself.
+
+    With the 'conflate' policy, a queued SUB message is replaced by a newer
+    one for the same symbol (it keeps its place in the queue). PULL replies
+    are never conflated.
+
+    The handler is only weakly referenced (if it can be): the queue does
+    not keep it alive once the connector's lists drop it.
+    """
+
+    def __init__(self,
+                 _handler,
+                 _executor,
+                 _queue_size=10000,         # Max. queued calls
+                 _policy='drop_oldest',     # One of POLICIES
+                 _batch=100):               # Max. calls run before yielding the worker
+
+        if _policy not in POLICIES:
+            raise ValueError('_policy must be one of {}'.format(POLICIES))
+
+        try:
+            self._ref = weakref.ref(_handler)
+        except TypeError:
+            self._ref = lambda: _handler
+
+        self._executor = _executor
+        self._queue_size = _queue_size
+        self._policy = _policy
+        self._batch = _batch
+
+        # Queued calls: {KEY: (ENQUEUED_NS, CALLBACK, ARGS)}
+        self._calls = OrderedDict()
+        self._keys = count()
+        self._lock = Lock()
+        self._not_full = Condition(self._lock)
+        self._scheduled = False
+        self._closed = False
+
+        # Metrics
+        self._received = 0
+        self._processed = 0
+        self._dropped = 0
+        self._errors = 0
+        self._max_queued = 0
+        self._lag_last = 0
+        self._lag_max = 0
+        self._lag_total = 0
+
+        for _callback in _CALLBACKS:
+            if hasattr(_handler, _callback):
+                setattr(self, _callback, partial(self._put_, _callback))
+
+    ##########################################################################
+
+    @property
+    def _handler(self):
+        return self._ref()
+
+    ##########################################################################
+
+    def _put_(self, _callback, *_args):
+
+        if _callback == 'onSubDataBatch':
+            # The arrays are views over a ring buffer that keeps moving
+            _args = (_args[0],) + tuple(_array.copy() for _array in _args[1:])
+
+        if self._policy == 'conflate' and _callback == 'onSubData':
+            _key = (_callback, _args[0].split(' ', 1)[0])
+        elif self._policy == 'conflate' and _callback == 'onSubDataBatch':
+            _key = (_callback, _args[0])
+        else:
+            _key = next(self._keys)
+
+        _submit = False
+
+        with self._lock:
+
+            self._received += 1
+
+            if _key in self._calls:
+                self._dropped += 1
+
+            elif len(self._calls) >= self._queue_size:
+
+                if self._policy == 'block':
+                    while len(self._calls) >= self._queue_size and not self._closed:
+                        self._not_full.wait()
+                else:
+                    self._calls.popitem(last=False)
+                    self._dropped += 1
+
+            if self._closed:
+                return
+
+            self._calls[_key] = (time_ns(), _callback, _args)
+            self._max_queued = max(self._max_queued, len(self._calls))
+
+            if not self._scheduled:
+                self._scheduled = _submit = True
+
+        if _submit:
+            self._submit_()
+
+    ##########################################################################
+
+    def _submit_(self):
+
+        try:
+            self._executor.submit(self._run_)
+        except RuntimeError:
+            # Executor shut down
+            with self._lock:
+                self._scheduled = False
+
+    ##########################################################################
+
+    def _run_(self):
+
+        for _ in range(self._batch):
+
+            with self._lock:
+
+                if len(self._calls) == 0 or self._closed:
+                    self._scheduled = False
+                    return
+
+                _key, (_enqueued, _callback, _args) = self._calls.popitem(last=False)
+                self._not_full.notify()
+
+            _lag = time_ns() - _enqueued
+            self._lag_last = _lag
+            self._lag_max = max(self._lag_max, _lag)
+            self._lag_total += _lag
+
+            _handler = self._handler
+
+            # Garbage collected since the call was queued
+            if _handler is None:
+                self._dropped += 1
+                continue
+
+            try:
+                getattr(_handler, _callback)(*_args)
+            except Exception as ex:
+                self._errors += 1
+                _exstr = "Exception Type {0}. Args:\n{1!r}"
+                print(_exstr.format(type(ex).__name__, ex.args))
+
+            self._processed += 1
+
+        # Give other handlers a turn on this worker
+        self._submit_()
+
+    ##########################################################################
+
+    def _close_(self):
+
+        with self._lock:
+            self._closed = True
+            self._calls.clear()
+            self._not_full.notify_all()
+
+    ##########################################################################
+
+    def _metrics_(self):
+
+        """
+        Returns this handler's counters. Lags (ms) are measured from the
+        moment a call is queued to the moment the handler starts running it.
+        """
+
+        return {'queued': len(self._calls),
+                'max_queued': self._max_queued,
+                'received': self._received,
+                'processed': self._processed,
+                'dropped': self._dropped,
+                'errors': self._errors,
+                'lag_last_ms': self._lag_last / 1e6,
+                'lag_mean_ms': self._lag_total / max(1, self._processed) / 1e6,
+                'lag_max_ms': self._lag_max / 1e6}
+
+    ##########################################################################
+
+    def __repr__(self):
+        return 'DWX_ZMQ_HandlerQueue({}, {})'.format(type(self._handler).__name__,
+                                                     self._policy)
+
+    ##########################################################################
+
+    def _name_(self):
+        return type(self._handler).__name__
+
+##############################################################################
+
+class DWX_ZMQ_Dispatcher():
+
+    """
+    Runs PULL / SUB handlers on a pool of worker threads, so the connector's
+    poller thread only reads sockets and queues calls, e.g.:
+
+        _dispatcher = DWX_ZMQ_Dispatcher(_workers=4, _policy='conflate')
+
+        _zmq = DWX_ZeroMQ_Connector(_subdata_handlers=[_strategy],
+                                    _dispatcher=_dispatcher)
+
+    Handlers are wrapped when they are called, so those added to the
+    connector's lists later are dispatched too (unless their _inline
+    attribute is True). They can be given their own queue size and policy
+    by wrapping them first:
+
+        _zmq = DWX_ZeroMQ_Connector(_pulldata_handlers=[_dispatcher._wrap_(_logger, _policy='block')],
+                                    _dispatcher=_dispatcher)
+
+    A dispatcher may be shared by several connectors: shut it down after
+    all of them. One created by a connector (_dispatcher=True) is shut
+    down with it. A handler's queue (and metrics) goes away with the
+    handler, or with _unwrap_().
+
+    Handlers are ordinary (stateful, unpicklable) objects that share the
+    connector with the strategy, so they run in threads of this process.
+    """
+
+    def __init__(self,
+                 _workers=4,                # Worker threads
+                 _queue_size=10000,         # Default max. queued calls per handler
+                 _policy='drop_oldest'):    # Default overflow policy (see POLICIES)
+
+        if _policy not in POLICIES:
+            raise ValueError('_policy must be one of {}'.format(POLICIES))
+
+        self._executor = ThreadPoolExecutor(_workers,
+                                            thread_name_prefix='DWX_ZMQ_Dispatcher')
+        self._queue_size = _queue_size
+        self._policy = _policy
+
+        # {id(HANDLER): DWX_ZMQ_HandlerQueue}, removed when HANDLER is
+        # garbage collected (so its id cannot be inherited by a new one).
+        # Reentrant: collection may run _forget_() while it is held.
+        self._queues = {}
+        self._lock = RLock()
+
+    ##########################################################################
+
+    def _wrap_(self, _handler, _queue_size=None, _policy=None):
+
+        """
+        Returns the queue dispatching calls to _handler. A handler registered
+        for both PULL and SUB data gets a single queue, so its callbacks
+        never run concurrently. Handlers with _inline = True are returned
+        as they are.
+        """
+
+        if isinstance(_handler, DWX_ZMQ_HandlerQueue) or getattr(_handler, '_inline', False):
+            return _handler
+
+        # Called for every message: no lock once the queue exists
+        _queue = self._queues.get(id(_handler))
+
+        if _queue is not None and _queue._handler is _handler:
+            return _queue
+
+        with self._lock:
+
+            _queue = self._queues.get(id(_handler))
+
+            if _queue is not None and _queue._handler is _handler:
+                return _queue
+
+            _queue = DWX_ZMQ_HandlerQueue(_handler, self._executor,
+                                          self._queue_size if _queue_size is None else _queue_size,
+                                          self._policy if _policy is None else _policy)
+
+            self._queues[id(_handler)] = _queue
+
+            try:
+                weakref.finalize(_handler, self._forget_, id(_handler), _queue)
+            except TypeError:
+                pass # Not weakly referenceable: kept until _unwrap_()
+
+            return _queue
+
+    ##########################################################################
+
+    def _unwrap_(self, _handler):
+
+        """
+        Closes _handler's queue (discarding the calls still queued) and
+        forgets it. Returns the handler itself, e.g. to register it with
+        another connector. Remove it from the connector's handler lists
+        first, or it is wrapped again on the next message.
+        """
+
+        if isinstance(_handler, DWX_ZMQ_HandlerQueue):
+            _handler = _handler._handler
+
+        with self._lock:
+
+            _queue = self._queues.get(id(_handler))
+
+            if _queue is None or _queue._handler is not _handler:
+                return _handler
+
+            del self._queues[id(_handler)]
+
+        _queue._close_()
+
+        return _handler
+
+    ##########################################################################
+
+    def _forget_(self, _id, _queue):
+
+        # Only the collected handler's queue: the id may be reused already
+        with self._lock:
+            if self._queues.get(_id) is _queue:
+                del self._queues[_id]
+
+        _queue._close_()
+
+    ##########################################################################
+
+    def _metrics_(self):
+
+        """
+        Returns {HANDLER_NAME: metrics} for every dispatched handler (see
+        DWX_ZMQ_HandlerQueue._metrics_).
+        """
+
+        _metrics = {}
+
+        for _queue in list(self._queues.values()):
+
+            _name = _queue._name_()
+            _n = 1
+
+            while _name in _metrics:
+                _n += 1
+                _name = '{}#{}'.format(_queue._name_(), _n)
+
+            _metrics[_name] = _queue._metrics_()
+
+        return _metrics
+
+    ##########################################################################
+
+    def _shutdown_(self, _wait=True):
+
+        """
+        Discards queued calls and stops the workers, waiting for running
+        handlers to return if _wait is True.
+        """
+
+        for _queue in list(self._queues.values()):
+            _queue._close_()
+
+        self._executor.shutdown(wait=_wait)
+
+    ##########################################################################
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+    DWX_ZMQ_HistCache.py
+    --
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+import os
+import json
+import tempfile
+import numpy as np
+from threading import Lock
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+from pandas import DataFrame, Timestamp, to_datetime
+
+from api.DWX_ZMQ_BarStore import BAR_DTYPE
+
+##############################################################################
+
+def _to_epoch_(_time):
+
+    """
+    Server time ("YYYY.MM.DD HH:MM[:SS]", Timestamp or epoch seconds) to
+    epoch seconds.
+    """
+
+    if isinstance(_time, (int, np.integer)):
+        return int(_time)
+
+    if isinstance(_time, str):
+        _time = _time.strip().replace('.', '-')
+
+    return int(Timestamp(_time).value // 10**9)
+
+##############################################################################
+
+def _to_server_time_(_epoch):
+    return Timestamp(_epoch, unit='s').strftime('%Y.%m.%d %H:%M:%S')
+
+##############################################################################
+
+def _hist_bars_(_data):
+
+    """
+    '_data' of a decoded HIST reply ([{'time': 'YYYY.MM.DD HH:MM', 'open':
+    ..}, ..]) to an array of BAR_DTYPE records.
+    """
+
+    _bars = np.zeros(len(_data), dtype=BAR_DTYPE)
+
+    if len(_data) == 0:
+        return _bars
+
+    _times = np.array([_bar['time'] for _bar in _data])
+    _bars['time'] = np.char.replace(_times, '.', '-').astype('datetime64[s]').astype(np.int64)
+
+    for _name in BAR_DTYPE.names[1:]:
+        _bars[_name] = [_bar[_name] for _bar in _data]
+
+    return _bars
+
+##############################################################################
+
+class DWX_ZMQ_HistCache():
+
+    """
+    On-disk cache of HIST bars, one memory-mapped NumPy file per symbol and
+    timeframe (<_path>/<SYMBOL>_<TIMEFRAME>.npy, BAR_DTYPE records sorted
+    by time), plus a small JSON file with the range already fetched.
+
+    _missing_() returns the ranges a request still has to fetch from the
+    server: the part before the cached range, if any, and the tail from
+    the last cached bar (fetched again, as it may still have been forming
+    when cached). _merge_() writes fetched bars in, replacing cached bars
+    with the same time. Reads only map the part of the file they return.
+
+    Ranges the server had no bars for are not recorded, so that they are
+    requested again next time (MT4 often needs several HIST requests for
+    symbols without an open chart).
+
+    Merges hold an exclusive lock on <SYMBOL>_<TIMEFRAME>.lock, and files
+    are written to a temporary file of their own, then replaced atomically,
+    so one cache folder can be shared by several processes. Readers see
+    the bars file replaced before the range file, never a range claiming
+    bars the file does not hold yet.
+    """
+
+    def __init__(self, _path='hist_cache'):
+
+        self._path = _path
+        self._lock = Lock()
+
+        os.makedirs(_path, exist_ok=True)
+
+    ##########################################################################
+
+    def _file_(self, _symbol, _timeframe, _ext='.npy'):
+        return os.path.join(self._path, '{}_{}{}'.format(_symbol, int(_timeframe), _ext))
+
+    ##########################################################################
+
+    def _coverage_(self, _symbol, _timeframe):
+
+        """
+        Returns (START, END) fetched so far (epoch seconds), or None.
+        """
+
+        try:
+            with open(self._file_(_symbol, _timeframe, '.json')) as _file:
+                _coverage = json.load(_file)
+            return _coverage['start'], _coverage['end']
+
+        except (OSError, ValueError, KeyError):
+            return None
+
+    ##########################################################################
+
+    def _mmap_(self, _symbol, _timeframe):
+
+        try:
+            return np.load(self._file_(_symbol, _timeframe), mmap_mode='r')
+        except (OSError, ValueError):
+            return np.zeros(0, dtype=BAR_DTYPE)
+
+    ##########################################################################
+
+    def range(self, _symbol, _timeframe, _start=None, _end=None):
+
+        """
+        Returns a copy of the cached bars with _start <= time <= _end
+        (either bound may be None).
+        """
+
+        _bars = self._mmap_(_symbol, _timeframe)
+        _times = _bars['time']
+
+        _i = 0 if _start is None else int(np.searchsorted(_times, _to_epoch_(_start), side='left'))
+        _j = len(_bars) if _end is None else int(np.searchsorted(_times, _to_epoch_(_end), side='right'))
+
+        # Copy, so that the file is not kept open (and can be replaced)
+        return np.array(_bars[_i:max(_i, _j)])
+
+    ##########################################################################
+
+    def as_dataframe(self, _symbol, _timeframe, _start=None, _end=None):
+
+        _bars = self.range(_symbol, _timeframe, _start, _end)
+
+        return DataFrame(_bars[list(BAR_DTYPE.names[1:])],
+                         index=to_datetime(_bars['time'], unit='s'))
+
+    ##########################################################################
+
+    def _missing_(self, _symbol, _timeframe, _start, _end):
+
+        """
+        Returns [(START, END), ..] (epoch seconds) not cached yet, for a
+        request of bars from _start to _end.
+        """
+
+        _start, _end = _to_epoch_(_start), _to_epoch_(_end)
+        _coverage = self._coverage_(_symbol, _timeframe)
+
+        if _coverage is None or _end < _coverage[0] or _start > _coverage[1]:
+            return [(_start, _end)]
+
+        _times = self._mmap_(_symbol, _timeframe)['time']
+
+        # A range without its bars file (e.g. deleted): nothing is cached
+        if len(_times) == 0:
+            return [(_start, _end)]
+
+        _missing = []
+
+        # Before the cached range
+        if _start < _coverage[0]:
+            _missing.append((_start, _coverage[0]))
+
+        # The tail, from the last cached bar (it may have been incomplete)
+        if _end > _coverage[1]:
+            _missing.append((max(_start, min(int(_times[-1]), _coverage[1])), _end))
+
+        return _missing
+
+    ##########################################################################
+
+    def _merge_(self, _symbol, _timeframe, _bars, _start=None, _end=None):
+
+        """
+        Merges an array of BAR_DTYPE records, fetched for the range _start
+        to _end (epoch seconds, default: the range of _bars), into the 
+        cache. Incoming bars win over cached bars with the same time.
+        """
+
+        _bars = np.asarray(_bars, dtype=BAR_DTYPE)
+
+        if len(_bars) == 0:
+            return
+
+        with self._locked_(_symbol, _timeframe):
+
+            _cached = self._mmap_(_symbol, _timeframe)
+            _coverage = self._coverage_(_symbol, _timeframe) if len(_cached) > 0 else None
+            _merged = np.concatenate((_cached, _bars))
+
+            # Keep the last occurrence of every time (see DWX_ZMQ_BarBuffer._extend_)
+            _merged = _merged[np.argsort(_merged['time'], kind='stable')]
+            _last = np.ones(len(_merged), dtype=bool)
+            _last[:-1] = _merged['time'][1:] != _merged['time'][:-1]
+            _merged = _merged[_last]
+
+            self._replace_(self._file_(_symbol, _timeframe),
+                           lambda _out: np.save(_out, _merged))
+
+            _start = int(_bars['time'].min()) if _start is None else _to_epoch_(_start)
+            _end = int(_bars['time'].max()) if _end is None else _to_epoch_(_end)
+
+            # Nothing is known beyond the last bar (_end may be in the 
+            # future, or past the end of the server's history), which may 
+            # also still be forming: it is fetched again by later requests.
+            _end = min(_end, int(_merged['time'][-1]))
+
+            # Only one contiguous range is tracked: a disjoint one replaces it
+            if _coverage is not None and _start <= _coverage[1] and _end >= _coverage[0]:
+                _start, _end = min(_start, _coverage[0]), max(_end, _coverage[1])
+
+            _json = json.dumps({'start': int(_start), 'end': int(_end)})
+
+            self._replace_(self._file_(_symbol, _timeframe, '.json'),
+                           lambda _out: _out.write(_json.encode()))
+
+    ##########################################################################
+
+    def _replace_(self, _file, _write):
+
+        """
+        Calls _write(BINARY_FILE) on a new temporary file in the cache folder
+        (unique to this writer), then atomically replaces _file with it.
+        """
+
+        _fd, _tmp = tempfile.mkstemp(prefix=os.path.basename(_file) + '.',
+                                     suffix='.tmp', dir=self._path)
+
+        try:
+            with os.fdopen(_fd, 'wb') as _out:
+                _write(_out)
+            os.replace(_tmp, _file)
+
+        except BaseException:
+            os.remove(_tmp)
+            raise
+
+    ##########################################################################
+
+    @contextmanager
+    def _locked_(self, _symbol, _timeframe):
+
+        """
+        Holds this cache's lock and the exclusive lock of _symbol and
+        _timeframe's .lock file, shared by every process using the folder.
+        """
+
+        with self._lock, open(self._file_(_symbol, _timeframe, '.lock'), 'a+b') as _file:
+
+            if fcntl is not None:
+                fcntl.flock(_file.fileno(), fcntl.LOCK_EX)
+
+            else:
+                _file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(_file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        pass # Still locked after 10 attempts, try again
+
+            try:
+                yield
+
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    _file.seek(0)
+                    msvcrt.locking(_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    ##########################################################################
+
+    def _clear_(self, _symbol, _timeframe):
+
+        with self._locked_(_symbol, _timeframe):
+            # The range first, never left claiming removed bars
+            for _ext in ('.json', '.npy'):
+                try:
+                    os.remove(self._file_(_symbol, _timeframe, _ext))
+                except FileNotFoundError:
+                    pass
+
+    ##########################################################################
+
+    def __repr__(self):
+        return 'DWX_ZMQ_HistCache({})'.format(self._path)
+
+##############################################################################
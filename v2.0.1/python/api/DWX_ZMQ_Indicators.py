@@ -0,0 +1,736 @@
+# -*- coding: utf-8 -*-
+"""
+    DWX_ZMQ_Indicators.py
+    --
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+import numpy as np
+from math import fsum, sqrt
+from collections import deque
+from pandas import Series
+
+from api.DWX_ZMQ_BarStore import BAR_DTYPE
+from api.DWX_ZMQ_HistCache import _hist_bars_
+
+##############################################################################
+
+# Batches shorter than this are folded in one value at a time
+_VECTORIZE_MIN = 256
+
+##############################################################################
+
+class DWX_ZMQ_Indicator():
+
+    """
+    Streaming indicator: update() folds in one input in O(1) (amortized)
+    and returns the current value; extend() folds in arrays of inputs, with
+    a vectorized path for long ones (e.g. warm-up from HIST bars). Both
+    continue from the current state, so warm-up and live data can be mixed.
+
+    value is None until _period inputs have been seen (ready).
+
+    _input is what update() takes:
+
+        'price'         update(PRICE)
+        'bar'           update(HIGH, LOW, CLOSE)
+        'price_volume'  update(PRICE, VOLUME)
+        'quote'         update(BID, ASK)
+    """
+
+    _input = 'price'
+
+    def __init__(self, _period):
+
+        if int(_period) < 1:
+            raise ValueError('_period must be >= 1')
+
+        self._period = int(_period)
+        self._count = 0
+        self.value = None
+
+    ##########################################################################
+
+    @property
+    def ready(self):
+        return self._count >= self._period
+
+    ##########################################################################
+
+    def update(self, *_inputs):
+        raise NotImplementedError
+
+    ##########################################################################
+
+    def extend(self, *_arrays):
+
+        for _inputs in zip(*(np.asarray(_array, dtype=np.float64).tolist()
+                             for _array in _arrays)):
+            self.update(*_inputs)
+
+        return self.value
+
+    ##########################################################################
+
+    def __repr__(self):
+        return '{}({}) = {}'.format(type(self).__name__, self._period, self.value)
+
+##############################################################################
+
+class _RollingWindow():
+
+    """
+    Sum and sum of squares over the last _period values, kept as offsets
+    from a shift (the window mean, re-centred once per _period values) so
+    that neither drifts nor cancels out on prices far from zero.
+    """
+
+    def __init__(self, _period):
+
+        self._period = _period
+        self._window = [0.0] * _period
+        self._pos = 0
+        self._n = 0
+        self._shift = None
+        self._sum = 0.0
+        self._sumsq = 0.0
+
+    ##########################################################################
+
+    def _push_(self, _x):
+
+        if self._shift is None:
+            self._shift = _x
+
+        _d = _x - self._shift
+
+        if self._n == self._period:
+            _old = self._window[self._pos]
+            self._sum -= _old
+            self._sumsq -= _old * _old
+        else:
+            self._n += 1
+
+        self._window[self._pos] = _d
+        self._sum += _d
+        self._sumsq += _d * _d
+        self._pos += 1
+
+        # Window full: re-centre and re-sum exactly (O(_period), once per _period pushes)
+        if self._pos == self._period:
+            self._pos = 0
+            _mean = fsum(self._window) / self._period
+            self._load_([_v - _mean for _v in self._window], self._shift + _mean)
+
+    ##########################################################################
+
+    def _load_(self, _offsets, _shift):
+
+        self._window = _offsets
+        self._shift = _shift
+        self._n = len(_offsets)
+        self._sum = fsum(_offsets)
+        self._sumsq = fsum(_v * _v for _v in _offsets)
+
+    ##########################################################################
+
+    def _extend_(self, _values):
+
+        """
+        Folds in an array of values, vectorized when it fills the window.
+        """
+
+        if len(_values) < self._period:
+            for _x in _values.tolist():
+                self._push_(_x)
+            return
+
+        _last = _values[-self._period:]
+        _mean = float(_last.mean())
+        self._pos = 0
+        self._load_((_last - _mean).tolist(), _mean)
+
+    ##########################################################################
+
+    def _mean_(self):
+        return self._shift + self._sum / self._n
+
+    ##########################################################################
+
+    def _var_(self, _ddof=0):
+
+        if self._n <= _ddof:
+            return float('nan')
+
+        return max(self._sumsq - self._sum * self._sum / self._n, 0.0) / (self._n - _ddof)
+
+##############################################################################
+
+class EMA(DWX_ZMQ_Indicator):
+
+    """
+    Exponential moving average, alpha = 2 / (_period + 1), seeded with the
+    first value (pandas' ewm(span=_period, adjust=False)).
+    """
+
+    def __init__(self, _period, _alpha=None):
+
+        super().__init__(_period)
+
+        self._alpha = 2.0 / (self._period + 1) if _alpha is None else _alpha
+        self._ema = None
+
+    ##########################################################################
+
+    def update(self, _x):
+
+        if self._ema is None:
+            self._ema = _x
+        else:
+            self._ema += self._alpha * (_x - self._ema)
+
+        self._count += 1
+
+        if self._count >= self._period:
+            self.value = self._ema
+
+        return self.value
+
+    ##########################################################################
+
+    def extend(self, _values):
+
+        _values = np.asarray(_values, dtype=np.float64)
+
+        if len(_values) < _VECTORIZE_MIN:
+            return super().extend(_values)
+
+        if self._ema is not None:
+            _values = np.concatenate(([self._ema], _values))
+            self._count -= 1
+
+        self._ema = float(Series(_values).ewm(alpha=self._alpha, adjust=False).mean().iat[-1])
+        self._count += len(_values)
+
+        if self._count >= self._period:
+            self.value = self._ema
+
+        return self.value
+
+##############################################################################
+
+class SMA(DWX_ZMQ_Indicator):
+
+    """
+    Simple moving average over the last _period values.
+    """
+
+    def __init__(self, _period):
+
+        super().__init__(_period)
+
+        self._window = _RollingWindow(self._period)
+
+    ##########################################################################
+
+    def update(self, _x):
+
+        self._window._push_(_x)
+        self._count += 1
+
+        if self._count >= self._period:
+            self.value = self._window._mean_()
+
+        return self.value
+
+    ##########################################################################
+
+    def extend(self, _values):
+
+        _values = np.asarray(_values, dtype=np.float64)
+
+        self._window._extend_(_values)
+        self._count += len(_values)
+
+        if self._count >= self._period:
+            self.value = self._window._mean_()
+
+        return self.value
+
+##############################################################################
+
+class RollingStd(DWX_ZMQ_Indicator):
+
+    """
+    Standard deviation of the last _period values (_ddof=1: sample, as
+    pandas' rolling().std()).
+    """
+
+    def __init__(self, _period, _ddof=1):
+
+        super().__init__(_period)
+
+        self._ddof = _ddof
+        self._window = _RollingWindow(self._period)
+
+    ##########################################################################
+
+    def update(self, _x):
+
+        self._window._push_(_x)
+        self._count += 1
+
+        if self._count >= self._period:
+            self.value = sqrt(self._window._var_(self._ddof))
+
+        return self.value
+
+    ##########################################################################
+
+    def extend(self, _values):
+
+        _values = np.asarray(_values, dtype=np.float64)
+
+        self._window._extend_(_values)
+        self._count += len(_values)
+
+        if self._count >= self._period:
+            self.value = sqrt(self._window._var_(self._ddof))
+
+        return self.value
+
+##############################################################################
+
+class ATR(DWX_ZMQ_Indicator):
+
+    """
+    Average true range (Wilder): the mean of the first _period true ranges,
+    then smoothed with alpha = 1 / _period. The first bar's true range is
+    its HIGH - LOW.
+    """
+
+    _input = 'bar'
+
+    def __init__(self, _period):
+
+        super().__init__(_period)
+
+        self._close = None
+        self._atr = 0.0
+
+    ##########################################################################
+
+    def update(self, _high, _low, _close):
+
+        _tr = _high - _low
+
+        if self._close is not None:
+            _tr = max(_tr, abs(_high - self._close), abs(_low - self._close))
+
+        self._close = _close
+        self._count += 1
+
+        if self._count <= self._period:
+            self._atr += (_tr - self._atr) / self._count
+        else:
+            self._atr += (_tr - self._atr) / self._period
+
+        if self._count >= self._period:
+            self.value = self._atr
+
+        return self.value
+
+    ##########################################################################
+
+    def extend(self, _highs, _lows, _closes):
+
+        _highs = np.asarray(_highs, dtype=np.float64)
+        _lows = np.asarray(_lows, dtype=np.float64)
+        _closes = np.asarray(_closes, dtype=np.float64)
+
+        # Seed (first _period bars) and short batches one bar at a time
+        _seed = min(max(self._period - self._count, 0), len(_highs))
+
+        if len(_highs) - _seed < _VECTORIZE_MIN:
+            return super().extend(_highs, _lows, _closes)
+
+        super().extend(_highs[:_seed], _lows[:_seed], _closes[:_seed])
+
+        _highs, _lows, _closes = _highs[_seed:], _lows[_seed:], _closes[_seed:]
+        _previous = np.concatenate(([self._close], _closes[:-1]))
+
+        _tr = np.maximum(_highs - _lows,
+                         np.maximum(np.abs(_highs - _previous), np.abs(_lows - _previous)))
+
+        self._atr = float(Series(np.concatenate(([self._atr], _tr)))
+                          .ewm(alpha=1.0 / self._period, adjust=False).mean().iat[-1])
+        self._close = float(_closes[-1])
+        self._count += len(_tr)
+        self.value = self._atr
+
+        return self.value
+
+##############################################################################
+
+class VWAP(DWX_ZMQ_Indicator):
+
+    """
+    Volume weighted average price over the last _period inputs. Fed by
+    DWX_ZMQ_Indicators with each bar's typical price ((HIGH + LOW + CLOSE)
+    / 3) and tick volume, or with each tick's mid price and the seconds it
+    stood until the next tick (a time weighted mid).
+    """
+
+    _input = 'price_volume'
+
+    def __init__(self, _period):
+
+        super().__init__(_period)
+
+        self._pv = _RollingWindow(self._period)
+        self._volume = _RollingWindow(self._period)
+
+    ##########################################################################
+
+    def _value_(self):
+
+        _volume = self._volume._mean_()
+
+        return self._pv._mean_() / _volume if _volume > 0 else self.value
+
+    ##########################################################################
+
+    def update(self, _price, _volume):
+
+        self._pv._push_(_price * _volume)
+        self._volume._push_(_volume)
+        self._count += 1
+
+        if self._count >= self._period:
+            self.value = self._value_()
+
+        return self.value
+
+    ##########################################################################
+
+    def extend(self, _prices, _volumes):
+
+        _prices = np.asarray(_prices, dtype=np.float64)
+        _volumes = np.asarray(_volumes, dtype=np.float64)
+
+        self._pv._extend_(_prices * _volumes)
+        self._volume._extend_(_volumes)
+        self._count += len(_prices)
+
+        if self._count >= self._period:
+            self.value = self._value_()
+
+        return self.value
+
+##############################################################################
+
+class SpreadStats(DWX_ZMQ_Indicator):
+
+    """
+    Mean, standard deviation, min. and max. of the spread (ASK - BID) over
+    the last _period ticks (value = mean). min / max use monotonic queues.
+    """
+
+    _input = 'quote'
+
+    def __init__(self, _period):
+
+        super().__init__(_period)
+
+        self._window = _RollingWindow(self._period)
+        self._min = deque()    # (INDEX, SPREAD), increasing spreads
+        self._max = deque()    # (INDEX, SPREAD), decreasing spreads
+
+        self.last = None
+        self.std = None
+        self.min = None
+        self.max = None
+
+    ##########################################################################
+
+    def update(self, _bid, _ask):
+
+        _spread = _ask - _bid
+        _index = self._count
+        _expired = _index - self._period
+
+        self._window._push_(_spread)
+
+        while self._min and self._min[-1][1] >= _spread:
+            self._min.pop()
+        while self._max and self._max[-1][1] <= _spread:
+            self._max.pop()
+
+        self._min.append((_index, _spread))
+        self._max.append((_index, _spread))
+
+        if self._min[0][0] <= _expired:
+            self._min.popleft()
+        if self._max[0][0] <= _expired:
+            self._max.popleft()
+
+        self._count += 1
+        self.last = _spread
+
+        if self._count >= self._period:
+            self._publish_()
+
+        return self.value
+
+    ##########################################################################
+
+    def extend(self, _bids, _asks):
+
+        _spreads = np.asarray(_asks, dtype=np.float64) - np.asarray(_bids, dtype=np.float64)
+
+        if len(_spreads) < max(self._period, _VECTORIZE_MIN):
+            return super().extend(_bids, _asks)
+
+        _last = _spreads[-self._period:]
+        _start = self._count + len(_spreads) - self._period
+
+        self._window._extend_(_spreads)
+        self._min.clear()
+        self._max.clear()
+
+        for _index, _spread in enumerate(_last.tolist(), _start):
+
+            while self._min and self._min[-1][1] >= _spread:
+                self._min.pop()
+            while self._max and self._max[-1][1] <= _spread:
+                self._max.pop()
+
+            self._min.append((_index, _spread))
+            self._max.append((_index, _spread))
+
+        self._count += len(_spreads)
+        self.last = float(_spreads[-1])
+        self._publish_()
+
+        return self.value
+
+    ##########################################################################
+
+    def _publish_(self):
+
+        self.value = self._window._mean_()
+        self.std = sqrt(self._window._var_(1)) if self._period > 1 else 0.0
+        self.min = self._min[0][1]
+        self.max = self._max[0][1]
+
+##############################################################################
+
+class DWX_ZMQ_Indicators():
+
+    """
+    Keeps indicators up to date from the connector's SUB feed (as a SUB
+    data handler) and from completed bars (as a DWX_ZMQ_BarAggregator
+    subscriber), e.g.:
+
+        _ind = DWX_ZMQ_Indicators()
+        _ind._add_('EURUSD', 'ema', EMA(50))                # every tick (mid)
+        _ind._add_('EURUSD', 'spread', SpreadStats(500))
+        _ind._add_('EURUSD', 'atr', ATR(14), _timeframe=60) # 1 min bars
+
+        _bars = DWX_ZMQ_BarAggregator(_timeframes=(60,))
+        _bars._subscribe_(_ind.onBar)
+
+        _zmq = DWX_ZeroMQ_Connector(_subdata_handlers=[_bars, _ind])
+
+        # Warm up from a HIST reply (M1 bars)
+        _ind._warmup_('EURUSD', _zmq._History_DB['EURUSD_M1'], _timeframe=60)
+        ...
+        _ind.value('EURUSD', 'atr')
+
+    Tick indicators take _price (bid, ask or mid) prices, VWAP a time
+    weighted mid and SpreadStats both. Bar indicators take CLOSE prices,
+    (HIGH, LOW, CLOSE) or (typical price, TICKS). Indicators are updated on
+    the thread that delivers ticks / bars; reading value from another
+    thread is safe.
+    """
+
+    def __init__(self, _price='mid'):
+
+        if _price not in ('bid', 'ask', 'mid'):
+            raise ValueError("_price must be 'bid', 'ask' or 'mid'")
+
+        self._price = _price
+
+        # {SYMBOL: [INDICATOR, ...]} fed every tick
+        self._tick_indicators = {}
+
+        # {(SYMBOL, TIMEFRAME): [INDICATOR, ...]} fed completed bars
+        self._bar_indicators = {}
+
+        # {SYMBOL: {NAME: INDICATOR}}
+        self._indicators = {}
+
+        # {SYMBOL: (TIMESTAMP_NS, MID)} of the last tick, for time weights
+        self._last_mid = {}
+
+    ##########################################################################
+
+    def _add_(self, _symbol, _name, _indicator, _timeframe=None):
+
+        """
+        Registers _indicator as _name for _symbol, fed every tick
+        (_timeframe=None) or every completed bar of _timeframe seconds.
+        """
+
+        if _timeframe is not None and _indicator._input == 'quote':
+            raise ValueError('{} needs ticks (BID, ASK), not bars'.format(type(_indicator).__name__))
+
+        self._indicators.setdefault(_symbol, {})[_name] = _indicator
+
+        if _timeframe is None:
+            self._tick_indicators.setdefault(_symbol, []).append(_indicator)
+        else:
+            self._bar_indicators.setdefault((_symbol, _timeframe), []).append(_indicator)
+
+        return _indicator
+
+    ##########################################################################
+
+    def __getitem__(self, _key):
+
+        _symbol, _name = _key
+
+        return self._indicators[_symbol][_name]
+
+    ##########################################################################
+
+    def value(self, _symbol, _name):
+        return self._indicators[_symbol][_name].value
+
+    ##########################################################################
+
+    def onSubDataBatch(self, _symbol, _times, _bids, _asks):
+
+        _indicators = self._tick_indicators.get(_symbol)
+
+        if _indicators is None:
+            return
+
+        if self._price == 'bid':
+            _prices = _bids
+        elif self._price == 'ask':
+            _prices = _asks
+        else:
+            _prices = (_bids + _asks) / 2
+
+        _weighted = None
+
+        for _indicator in _indicators:
+
+            if _indicator._input == 'price':
+                _indicator.extend(_prices)
+
+            elif _indicator._input == 'quote':
+                _indicator.extend(_bids, _asks)
+
+            elif _indicator._input == 'price_volume':
+
+                if _weighted is None:
+                    _weighted = self._time_weighted_(_symbol, _times, (_bids + _asks) / 2)
+
+                _indicator.extend(*_weighted)
+
+            else:
+                _indicator.extend(_prices, _prices, _prices)
+
+        if _weighted is None:
+            self._last_mid[_symbol] = (int(_times[-1]), float(_bids[-1] + _asks[-1]) / 2)
+
+    ##########################################################################
+
+    def _time_weighted_(self, _symbol, _times, _mids):
+
+        """
+        (MID, SECONDS) of every quote that was replaced in this batch.
+        """
+
+        _last = self._last_mid.get(_symbol)
+        self._last_mid[_symbol] = (int(_times[-1]), float(_mids[-1]))
+
+        if _last is not None:
+            _times = np.concatenate(([_last[0]], _times))
+            _mids = np.concatenate(([_last[1]], _mids))
+
+        return _mids[:-1], np.diff(_times) / 1e9
+
+    ##########################################################################
+
+    def onBar(self, _symbol, _timeframe, _bar):
+
+        """
+        DWX_ZMQ_BarAggregator callback: _bar = (TIME, OPEN, HIGH, LOW,
+        CLOSE, TICKS).
+        """
+
+        _indicators = self._bar_indicators.get((_symbol, _timeframe))
+
+        if _indicators is None:
+            return
+
+        _time, _open, _high, _low, _close, _ticks = _bar
+
+        for _indicator in _indicators:
+
+            if _indicator._input == 'price':
+                _indicator.update(_close)
+            elif _indicator._input == 'bar':
+                _indicator.update(_high, _low, _close)
+            else:
+                _indicator.update((_high + _low + _close) / 3, _ticks)
+
+    ##########################################################################
+
+    def _warmup_(self, _symbol, _bars, _timeframe=None):
+
+        """
+        Feeds bars (BAR_DTYPE records, or the '_data' of a HIST reply, as
+        kept in _History_DB) to the indicators registered for _symbol and
+        _timeframe, vectorized. Tick indicators (_timeframe=None) are warmed
+        up with CLOSE prices; SpreadStats is not (bars carry no BID / ASK).
+        """
+
+        if not isinstance(_bars, np.ndarray) or _bars.dtype != BAR_DTYPE:
+            _bars = _hist_bars_(_bars)
+
+        if _timeframe is None:
+            _indicators = self._tick_indicators.get(_symbol, [])
+        else:
+            _indicators = self._bar_indicators.get((_symbol, _timeframe), [])
+
+        _highs, _lows, _closes = _bars['high'], _bars['low'], _bars['close']
+
+        for _indicator in _indicators:
+
+            if _indicator._input == 'price':
+                _indicator.extend(_closes)
+            elif _indicator._input == 'bar':
+                _indicator.extend(_highs, _lows, _closes)
+            elif _indicator._input == 'price_volume':
+                _indicator.extend((_highs + _lows + _closes) / 3, _bars['tick_volume'])
+
+    ##########################################################################
+
+    def __repr__(self):
+        return 'DWX_ZMQ_Indicators({})'.format(
+            {_symbol: {_name: _indicator.value for _name, _indicator in _named.items()}
+             for _symbol, _named in self._indicators.items()})
+
+##############################################################################
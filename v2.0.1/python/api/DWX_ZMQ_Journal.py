@@ -0,0 +1,543 @@
+# -*- coding: utf-8 -*-
+"""
+    DWX_ZMQ_Journal.py
+    --
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+import os
+import numpy as np
+from ast import literal_eval
+from collections import deque
+from threading import Thread, Event
+from time import time_ns
+from pandas import DataFrame, DatetimeIndex, Timestamp
+
+from api.DWX_ZMQ_BarStore import BAR_DTYPE
+from api.DWX_ZMQ_Decoder import DWX_ZMQ_Decoder
+
+##############################################################################
+
+# One BID/ASK tick
+TICK_RECORD = np.dtype([('time', np.int64),           # Receive time (UTC nanoseconds)
+                        ('symbol', 'S16'),
+                        ('bid', np.float64),
+                        ('ask', np.float64),
+                        ('server_time', np.int64)])   # Server tick time (epoch seconds, 0 = not published)
+
+# One OHLC rate (TRACK_RATES)
+RATE_RECORD = np.dtype([('received', np.int64),       # Receive time (UTC nanoseconds)
+                        ('instrument', 'S24')] + BAR_DTYPE.descr)
+
+# One PULL response, stored (as repr() of the decoded dict) in the .dat file
+PULL_RECORD = np.dtype([('time', np.int64),           # Receive time (UTC nanoseconds)
+                        ('offset', np.int64),
+                        ('length', np.int64)])
+
+# File header, followed by the records
+_HEADER = np.dtype([('magic', 'S8'),
+                    ('record_size', np.int64),
+                    ('count', np.int64),              # Records written (updated after them)
+                    ('reserved', 'S40')])
+
+_MAGIC = b'DWXJRNL1'
+
+_NS_PER_DAY = 86400 * 10**9
+
+##############################################################################
+
+class _JournalFile():
+
+    """
+    Memory-mapped file of fixed size records, append only. The file grows
+    by _chunk records at a time (sparse until written) and is truncated to
+    the records written when closed.
+    """
+
+    def __init__(self, _filename, _dtype, _chunk):
+
+        self._filename = _filename
+        self._dtype = _dtype
+        self._chunk = _chunk
+
+        if not os.path.exists(_filename):
+            with open(_filename, 'wb') as _file:
+                _header = np.zeros(1, dtype=_HEADER)
+                _header['magic'] = _MAGIC
+                _header['record_size'] = _dtype.itemsize
+                _file.write(_header.tobytes())
+                _file.truncate(_HEADER.itemsize + _chunk * _dtype.itemsize)
+
+        self._map_()
+
+        if self._header['magic'][0] != _MAGIC or self._header['record_size'][0] != _dtype.itemsize:
+            raise ValueError('{} is not a journal of {} byte records'.format(_filename, _dtype.itemsize))
+
+        self._count = int(self._header['count'][0])
+
+    ##########################################################################
+
+    def _map_(self):
+
+        self._mm = np.memmap(self._filename, dtype=np.uint8, mode='r+')
+        self._header = self._mm[:_HEADER.itemsize].view(_HEADER)
+
+        _size = (len(self._mm) - _HEADER.itemsize) // self._dtype.itemsize * self._dtype.itemsize
+        self._records = self._mm[_HEADER.itemsize:_HEADER.itemsize + _size].view(self._dtype)
+
+    ##########################################################################
+
+    def _append_(self, _records):
+
+        _n = len(_records)
+
+        if self._count + _n > len(self._records):
+
+            _capacity = len(self._records) + max(self._chunk, _n)
+
+            self._mm.flush()
+            self._mm = self._header = self._records = None
+
+            os.truncate(self._filename, _HEADER.itemsize + _capacity * self._dtype.itemsize)
+            self._map_()
+
+        self._records[self._count:self._count + _n] = _records
+        self._count += _n
+
+        # Readers never see a record before it is complete
+        self._header['count'] = self._count
+
+    ##########################################################################
+
+    def _close_(self):
+
+        self._mm.flush()
+        self._mm = self._header = self._records = None
+
+        os.truncate(self._filename, _HEADER.itemsize + self._count * self._dtype.itemsize)
+
+##############################################################################
+
+def _read_records_(_filename, _dtype):
+
+    """
+    Records written so far to a journal file (read-only memory map), also
+    while it is still being written.
+    """
+
+    if not os.path.exists(_filename) or os.path.getsize(_filename) <= _HEADER.itemsize:
+        return np.zeros(0, dtype=_dtype)
+
+    _mm = np.memmap(_filename, dtype=np.uint8, mode='r')
+    _header = _mm[:_HEADER.itemsize].view(_HEADER)
+
+    if _header['magic'][0] != _MAGIC or _header['record_size'][0] != _dtype.itemsize:
+        raise ValueError('{} is not a journal of {} byte records'.format(_filename, _dtype.itemsize))
+
+    _count = int(_header['count'][0])
+
+    return _mm[_HEADER.itemsize:_HEADER.itemsize + _count * _dtype.itemsize].view(_dtype)
+
+##############################################################################
+
+class DWX_ZMQ_Journal():
+
+    """
+    Records the connector's market data and responses to disk, one set of
+    files per (UTC) day in _path:
+
+        YYYYMMDD.ticks      BID/ASK ticks (TICK_RECORD)
+        YYYYMMDD.rates      OHLC rates (RATE_RECORD)
+        YYYYMMDD.pull       PULL responses (PULL_RECORD), whose text is
+        YYYYMMDD.pull.dat   in the .dat file
+
+    e.g.:
+
+        _journal = DWX_ZMQ_Journal('journal')
+        _journal._attach_(_zmq)
+        ...
+        _journal._close_()
+
+        DWX_ZMQ_Journal('journal').as_dataframe('2020.01.02', 'EURUSD')
+
+    The handler callbacks only copy what they receive into a queue, on
+    the poller thread; a writer thread appends it to the memory-mapped
+    files every _flush_interval seconds. Files are readable (ticks(),
+    rates(), responses()) while they are being written.
+
+    Ticks of conflated symbols are only recorded as often as handlers are
+    notified of them.
+    """
+
+    # Records in receive order, on the poller thread (see DWX_ZMQ_Dispatcher)
+    _inline = True
+
+    def __init__(self,
+                 _path='journal',               # Folder of the journal files
+                 _chunk_records=1 << 20,        # Records added to a file when it is full
+                 _flush_interval=0.05,          # Writer thread wakeup interval (s)
+                 _delimiter=';'):               # SUB message delimiter (rates)
+
+        os.makedirs(_path, exist_ok=True)
+
+        self._path = _path
+        self._chunk_records = _chunk_records
+        self._flush_interval = _flush_interval
+        self._delimiter = _delimiter
+        self._decoder = DWX_ZMQ_Decoder()
+
+        self._zmq = None
+
+        # Written by handler callbacks, read by the writer: deque([(KIND, DATA)])
+        self._queue = deque()
+
+        # Open files: {(DAY, KIND): _JournalFile}, {DAY: .pull.dat file}
+        self._files = {}
+        self._blobs = {}
+
+        self._written = {'ticks': 0, 'rates': 0, 'pull': 0}
+
+        self._stop = Event()
+        self._thread = None
+
+    ##########################################################################
+
+    def _attach_(self, _zmq):
+
+        """
+        Registers the journal as a PULL and SUB handler of _zmq (running
+        inline, never through a dispatcher, see _inline) and starts the
+        writer thread.
+        """
+
+        self._zmq = _zmq
+        self._delimiter = _zmq._string_delimiter
+
+        # Replaced, not modified: the poller may be iterating them
+        _zmq._subdata_handlers = _zmq._subdata_handlers + [self]
+        _zmq._pulldata_handlers = _zmq._pulldata_handlers + [self]
+
+        self._start_()
+
+    ##########################################################################
+
+    def _detach_(self):
+
+        if self._zmq is None:
+            return
+
+        self._zmq._subdata_handlers = [_hnd for _hnd in self._zmq._subdata_handlers if _hnd is not self]
+        self._zmq._pulldata_handlers = [_hnd for _hnd in self._zmq._pulldata_handlers if _hnd is not self]
+        self._zmq = None
+
+    ##########################################################################
+
+    def _start_(self):
+
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._thread = Thread(target=self._run_, name='DWX_ZMQ_Journal', daemon=True)
+        self._thread.start()
+
+    ##########################################################################
+
+    def _close_(self):
+
+        """
+        Detaches, writes what is still queued and closes the files.
+        """
+
+        self._detach_()
+
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+        self._write_queued_()
+
+        for _file in self._files.values():
+            _file._close_()
+
+        for _blob in self._blobs.values():
+            _blob.close()
+
+        self._files = {}
+        self._blobs = {}
+
+    ##########################################################################
+
+    def onSubDataBatch(self, _symbol, _times, _bids, _asks):
+
+        # Server tick times, if published, are only in the tick buffer
+        _server_times = None
+        _buffer = self._zmq._Market_Data_DB.get(_symbol) if self._zmq is not None else None
+
+        if _buffer is not None and _buffer._server_time is not None:
+            _buffer_times = _buffer.latest(len(_times))[0]
+            if len(_buffer_times) == len(_times) and _buffer_times[-1] == _times[-1]:
+                _server_times = _buffer.server_times(len(_times)).copy()
+
+        # The arrays are views over the tick buffer, which keeps moving
+        self._queue.append(('ticks', (_symbol, _times.copy(), _bids.copy(), _asks.copy(),
+                                      _server_times)))
+
+    ##########################################################################
+
+    def onSubData(self, msg):
+
+        # Only rates: ticks go to onSubDataBatch()
+        self._queue.append(('rates', (time_ns(), msg)))
+
+    ##########################################################################
+
+    def onPullData(self, _data):
+        self._queue.append(('pull', (time_ns(), _data)))
+
+    ##########################################################################
+
+    def _run_(self):
+
+        while not self._stop.wait(self._flush_interval):
+
+            try:
+                self._write_queued_()
+            except Exception as ex:
+                _exstr = "Exception Type {0}. Args:\n{1!r}"
+                print('[JOURNAL] ' + _exstr.format(type(ex).__name__, ex.args))
+
+    ##########################################################################
+
+    def _write_queued_(self):
+
+        _ticks, _rates = [], []
+
+        while self._queue:
+
+            _kind, _data = self._queue.popleft()
+
+            if _kind == 'ticks':
+                _ticks.append(_data)
+
+            elif _kind == 'rates':
+                _rates.append(_data)
+
+            else:
+                self._write_response_(*_data)
+
+        if _ticks:
+            self._write_ticks_(_ticks)
+
+        if _rates:
+            self._write_rates_(_rates)
+
+    ##########################################################################
+
+    def _write_ticks_(self, _ticks):
+
+        """
+        Writes queued tick batches as one block of records.
+        """
+
+        _records = np.zeros(sum(len(_batch[1]) for _batch in _ticks), dtype=TICK_RECORD)
+        _start = 0
+
+        for _symbol, _times, _bids, _asks, _server_times in _ticks:
+
+            _end = _start + len(_times)
+            _block = _records[_start:_end]
+
+            _block['time'] = _times
+            _block['symbol'] = _symbol
+            _block['bid'] = _bids
+            _block['ask'] = _asks
+
+            if _server_times is not None:
+                _block['server_time'] = _server_times
+
+            _start = _end
+
+        self._write_records_('ticks', _records, _records['time'])
+
+    ##########################################################################
+
+    def _file_(self, _day, _kind):
+
+        _file = self._files.get((_day, _kind))
+
+        if _file is None:
+            _dtype = {'ticks': TICK_RECORD, 'rates': RATE_RECORD, 'pull': PULL_RECORD}[_kind]
+            _file = self._files[(_day, _kind)] = _JournalFile(self._filename_(_day, _kind),
+                                                              _dtype, self._chunk_records)
+
+            # New day: close the files of earlier days
+            for _key in [_key for _key in self._files if _key[0] < _day]:
+                self._files.pop(_key)._close_()
+                if _key[0] in self._blobs:
+                    self._blobs.pop(_key[0]).close()
+
+        return _file
+
+    ##########################################################################
+
+    def _write_records_(self, _kind, _records, _times):
+
+        _days = _times // _NS_PER_DAY
+
+        if len(_days) == 0:
+            return
+
+        # Almost always a single day
+        if _days[0] == _days[-1]:
+            self._file_(self._day_(_times[0]), _kind)._append_(_records)
+
+        else:
+            for _day in np.unique(_days):
+                self._file_(self._day_(_day * _NS_PER_DAY), _kind)._append_(_records[_days == _day])
+
+        self._written[_kind] += len(_records)
+
+    ##########################################################################
+
+    def _write_rates_(self, _rates):
+
+        _records = np.zeros(len(_rates), dtype=RATE_RECORD)
+        _n = 0
+
+        for _received, msg in _rates:
+
+            try:
+                _instrument, _values = self._decoder._decode_sub_(msg, self._delimiter)
+            except ValueError:
+                continue
+
+            if _values is None or len(_values) != len(BAR_DTYPE):
+                continue
+
+            _records[_n] = (_received, _instrument) + tuple(_values)
+            _n += 1
+
+        self._write_records_('rates', _records[:_n], _records['received'][:_n])
+
+    ##########################################################################
+
+    def _write_response_(self, _received, _data):
+
+        _day = self._day_(_received)
+        _file = self._file_(_day, 'pull')
+        _blob = self._blobs.get(_day)
+
+        if _blob is None:
+            _blob = self._blobs[_day] = open(self._filename_(_day, 'pull') + '.dat', 'ab')
+
+        _text = repr(_data).encode('utf-8')
+        _offset = _blob.tell()
+
+        _blob.write(_text)
+        _blob.flush()
+
+        _record = np.array([(_received, _offset, len(_text))], dtype=PULL_RECORD)
+        _file._append_(_record)
+
+        self._written['pull'] += 1
+
+    ##########################################################################
+
+    def _day_(self, _timestamp):
+        return Timestamp(int(_timestamp)).strftime('%Y%m%d')
+
+    ##########################################################################
+
+    def _filename_(self, _day, _kind):
+        return os.path.join(self._path, '{}.{}'.format(Timestamp(_day).strftime('%Y%m%d'), _kind))
+
+    ##########################################################################
+
+    def days(self):
+
+        """
+        Returns the days (YYYYMMDD) with journal files, oldest first.
+        """
+
+        return sorted(set(_name.split('.', 1)[0] for _name in os.listdir(self._path)
+                          if _name.endswith(('.ticks', '.rates', '.pull'))))
+
+    ##########################################################################
+
+    def ticks(self, _day, _symbol=None):
+
+        """
+        Returns the TICK_RECORDs of _day (a read-only view, or a copy if
+        filtered by _symbol).
+        """
+
+        _records = _read_records_(self._filename_(_day, 'ticks'), TICK_RECORD)
+
+        if _symbol is not None:
+            _records = _records[_records['symbol'] == _symbol.encode()]
+
+        return _records
+
+    ##########################################################################
+
+    def rates(self, _day, _instrument=None):
+
+        _records = _read_records_(self._filename_(_day, 'rates'), RATE_RECORD)
+
+        if _instrument is not None:
+            _records = _records[_records['instrument'] == _instrument.encode()]
+
+        return _records
+
+    ##########################################################################
+
+    def responses(self, _day):
+
+        """
+        Returns the PULL responses of _day as [(TIME_NS, DICT), ..].
+        """
+
+        _filename = self._filename_(_day, 'pull')
+        _records = _read_records_(_filename, PULL_RECORD)
+
+        if len(_records) == 0:
+            return []
+
+        with open(_filename + '.dat', 'rb') as _blob:
+            _text = _blob.read()
+
+        return [(int(_time), literal_eval(_text[_offset:_offset + _length].decode('utf-8')))
+                for _time, _offset, _length in _records.tolist()]
+
+    ##########################################################################
+
+    def as_dataframe(self, _day, _symbol):
+
+        """
+        Returns the ticks of _symbol on _day as a DataFrame (columns 'bid',
+        'ask' and 'server_time', naive UTC DatetimeIndex).
+        """
+
+        _records = self.ticks(_day, _symbol)
+
+        return DataFrame({'bid': _records['bid'],
+                          'ask': _records['ask'],
+                          'server_time': _records['server_time'].view('datetime64[s]')},
+                         index=DatetimeIndex(_records['time'].view('datetime64[ns]')))
+
+    ##########################################################################
+
+    def __repr__(self):
+        return 'DWX_ZMQ_Journal({}, {})'.format(self._path, self._written)
+
+##############################################################################
@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+"""
+    DWX_ZMQ_Pool.py
+    --
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+from api.DWX_ZeroMQ_Connector_v2_0_1_RC8 import DWX_ZeroMQ_Connector
+from api.DWX_ZMQ_Reactor import DWX_ZMQ_Reactor
+
+##############################################################################
+
+class _DWX_ZMQ_Pool_Tap():
+
+    """
+    SUB / PULL handler of one terminal's connector: passes what it
+    receives on to the pool's handlers, tagged with the terminal's name.
+    """
+
+    def __init__(self, _pool, _source):
+
+        self._pool = _pool
+        self._source = _source
+
+    ##########################################################################
+
+    def onSubDataBatch(self, _symbol, _times, _bids, _asks):
+        self._pool._DWX_POOL_Notify_Ticks_(self._source, _symbol, _times, _bids, _asks)
+
+    ##########################################################################
+
+    def onSubData(self, msg):
+
+        # Rates only: ticks come in batches (onSubDataBatch)
+        for hnd in self._pool._subdata_handlers:
+            if hasattr(hnd, 'onPoolSubData'):
+                hnd.onPoolSubData(self._source, msg)
+
+    ##########################################################################
+
+    def onPullData(self, _data):
+
+        self._pool._DWX_POOL_Track_Tickets_(self._source, _data)
+
+        for hnd in self._pool._pulldata_handlers:
+            hnd.onPoolPullData(self._source, _data)
+
+##############################################################################
+
+class DWX_ZMQ_Pool():
+
+    """
+    Connectors to several MetaTrader terminals (brokers / accounts) on one
+    DWX_ZMQ_Reactor: one ZeroMQ context and one poller thread for all of
+    their sockets (and those of other connectors on the same reactor):
+
+        _pool = DWX_ZMQ_Pool({'broker_a': {'_PUSH_PORT': 32768,
+                                           '_PULL_PORT': 32769,
+                                           '_SUB_PORT': 32770,
+                                           '_account': 1234567,
+                                           '_symbols': ['EURUSD', 'GBPUSD']},
+                              'broker_b': {'_host': '10.0.0.2',
+                                           '_account': 7654321,
+                                           '_symbols': ['XAUUSD']}},
+                             _subdata_handlers=[_strategy])
+
+        _pool._DWX_MTX_NEW_TRADE_(dict(_order, _symbol='XAUUSD'))   # -> broker_b
+        _pool._DWX_MTX_GET_ALL_OPEN_TRADES_()                        # -> {TERMINAL: Future}
+        _pool['broker_a']._Market_Data_DB                            # a terminal's connector
+
+    Each terminal is given as the DWX_ZeroMQ_Connector arguments of its
+    connector (on top of the pool's **kwargs), plus '_account' and
+    '_symbols', used to route commands: by _terminal (name) if given,
+    else by _account, else by symbol (_routes, then the first terminal
+    listing it in '_symbols'). A pool of one terminal routes everything
+    to it. Commands on a ticket go to the terminal the ticket was last
+    seen on (in an order's execution, or the open trades of a terminal).
+    Commands that are not routed to one terminal (close all trades, get
+    open trades...) are sent to all of them, and return {TERMINAL: Future}.
+
+    Market data and responses of all terminals are merged into one stream,
+    tagged with the name of the terminal they came from. The pool's
+    handlers may define:
+
+        onPoolSubDataBatch(source, symbol, timestamps, bids, asks)
+            BID/ASK ticks, once per terminal, symbol and wakeup (as
+            onSubDataBatch)
+        onPoolSubData(source, msg)
+            rates, and BID/ASK ticks (one call per tick) for handlers
+            without onPoolSubDataBatch
+        onPoolPullData(source, data)
+            responses
+
+    Handlers of one terminal only are added to its connector as usual.
+    """
+
+    def __init__(self,
+                 _terminals,                # {NAME: {CONNECTOR ARGUMENT: VALUE, '_account': .., '_symbols': [..]}}
+                 _routes=None,              # {SYMBOL: NAME}, overriding the terminals' '_symbols'
+                 _pulldata_handlers=[],     # onPoolPullData() handlers
+                 _subdata_handlers=[],      # onPoolSubData() / onPoolSubDataBatch() handlers
+                 _reactor=None,             # DWX_ZMQ_Reactor to share (None = the pool's own)
+                 _io_threads=1,             # ZeroMQ context I/O threads of the pool's own reactor
+                 _poll_timeout=1000,        # ZMQ Poller Timeout (ms) of the pool's own reactor
+                 **kwargs):                 # DWX_ZeroMQ_Connector arguments of every terminal
+
+        self._pulldata_handlers = _pulldata_handlers
+        self._subdata_handlers = _subdata_handlers
+
+        # Shut down with the pool if it is the pool's own
+        self._own_reactor = _reactor is None
+        self._reactor = DWX_ZMQ_Reactor(_io_threads, _poll_timeout) if _reactor is None else _reactor
+
+        # Connectors by terminal name
+        self._terminals = {}
+
+        # Routes: {ACCOUNT: NAME}, {SYMBOL: NAME}, {TICKET: NAME}
+        self._accounts = {}
+        self._routes = {}
+        self._tickets = {}
+
+        for _name, _args in _terminals.items():
+
+            _args = dict(kwargs, **_args)
+
+            if '_account' in _args:
+                self._accounts[_args.pop('_account')] = _name
+
+            for _symbol in _args.pop('_symbols', ()):
+                self._routes.setdefault(_symbol, _name)
+
+            _args.setdefault('_ClientID', _name)
+
+            _tap = _DWX_ZMQ_Pool_Tap(self, _name)
+
+            _zmq = DWX_ZeroMQ_Connector(_pulldata_handlers=list(_args.pop('_pulldata_handlers', [])) + [_tap],
+                                        _subdata_handlers=list(_args.pop('_subdata_handlers', [])) + [_tap],
+                                        _reactor=self._reactor,
+                                        **_args)
+
+            self._terminals[_name] = _zmq
+
+        self._routes.update(_routes or {})
+
+    ##########################################################################
+
+    def __getitem__(self, _name):
+        return self._terminals[_name]
+
+    ##########################################################################
+
+    def __iter__(self):
+        return iter(self._terminals)
+
+    ##########################################################################
+
+    def _DWX_ZMQ_SHUTDOWN_(self):
+
+        for _zmq in self._terminals.values():
+            _zmq._DWX_ZMQ_SHUTDOWN_()
+
+        if self._own_reactor:
+            self._reactor._DWX_ZMQ_SHUTDOWN_()
+
+    ##########################################################################
+
+    def _DWX_POOL_Notify_Ticks_(self, _source, _symbol, _times, _bids, _asks):
+
+        _msgs = None
+
+        for hnd in self._subdata_handlers:
+
+            if hasattr(hnd, 'onPoolSubDataBatch'):
+                hnd.onPoolSubDataBatch(_source, _symbol, _times, _bids, _asks)
+
+            elif hasattr(hnd, 'onPoolSubData'):
+
+                # Messages rebuilt once for all per tick handlers
+                if _msgs is None:
+                    _zmq = self._terminals[_source]
+                    _msgs = [_zmq._decoder._encode_sub_(_symbol, _quote, _zmq._string_delimiter)
+                             for _quote in zip(_bids.tolist(), _asks.tolist())]
+
+                for msg in _msgs:
+                    hnd.onPoolSubData(_source, msg)
+
+    ##########################################################################
+
+    def _DWX_POOL_Track_Tickets_(self, _source, _data):
+
+        if not isinstance(_data, dict):
+            return
+
+        if _data.get('_action') == 'EXECUTION' and '_ticket' in _data:
+            self._tickets[_data['_ticket']] = _source
+
+        elif _data.get('_action') == 'OPEN_TRADES':
+            for _ticket in _data.get('_trades', {}):
+                self._tickets[_ticket] = _source
+
+    ##########################################################################
+
+    def _route_(self, _symbol=None, _account=None, _terminal=None, _ticket=None):
+
+        """
+        Name of the terminal a command goes to, see the class docstring.
+        Raises KeyError if it cannot be routed to one terminal.
+        """
+
+        if _terminal is not None:
+            if _terminal not in self._terminals:
+                raise KeyError('Unknown terminal: {}'.format(_terminal))
+            return _terminal
+
+        if _account is not None:
+            return self._accounts[_account]
+
+        if _ticket is not None and _ticket in self._tickets:
+            return self._tickets[_ticket]
+
+        if _symbol is not None and _symbol in self._routes:
+            return self._routes[_symbol]
+
+        if len(self._terminals) == 1:
+            return next(iter(self._terminals))
+
+        raise KeyError('No terminal for symbol {}, account {}, ticket {}'.format(_symbol, _account, _ticket))
+
+    ##########################################################################
+
+    def _DWX_POOL_Targets_(self, _account=None, _terminal=None):
+
+        # One terminal if given, otherwise all of them
+        if _terminal is None and _account is None:
+            return list(self._terminals)
+
+        return [self._route_(_account=_account, _terminal=_terminal)]
+
+    ##########################################################################
+
+    # Commands routed to one terminal, returning its Future
+
+    def _DWX_MTX_NEW_TRADE_(self, _order=None, _account=None, _terminal=None):
+
+        _symbol = None if _order is None else _order.get('_symbol')
+        _name = self._route_(_symbol, _account, _terminal)
+
+        return self._terminals[_name]._DWX_MTX_NEW_TRADE_(_order)
+
+    def _DWX_MTX_MODIFY_TRADE_BY_TICKET_(self, _ticket, _SL, _TP, _price=0,
+                                         _account=None, _terminal=None):
+
+        _name = self._route_(None, _account, _terminal, _ticket)
+        return self._terminals[_name]._DWX_MTX_MODIFY_TRADE_BY_TICKET_(_ticket, _SL, _TP, _price)
+
+    def _DWX_MTX_CLOSE_TRADE_BY_TICKET_(self, _ticket, _account=None, _terminal=None):
+
+        _name = self._route_(None, _account, _terminal, _ticket)
+        return self._terminals[_name]._DWX_MTX_CLOSE_TRADE_BY_TICKET_(_ticket)
+
+    def _DWX_MTX_CLOSE_PARTIAL_BY_TICKET_(self, _ticket, _lots, _account=None, _terminal=None):
+
+        _name = self._route_(None, _account, _terminal, _ticket)
+        return self._terminals[_name]._DWX_MTX_CLOSE_PARTIAL_BY_TICKET_(_ticket, _lots)
+
+    def _DWX_MTX_SEND_COMMAND_(self, _account=None, _terminal=None, **_order):
+
+        _name = self._route_(_order.get('_symbol', 'EURUSD'), _account, _terminal, _order.get('_ticket') or None)
+        return self._terminals[_name]._DWX_MTX_SEND_COMMAND_(**_order)
+
+    def _DWX_MTX_SEND_HIST_REQUEST_(self, _symbol='EURUSD', _timeframe=1440,
+                                    _start='2020.01.01 00:00:00', _end=None,
+                                    _account=None, _terminal=None):
+
+        _zmq = self._terminals[self._route_(_symbol, _account, _terminal)]
+
+        if _end is None:
+            return _zmq._DWX_MTX_SEND_HIST_REQUEST_(_symbol, _timeframe, _start)
+
+        return _zmq._DWX_MTX_SEND_HIST_REQUEST_(_symbol, _timeframe, _start, _end)
+
+    def _DWX_MTX_GET_HIST_(self, _symbol='EURUSD', _account=None, _terminal=None, **kwargs):
+
+        _name = self._route_(_symbol, _account, _terminal)
+        return self._terminals[_name]._DWX_MTX_GET_HIST_(_symbol, **kwargs)
+
+    def _DWX_MTX_SUBSCRIBE_MARKETDATA_(self, _symbol='EURUSD', _conflate=None,
+                                       _account=None, _terminal=None):
+
+        _name = self._route_(_symbol, _account, _terminal)
+        self._terminals[_name]._DWX_MTX_SUBSCRIBE_MARKETDATA_(_symbol, _conflate)
+
+    def _DWX_MTX_UNSUBSCRIBE_MARKETDATA_(self, _symbol, _account=None, _terminal=None):
+
+        _name = self._route_(_symbol, _account, _terminal)
+        self._terminals[_name]._DWX_MTX_UNSUBSCRIBE_MARKETDATA_(_symbol)
+
+    ##########################################################################
+
+    # Commands sent to every terminal (or the one given), returning {TERMINAL: Future}
+
+    def _DWX_MTX_CLOSE_TRADES_BY_MAGIC_(self, _magic, _account=None, _terminal=None):
+
+        return {_name: self._terminals[_name]._DWX_MTX_CLOSE_TRADES_BY_MAGIC_(_magic)
+                for _name in self._DWX_POOL_Targets_(_account, _terminal)}
+
+    def _DWX_MTX_CLOSE_ALL_TRADES_(self, _account=None, _terminal=None):
+
+        return {_name: self._terminals[_name]._DWX_MTX_CLOSE_ALL_TRADES_()
+                for _name in self._DWX_POOL_Targets_(_account, _terminal)}
+
+    def _DWX_MTX_GET_ALL_OPEN_TRADES_(self, _account=None, _terminal=None):
+
+        return {_name: self._terminals[_name]._DWX_MTX_GET_ALL_OPEN_TRADES_()
+                for _name in self._DWX_POOL_Targets_(_account, _terminal)}
+
+    def _DWX_ZMQ_HEARTBEAT_(self, _account=None, _terminal=None):
+
+        return {_name: self._terminals[_name]._DWX_ZMQ_HEARTBEAT_()
+                for _name in self._DWX_POOL_Targets_(_account, _terminal)}
+
+    ##########################################################################
+
+    # Commands split by symbol, one per terminal, returning {TERMINAL: Future}
+
+    def _DWX_MTX_SEND_TRACKPRICES_REQUEST_(self, _symbols=['EURUSD']):
+
+        _split = {}
+
+        for _symbol in _symbols:
+            _split.setdefault(self._route_(_symbol), []).append(_symbol)
+
+        return {_name: self._terminals[_name]._DWX_MTX_SEND_TRACKPRICES_REQUEST_(_names)
+                for _name, _names in _split.items()}
+
+    def _DWX_MTX_SEND_TRACKRATES_REQUEST_(self, _instruments=[('EURUSD_M1', 'EURUSD', 1)]):
+
+        _split = {}
+
+        for _instrument in _instruments:
+            _split.setdefault(self._route_(_instrument[1]), []).append(_instrument)
+
+        return {_name: self._terminals[_name]._DWX_MTX_SEND_TRACKRATES_REQUEST_(_names)
+                for _name, _names in _split.items()}
+
+    ##########################################################################
+
+    def __repr__(self):
+        return 'DWX_ZMQ_Pool({})'.format(', '.join(
+            '{}={}{}'.format(_name, _zmq._URL, _zmq._PUSH_PORT) for _name, _zmq in self._terminals.items()))
+
+##############################################################################
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+    DWX_ZMQ_Reactor.py
+    --
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+import zmq
+from collections import deque
+from itertools import count
+from threading import Thread, Lock, Event, get_ident
+
+##############################################################################
+
+class DWX_ZMQ_Reactor():
+
+    """
+    One ZeroMQ context and one poller thread shared by any number of
+    connectors in a process, instead of a context (with its I/O threads),
+    a poller thread and optionally two monitor threads per connector:
+
+        _reactor = DWX_ZMQ_Reactor(_io_threads=2)
+
+        _zmqs = [DWX_ZeroMQ_Connector(_PUSH_PORT=_port,
+                                      _PULL_PORT=_port + 1,
+                                      _SUB_PORT=_port + 2,
+                                      _reactor=_reactor)
+                 for _port in range(32768, 32828, 3)]
+        ...
+        for _zmq in _zmqs:
+            _zmq._DWX_ZMQ_SHUTDOWN_()
+
+        _reactor._DWX_ZMQ_SHUTDOWN_()
+
+    Sockets are registered with a callback, called on the reactor thread
+    whenever they are readable: it should read what is queued without
+    blocking, and not take long, as every other socket waits for it. Timers
+    are called once per wakeup with the poll timeout and return how long
+    (ms) the reactor may sleep before calling them again.
+
+    Sockets may be (un)registered from any thread: the change is applied
+    by the reactor thread between two polls, and _unregister_() returns
+    once the socket will not be polled nor read any more (it may then be
+    closed). Shut connectors down before the reactor.
+    """
+
+    _ids = count(1)
+
+    def __init__(self,
+                 _io_threads=1,             # ZeroMQ context I/O threads
+                 _poll_timeout=1000):       # ZMQ Poller Timeout (ms)
+
+        self._ACTIVE = True
+
+        self._ZMQ_CONTEXT = zmq.Context(_io_threads)
+        self._poll_timeout = _poll_timeout
+
+        self._poller = zmq.Poller()
+
+        # {SOCKET: CALLBACK}, only used by the reactor thread
+        self._callbacks = {}
+
+        # {KEY: CALLBACK(POLL_TIMEOUT) -> MS}, replaced, never modified
+        self._timers = {}
+
+        # (Un)registrations waiting for the reactor thread: deque([(SOCKET, CALLBACK or None, Event)])
+        self._changes = deque()
+
+        # Wakes the reactor thread up when changes are queued
+        _url = 'inproc://dwx-zmq-reactor-{}'.format(next(self._ids))
+
+        self._WAKEUP_SOCKET = self._ZMQ_CONTEXT.socket(zmq.PAIR)
+        self._WAKEUP_SOCKET.bind(_url)
+        self._poller.register(self._WAKEUP_SOCKET, zmq.POLLIN)
+
+        self._SIGNAL_SOCKET = self._ZMQ_CONTEXT.socket(zmq.PAIR)
+        self._SIGNAL_SOCKET.connect(_url)
+        self._SIGNAL_LOCK = Lock()
+
+        self._Reactor_Thread = Thread(target=self._DWX_REACTOR_Run_)
+        self._Reactor_Thread.daemon = True
+        self._Reactor_Thread.start()
+
+    ##########################################################################
+
+    def _DWX_ZMQ_SHUTDOWN_(self):
+
+        self._ACTIVE = False
+        self._DWX_REACTOR_Wakeup_()
+        self._Reactor_Thread.join()
+
+        if self._callbacks:
+            print("\n[KERNEL] Reactor shutting down with {} sockets still registered".format(len(self._callbacks)))
+
+        self._ZMQ_CONTEXT.destroy(0)
+        print("\n++ [KERNEL] ZeroMQ Reactor Context Terminated.. shut down safely complete! :)")
+
+    ##########################################################################
+
+    def _register_(self, _socket, _callback):
+
+        """
+        Polls _socket (for POLLIN) and calls _callback() whenever it is
+        readable, on the reactor thread.
+        """
+
+        self._DWX_REACTOR_Change_(_socket, _callback)
+
+    ##########################################################################
+
+    def _unregister_(self, _socket):
+        self._DWX_REACTOR_Change_(_socket, None)
+
+    ##########################################################################
+
+    def _add_timer_(self, _key, _callback):
+
+        """
+        Calls _callback(POLL_TIMEOUT) once per wakeup, on the reactor
+        thread: it returns the time (ms) until it needs calling again.
+        """
+
+        self._timers = {**self._timers, _key: _callback}
+
+    ##########################################################################
+
+    def _remove_timer_(self, _key):
+        self._timers = {_k: _v for _k, _v in self._timers.items() if _k is not _key}
+
+    ##########################################################################
+
+    def _DWX_REACTOR_Change_(self, _socket, _callback):
+
+        # The reactor thread (e.g. from a callback), or no reactor thread
+        # any more: nothing is polling, apply it now
+        if get_ident() == self._Reactor_Thread.ident or not self._Reactor_Thread.is_alive():
+            self._DWX_REACTOR_Apply_(_socket, _callback)
+            return
+
+        _done = Event()
+        self._changes.append((_socket, _callback, _done))
+        self._DWX_REACTOR_Wakeup_()
+
+        # Woken up every poll timeout, in case the reactor thread exits
+        # before applying it
+        while not _done.wait(self._poll_timeout / 1000):
+            if not self._Reactor_Thread.is_alive():
+                self._DWX_REACTOR_Apply_Changes_()
+
+    ##########################################################################
+
+    def _DWX_REACTOR_Apply_(self, _socket, _callback):
+
+        if _callback is None:
+            if self._callbacks.pop(_socket, None) is not None:
+                self._poller.unregister(_socket)
+        else:
+            if _socket not in self._callbacks:
+                self._poller.register(_socket, zmq.POLLIN)
+            self._callbacks[_socket] = _callback
+
+    ##########################################################################
+
+    def _DWX_REACTOR_Apply_Changes_(self):
+
+        while self._changes:
+            try:
+                _socket, _callback, _done = self._changes.popleft()
+            except IndexError:
+                break
+
+            self._DWX_REACTOR_Apply_(_socket, _callback)
+            _done.set()
+
+    ##########################################################################
+
+    def _DWX_REACTOR_Wakeup_(self):
+
+        # PAIR sockets are not thread-safe
+        with self._SIGNAL_LOCK:
+            try:
+                self._SIGNAL_SOCKET.send(b'', zmq.NOBLOCK)
+            except zmq.error.Again:
+                pass # Wakeups already queued
+
+    ##########################################################################
+
+    def _DWX_REACTOR_Run_(self):
+
+        while self._ACTIVE:
+
+            _timeout = self._poll_timeout
+
+            for _timer in self._timers.values():
+                try:
+                    _timeout = min(_timeout, _timer(self._poll_timeout))
+                except Exception as ex:
+                    _exstr = "Exception Type {0}. Args:\n{1!r}"
+                    print(_exstr.format(type(ex).__name__, ex.args))
+
+            for _socket, _event in self._poller.poll(_timeout):
+
+                if _socket is self._WAKEUP_SOCKET:
+
+                    while True:
+                        try:
+                            self._WAKEUP_SOCKET.recv(zmq.NOBLOCK)
+                        except zmq.error.Again:
+                            break
+
+                    self._DWX_REACTOR_Apply_Changes_()
+                    continue
+
+                # Unregistered since the poll
+                _callback = self._callbacks.get(_socket)
+
+                if _callback is None:
+                    continue
+
+                # One connector's error must not stop all of them
+                try:
+                    _callback()
+                except Exception as ex:
+                    _exstr = "Exception Type {0}. Args:\n{1!r}"
+                    print(_exstr.format(type(ex).__name__, ex.args))
+
+        self._DWX_REACTOR_Apply_Changes_()
+
+        print("\n++ [KERNEL] _DWX_REACTOR_Run_() Signing Out ++")
+
+    ##########################################################################
+
+    def __repr__(self):
+        return 'DWX_ZMQ_Reactor({} sockets, {} timers)'.format(len(self._callbacks), len(self._timers))
+
+##############################################################################
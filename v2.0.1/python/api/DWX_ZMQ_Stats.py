@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+    DWX_ZMQ_Stats.py
+    --
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+from threading import Thread, Event
+
+##############################################################################
+
+# Stages timed by DWX_ZeroMQ_Connector when stats are enabled
+STAGES = ('send',           # remote_send(): PUSH lock + send_string()
+          'response',       # Command sent -> its response received (MetaTrader + network)
+          'decode',         # Decoding of a PULL message
+          'pull_handlers',  # onPullData() handlers, for one message
+          'sub_store',      # SUB message received -> stored (parse + tick / rate store)
+          'sub_handlers')   # onSubData() / onSubDataBatch() handlers, for one message / batch
+
+##############################################################################
+
+class DWX_ZMQ_Histogram():
+
+    """
+    HDR-style histogram of durations in nanoseconds.
+
+    Values are counted in log-linear buckets: exact below 2^_bits ns, and
+    with a relative error below 2^(1-_bits) above (< 1.6% with the default
+    _bits=7), from 1 ns to over an hour, in a few thousand counters.
+    record() is a handful of integer operations, cheap enough for the
+    connector's hot paths. Counts recorded concurrently from several
+    threads may, rarely, be lost.
+    """
+
+    def __init__(self, _bits=7, _max_exponent=40):
+
+        self._bits = _bits
+        self._half = 1 << (_bits - 1)
+        self._counts = [0] * (((_max_exponent + 2) << (_bits - 1)) + 1)
+        self._last = len(self._counts) - 1
+
+        self._count = 0
+        self._total = 0
+        self._min = None
+        self._max = 0
+
+    ##########################################################################
+
+    def _index_(self, _value):
+
+        _exponent = _value.bit_length() - self._bits
+
+        if _exponent <= 0:
+            return _value
+
+        return min((_exponent << (self._bits - 1)) + (_value >> _exponent), self._last)
+
+    ##########################################################################
+
+    def _value_(self, _index):
+
+        """
+        Lowest value counted in bucket _index.
+        """
+
+        if _index < (1 << self._bits):
+            return _index
+
+        _exponent = (_index >> (self._bits - 1)) - 1
+
+        return (_index - (_exponent << (self._bits - 1))) << _exponent
+
+    ##########################################################################
+
+    def record(self, _value):
+
+        if _value < 0:
+            _value = 0
+
+        self._counts[self._index_(_value)] += 1
+        self._count += 1
+        self._total += _value
+
+        if _value > self._max:
+            self._max = _value
+        if self._min is None or _value < self._min:
+            self._min = _value
+
+    ##########################################################################
+
+    def percentile(self, _p):
+
+        """
+        Value (ns) below which _p percent of the recorded values fall.
+        """
+
+        if self._count == 0:
+            return 0
+
+        _rank = max(1, int(round(_p / 100.0 * self._count)))
+        _seen = 0
+
+        for _index, _n in enumerate(self._counts):
+            _seen += _n
+            if _seen >= _rank:
+                return min(self._value_(_index), self._max)
+
+        return self._max
+
+    ##########################################################################
+
+    def _reset_(self):
+
+        self._counts = [0] * len(self._counts)
+        self._count = 0
+        self._total = 0
+        self._min = None
+        self._max = 0
+
+    ##########################################################################
+
+    def _summary_(self):
+
+        """
+        Returns count, mean, min, max and percentiles, in microseconds.
+        """
+
+        return {'count': self._count,
+                'mean_us': self._total / max(1, self._count) / 1e3,
+                'min_us': (self._min or 0) / 1e3,
+                'p50_us': self.percentile(50) / 1e3,
+                'p90_us': self.percentile(90) / 1e3,
+                'p99_us': self.percentile(99) / 1e3,
+                'p99.9_us': self.percentile(99.9) / 1e3,
+                'max_us': self._max / 1e3}
+
+    ##########################################################################
+
+    def __repr__(self):
+        return 'DWX_ZMQ_Histogram({} values)'.format(self._count)
+
+##############################################################################
+
+class DWX_ZMQ_Stats():
+
+    """
+    Latency histograms by stage (see STAGES) for one connector, e.g.:
+
+        _zmq = DWX_ZeroMQ_Connector(_stats=True)
+        ...
+        print(_zmq.stats()['response'])
+
+    or exported every minute (to any callable taking the stats dict):
+
+        _stats = DWX_ZMQ_Stats()
+        _stats._export_every_(60, _logger.info)
+        _zmq = DWX_ZeroMQ_Connector(_stats=_stats)
+    """
+
+    def __init__(self, _stages=STAGES):
+
+        self._histograms = {_stage: DWX_ZMQ_Histogram() for _stage in _stages}
+        self._export_stop = None
+
+    ##########################################################################
+
+    def _record_(self, _stage, _nanoseconds):
+        self._histograms[_stage].record(_nanoseconds)
+
+    ##########################################################################
+
+    def stats(self):
+
+        """
+        Returns {STAGE: {'count': .., 'mean_us': .., 'p50_us': .., ...}}
+        """
+
+        return {_stage: _histogram._summary_()
+                for _stage, _histogram in self._histograms.items()}
+
+    ##########################################################################
+
+    def _reset_(self):
+
+        for _histogram in self._histograms.values():
+            _histogram._reset_()
+
+    ##########################################################################
+
+    def _export_every_(self, _interval=60.0, _callback=print, _reset=False):
+
+        """
+        Calls _callback(self.stats()) every _interval seconds from a daemon
+        thread, resetting the histograms after each export if _reset is
+        True (i.e. each export covers only the last interval).
+        """
+
+        self._stop_export_()
+
+        _stop = self._export_stop = Event()
+
+        def _export_():
+            while not _stop.wait(_interval):
+                try:
+                    _callback(self.stats())
+                except Exception as ex:
+                    _exstr = "Exception Type {0}. Args:\n{1!r}"
+                    print(_exstr.format(type(ex).__name__, ex.args))
+                if _reset:
+                    self._reset_()
+
+        _thread = Thread(target=_export_, name='DWX_ZMQ_Stats_Export')
+        _thread.daemon = True
+        _thread.start()
+
+    ##########################################################################
+
+    def _stop_export_(self):
+
+        if self._export_stop is not None:
+            self._export_stop.set()
+            self._export_stop = None
+
+    ##########################################################################
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+    DWX_ZMQ_TickStore.py
+    --
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+import numpy as np
+from pandas import DataFrame, DatetimeIndex
+
+##############################################################################
+
+class DWX_ZMQ_TickBuffer():
+
+    """
+    Fixed capacity ring buffer of BID/ASK ticks for one symbol.
+
+    Columns are preallocated NumPy arrays (int64 UTC nanoseconds, float64
+    BID/ASK). Every tick is written twice, at i and i + capacity, so the most
+    recent window is always contiguous and latest(n) / as_dataframe() return
+    views instead of copies.
+
+    If the server publishes tick times (PUBLISH_TICK_TIME), they are kept
+    in a second int64 column (server time, epoch seconds), allocated on the
+    first tick that has one, see server_times().
+
+    Views are only valid until the buffer wraps around them: copy them if
+    they must outlive the next (capacity - n) ticks.
+    """
+
+    def __init__(self,
+                 _symbol='EURUSD',
+                 _capacity=100000):     # Max. number of ticks kept in memory
+
+        if _capacity < 1:
+            raise ValueError('_capacity must be positive')
+
+        self._symbol = _symbol
+        self._capacity = _capacity
+
+        self._time = np.zeros(2 * _capacity, dtype=np.int64)
+        self._prices = np.zeros((2 * _capacity, 2), dtype=np.float64)
+        self._server_time = None
+
+        # Next write position, in [0, _capacity)
+        self._head = 0
+
+        # Total number of ticks appended since creation
+        self._count = 0
+
+    ##########################################################################
+
+    def _append_(self, _timestamp, _bid, _ask, _server_time=None):
+
+        _i = self._head
+        _j = _i + self._capacity
+
+        self._time[_i] = self._time[_j] = _timestamp
+        self._prices[_i] = self._prices[_j] = (_bid, _ask)
+
+        if _server_time is not None:
+            if self._server_time is None:
+                self._server_time = np.zeros(2 * self._capacity, dtype=np.int64)
+            self._server_time[_i] = self._server_time[_j] = _server_time
+
+        self._head = _i + 1 if _i + 1 < self._capacity else 0
+        self._count += 1
+
+    ##########################################################################
+
+    def __len__(self):
+        return min(self._count, self._capacity)
+
+    ##########################################################################
+
+    def _window_(self, _n=None):
+
+        _len = len(self)
+        _n = _len if _n is None else max(0, min(_n, _len))
+        _end = self._head + self._capacity
+
+        return _end - _n, _end
+
+    ##########################################################################
+
+    def latest(self, _n=None):
+
+        """
+        Returns (timestamps, bids, asks) views over the last _n ticks
+        (all ticks in the buffer if _n is None), oldest first.
+        """
+
+        _start, _end = self._window_(_n)
+
+        return (self._time[_start:_end],
+                self._prices[_start:_end, 0],
+                self._prices[_start:_end, 1])
+
+    ##########################################################################
+
+    def server_times(self, _n=None):
+
+        """
+        Returns a view over the server times (epoch seconds) of the last
+        _n ticks, None if the server does not publish them. 0 for ticks
+        received without one.
+        """
+
+        if self._server_time is None:
+            return None
+
+        _start, _end = self._window_(_n)
+
+        return self._server_time[_start:_end]
+
+    ##########################################################################
+
+    def as_dataframe(self, _n=None):
+
+        """
+        Returns the last _n ticks as a DataFrame (columns 'bid' and 'ask',
+        naive UTC DatetimeIndex) backed by the buffer's memory. With server
+        times, a 'server_time' column is added (to a copy).
+        """
+
+        _start, _end = self._window_(_n)
+
+        _df = DataFrame(self._prices[_start:_end],
+                        index=DatetimeIndex(self._time[_start:_end].view('datetime64[ns]'),
+                                            copy=False),
+                        columns=['bid', 'ask'],
+                        copy=False)
+
+        if self._server_time is not None:
+            _df = _df.assign(server_time=self._server_time[_start:_end].view('datetime64[s]'))
+
+        return _df
+
+    ##########################################################################
+
+    def __repr__(self):
+        return 'DWX_ZMQ_TickBuffer({}, {}/{} ticks)'.format(self._symbol,
+                                                            len(self),
+                                                            self._capacity)
+
+##############################################################################
+
+class DWX_ZMQ_TickStore(dict):
+
+    """
+    Market Data DB: {SYMBOL: DWX_ZMQ_TickBuffer}
+
+    Buffers are created on the first tick received for each symbol, so
+    memory stays flat at (number of symbols x capacity) for the whole
+    session.
+    """
+
+    def __init__(self, _capacity=100000):
+
+        super().__init__()
+
+        self._capacity = _capacity
+
+    ##########################################################################
+
+    def _append_(self, _symbol, _timestamp, _bid, _ask, _server_time=None):
+
+        try:
+            _buffer = self[_symbol]
+        except KeyError:
+            _buffer = self[_symbol] = DWX_ZMQ_TickBuffer(_symbol, self._capacity)
+
+        _buffer._append_(_timestamp, _bid, _ask, _server_time)
+
+    ##########################################################################
@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+"""
+    DWX_ZeroMQ_Connector_Async.py
+    --
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+import zmq
+import zmq.asyncio
+import asyncio
+from collections import deque
+from itertools import count
+from time import time_ns, monotonic_ns
+from pandas import Timestamp
+
+from api.DWX_ZMQ_Decoder import DWX_ZMQ_Decoder, _ABORTABLE_ACTIONS
+
+class AsyncDWXConnector():
+
+    """
+    asyncio variant of DWX_ZeroMQ_Connector, built on zmq.asyncio.
+
+    No polling thread: one reader task per socket runs on the event loop,
+    commands are awaited until their reply arrives and market data is
+    consumed with async iterators, e.g.:
+
+        async with AsyncDWXConnector() as _zmq:
+
+            _trades = await _zmq.send_command(_action='GET_OPEN_TRADES')
+
+            async for _timestamp, _bid, _ask in _zmq.subscribe('EURUSD'):
+                ...
+
+    Replies are matched to commands by the '_id' the server echoes back
+    when _correlation_ids is enabled, otherwise by their '_action' (the
+    server answers commands in the order it receives them). Either way,
+    any number of coroutines may have commands in flight at the same time.
+
+    A command that timed out stays pending, cancelled, until its reply
+    arrives (and is discarded) or for _late_reply_timeout seconds after
+    it was sent, so that the late reply is not taken for the next one's.
+    Replies without an '_action' (the server's ..._ABORTED_COMMAND errors)
+    go to the oldest command the server may abort.
+    """
+
+    def __init__(self,
+                 _ClientID='dwx-zeromq',    # Unique ID for this client
+                 _host='localhost',         # Host to connect to
+                 _protocol='tcp',           # Connection protocol
+                 _PUSH_PORT=32768,          # Port for Sending commands
+                 _PULL_PORT=32769,          # Port for Receiving responses
+                 _SUB_PORT=32770,           # Port for Subscribing for prices
+                 _delimiter=';',            # String delimiter
+                 _verbose=False,            # Print ZeroMQ messages
+                 _timeout=10.0,             # Default reply timeout (s), None = no timeout
+                 _late_reply_timeout=60.0,  # Max. wait (s, from sending) for the reply of a timed out command
+                 _queue_size=10000,         # Max. queued ticks per subscriber
+                 _correlation_ids=False):   # Prefix commands with "#ID;" (needs server support)
+
+        # Client ID
+        self._ClientID = _ClientID
+
+        # TCP Connection URL Template
+        self._URL = _protocol + "://" + _host + ":"
+
+        # Ports for PUSH, PULL and SUB sockets respectively
+        self._PUSH_PORT = _PUSH_PORT
+        self._PULL_PORT = _PULL_PORT
+        self._SUB_PORT = _SUB_PORT
+
+        self._string_delimiter = _delimiter
+        self._verbose = _verbose
+        self._timeout = _timeout
+        self._late_reply_ns = int(_late_reply_timeout * 10**9)
+        self._next_expiry = 0
+        self._queue_size = _queue_size
+        self._correlation_ids = _correlation_ids
+        self._request_ids = count(1)
+
+        self._decoder = DWX_ZMQ_Decoder()
+
+        # ZeroMQ Context and Sockets, created by _DWX_ZMQ_START_()
+        self._ZMQ_CONTEXT = None
+        self._PUSH_SOCKET = None
+        self._PULL_SOCKET = None
+        self._SUB_SOCKET = None
+
+        # Commands waiting for a reply: deque([(REPLY_ACTION, Future, ID, SENT_NS)])
+        self._pending = deque()
+
+        # Tick consumers: {TOPIC: [asyncio.Queue, ...]}
+        self._subscribers = {}
+
+        # Reader tasks
+        self._tasks = []
+
+    ##########################################################################
+
+    async def __aenter__(self):
+        self._DWX_ZMQ_START_()
+        return self
+
+    async def __aexit__(self, *_exc):
+        await self._DWX_ZMQ_SHUTDOWN_()
+
+    ##########################################################################
+
+    def _DWX_ZMQ_START_(self):
+
+        """
+        Connects the sockets and starts the reader tasks. Must be called
+        from a running event loop.
+        """
+
+        self._ZMQ_CONTEXT = zmq.asyncio.Context()
+
+        self._PUSH_SOCKET = self._ZMQ_CONTEXT.socket(zmq.PUSH)
+        self._PUSH_SOCKET.setsockopt(zmq.SNDHWM, 1)
+        self._PUSH_SOCKET.connect(self._URL + str(self._PUSH_PORT))
+        print("[INIT] Ready to send commands to METATRADER (PUSH): " + str(self._PUSH_PORT))
+
+        self._PULL_SOCKET = self._ZMQ_CONTEXT.socket(zmq.PULL)
+        self._PULL_SOCKET.setsockopt(zmq.RCVHWM, 1)
+        self._PULL_SOCKET.connect(self._URL + str(self._PULL_PORT))
+        print("[INIT] Listening for responses from METATRADER (PULL): " + str(self._PULL_PORT))
+
+        self._SUB_SOCKET = self._ZMQ_CONTEXT.socket(zmq.SUB)
+        self._SUB_SOCKET.connect(self._URL + str(self._SUB_PORT))
+        print("[INIT] Listening for market data from METATRADER (SUB): " + str(self._SUB_PORT))
+
+        self._tasks = [asyncio.ensure_future(self._DWX_ZMQ_Read_Pull_()),
+                       asyncio.ensure_future(self._DWX_ZMQ_Read_Sub_())]
+
+    ##########################################################################
+
+    async def _DWX_ZMQ_SHUTDOWN_(self):
+
+        for _task in self._tasks:
+            _task.cancel()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        # Nobody will answer these any more
+        while self._pending:
+            _action, _future, _id = self._pending.popleft()
+            if not _future.done():
+                _future.cancel()
+
+        self._ZMQ_CONTEXT.destroy(0)
+        print("\n++ [KERNEL] ZeroMQ Context Terminated.. shut down safely complete! :)")
+
+    ##########################################################################
+
+    async def _DWX_ZMQ_Read_Pull_(self):
+
+        while True:
+
+            msg = await self._PULL_SOCKET.recv_string()
+
+            try:
+                _data = self._decoder._decode_(msg)
+            except Exception as ex:
+                _exstr = "Exception Type {0}. Args:\n{1!r}"
+                print(_exstr.format(type(ex).__name__, ex.args))
+                continue
+
+            if self._verbose:
+                print(_data)
+
+            self._resolve_(_data)
+
+    ##########################################################################
+
+    def _resolve_(self, _data):
+
+        if not isinstance(_data, dict):
+            return
+
+        self._expire_(monotonic_ns())
+
+        if '_id' in _data:
+            _key, _values = 2, (str(_data['_id']),)
+        elif '_action' in _data:
+            _key, _values = 0, (_data['_action'],)
+        elif str(_data.get('_response', '')).endswith('_ABORTED_COMMAND'):
+            _key, _values = 0, _ABORTABLE_ACTIONS
+        else:
+            _key, _values = 0, ()
+
+        # Command with this id, or oldest command waiting for this kind of
+        # reply (timed out ones included: their reply is discarded)
+        for _entry in self._pending:
+            if _entry[_key] in _values:
+                self._pending.remove(_entry)
+                if not _entry[1].done():
+                    _entry[1].set_result(_data)
+                return
+
+        if self._verbose:
+            print('[KERNEL] Unsolicited response: {}'.format(_data))
+
+    ##########################################################################
+
+    def _expire_(self, _now):
+
+        """
+        Removes, at most once a second, the timed out commands sent more
+        than _late_reply_timeout seconds before _now.
+        """
+
+        if _now < self._next_expiry:
+            return
+
+        self._next_expiry = _now + 10**9
+
+        for _entry in [_entry for _entry in self._pending
+                       if _entry[1].done() and _now - _entry[3] > self._late_reply_ns]:
+            self._pending.remove(_entry)
+
+    ##########################################################################
+
+    async def _DWX_ZMQ_Read_Sub_(self):
+
+        while True:
+
+            msg = await self._SUB_SOCKET.recv_string()
+            _timestamp = time_ns()
+
+            try:
+                _topic, _values = self._decoder._decode_sub_(msg, self._string_delimiter)
+            except ValueError:
+                continue
+
+            if _values is None:
+                continue
+
+            if self._verbose:
+                print("\n[" + _topic + "] " + str(Timestamp(_timestamp)) + " " + str(_values))
+
+            for _queue in self._subscribers.get(_topic, ()):
+
+                # Slow consumer: drop its oldest tick rather than block the reader
+                if _queue.full():
+                    _queue.get_nowait()
+
+                _queue.put_nowait((_timestamp,) + _values)
+
+    ##########################################################################
+
+    async def send_raw(self, _msg, _timeout=-1):
+
+        """
+        Sends a raw command through the PUSH port and returns its decoded
+        reply (None if the server does not reply to this command).
+        _timeout in seconds, -1 = use the connector's default.
+        """
+
+        _action = self._decoder._reply_action_(_msg, self._string_delimiter)
+
+        if _action is None:
+            await self._PUSH_SOCKET.send_string(_msg)
+            return None
+
+        _entry = (_action, asyncio.get_running_loop().create_future(),
+                  str(next(self._request_ids)), monotonic_ns())
+        self._pending.append(_entry)
+
+        if self._correlation_ids:
+            _msg = '#' + _entry[2] + self._string_delimiter + _msg
+
+        try:
+            await self._PUSH_SOCKET.send_string(_msg)
+        except BaseException:
+            self._pending.remove(_entry)
+            raise
+
+        # On timeout (or cancellation) the entry stays pending, see _resolve_()
+        return await asyncio.wait_for(_entry[1],
+                                      self._timeout if _timeout == -1 else _timeout)
+
+    ##########################################################################
+
+    async def send_command(self, _action='OPEN', _type=0,
+                           _symbol='EURUSD', _price=0.0,
+                           _SL=50, _TP=50, _comment="Python-to-MT",
+                           _lots=0.01, _magic=123456, _ticket=0,
+                           _timeout=-1):
+
+        """
+        Sends a TRADE command (same arguments as
+        DWX_ZeroMQ_Connector._DWX_MTX_SEND_COMMAND_) and returns the reply.
+        """
+
+        _msg = "{};{};{};{};{};{};{};{};{};{};{}".format('TRADE', _action, _type,
+                                                         _symbol, _price,
+                                                         _SL, _TP, _comment,
+                                                         _lots, _magic,
+                                                         _ticket)
+
+        return await self.send_raw(_msg, _timeout)
+
+    ##########################################################################
+
+    async def send_hist_request(self,
+                                _symbol='EURUSD',
+                                _timeframe=1440,
+                                _start='2020.01.01 00:00:00',
+                                _end=None,
+                                _timeout=-1):
+
+        if _end is None:
+            _end = Timestamp.now().strftime('%Y.%m.%d %H:%M:00')
+
+        _msg = "{};{};{};{};{}".format('HIST', _symbol, _timeframe, _start, _end)
+
+        return await self.send_raw(_msg, _timeout)
+
+    ##########################################################################
+
+    async def send_trackprices_request(self, _symbols=['EURUSD'], _timeout=-1):
+
+        _msg = 'TRACK_PRICES'
+        for s in _symbols:
+            _msg = _msg + ";{}".format(s)
+
+        return await self.send_raw(_msg, _timeout)
+
+    ##########################################################################
+
+    async def send_trackrates_request(self,
+                                      _instruments=[('EURUSD_M1', 'EURUSD', 1)],
+                                      _timeout=-1):
+
+        _msg = 'TRACK_RATES'
+        for i in _instruments:
+            _msg = _msg + ";{};{}".format(i[1], i[2])
+
+        return await self.send_raw(_msg, _timeout)
+
+    ##########################################################################
+
+    async def heartbeat(self, _timeout=-1):
+        return await self.send_raw("HEARTBEAT;", _timeout)
+
+    ##########################################################################
+
+    async def subscribe(self, _symbol='EURUSD'):
+
+        """
+        Async iterator over the market data published for _symbol:
+
+            (TIMESTAMP_NS, BID, ASK) for symbols tracked with TRACK_PRICES
+            (TIMESTAMP_NS, BID, ASK, TIME) if the server publishes tick
+             times (PUBLISH_TICK_TIME)
+            (TIMESTAMP_NS, TIME, OPEN, HIGH, LOW, CLOSE, TICKVOL, SPREAD,
+             REALVOL) for instruments tracked with TRACK_RATES
+
+        TIMESTAMP_NS is the local (UTC) receive time in nanoseconds. The
+        subscription is removed when the iterator is closed.
+        """
+
+        _queue = asyncio.Queue(self._queue_size)
+        _queues = self._subscribers.setdefault(_symbol, [])
+
+        if len(_queues) == 0:
+            self._SUB_SOCKET.setsockopt_string(zmq.SUBSCRIBE, _symbol)
+            print("[KERNEL] Subscribed to {} BID/ASK updates.".format(_symbol))
+
+        _queues.append(_queue)
+
+        try:
+            while True:
+                yield await _queue.get()
+
+        finally:
+            _queues.remove(_queue)
+
+            if len(_queues) == 0:
+                del self._subscribers[_symbol]
+                if not self._SUB_SOCKET.closed:
+                    self._SUB_SOCKET.setsockopt_string(zmq.UNSUBSCRIBE, _symbol)
+                    print("\n**\n[KERNEL] Unsubscribing from " + _symbol + "\n**\n")
+
+    ##########################################################################
@@ -14,9 +14,21 @@
 """
 
 import zmq
-from time import sleep
+import numpy as np
+from math import ceil
+from time import sleep, time_ns, perf_counter_ns
 from pandas import DataFrame, Timestamp
-from threading import Thread
+from threading import Thread, Lock
+from itertools import count
+from functools import partial
+from concurrent.futures import Future, InvalidStateError, TimeoutError, CancelledError
+from api.DWX_ZMQ_Decoder import DWX_ZMQ_Decoder, _ABORTABLE_ACTIONS
+from api.DWX_ZMQ_TickStore import DWX_ZMQ_TickStore
+from api.DWX_ZMQ_BarStore import DWX_ZMQ_BarStore
+from api.DWX_ZMQ_Stats import DWX_ZMQ_Stats
+from api.DWX_ZMQ_Dispatcher import DWX_ZMQ_Dispatcher
+from api.DWX_ZMQ_HistCache import DWX_ZMQ_HistCache, _hist_bars_, _to_epoch_
+from api.DWX_ZMQ_Backfill import DWX_ZMQ_Backfill
 
 # 30-07-2019 10:58 CEST
 from zmq.utils.monitor import recv_monitor_message
@@ -35,11 +47,24 @@ class DWX_ZeroMQ_Connector():
                  _SUB_PORT=32770,           # Port for Subscribing for prices
                  _delimiter=';',
                  _pulldata_handlers = [],   # Handlers to process data received through PULL port.
-                 _subdata_handlers = [],    # Handlers to process data received through SUB port.
+                 _subdata_handlers = [],    # Handlers to process data received through SUB port (onSubData / onSubDataBatch).
                  _verbose=True,             # String delimiter
                  _poll_timeout=1000,        # ZMQ Poller Timeout (ms)
                  _sleep_delay=0.001,        # 1 ms for time.sleep()
-                 _monitor=False):           # Experimental ZeroMQ Socket Monitoring
+                 _drain=True,               # Read all queued messages per wakeup, never sleep
+                 _drain_limit=1000,         # Max. messages read per socket and wakeup
+                 _monitor=False,            # Experimental ZeroMQ Socket Monitoring
+                 _tick_capacity=100000,     # Max. BID/ASK ticks kept per symbol
+                 _rates_max_bars=None,      # Max. OHLC rates kept per instrument (None = all)
+                 _correlation_ids=False,    # Prefix commands with "#ID;" (needs server support)
+                 _send_timeout=1000,        # Max. wait (ms) for room in the PUSH queue
+                 _late_reply_timeout=60.0,  # Max. wait (s, from sending) for the response of a timed out request
+                 _dispatcher=None,          # DWX_ZMQ_Dispatcher running handlers off the poller thread (True = own one, None = inline)
+                 _stats=False,              # Record hot path latencies (True or a DWX_ZMQ_Stats), see stats()
+                 _hist_cache=None,          # Folder (or DWX_ZMQ_HistCache) caching HIST bars, see _DWX_MTX_GET_HIST_()
+                 _sub_format='TEXT',        # SUB message format, 'TEXT' or 'BINARY' (needs server support)
+                 _sub_zero_copy=False,      # Binary SUB payloads as memoryviews over ZeroMQ frames
+                 _reactor=None):            # DWX_ZMQ_Reactor sharing its context and poller thread (None = own ones)
     
         ######################################################################
         
@@ -55,15 +80,31 @@ class DWX_ZeroMQ_Connector():
         # Connection Protocol
         self._protocol = _protocol
 
-        # ZeroMQ Context
-        self._ZMQ_CONTEXT = zmq.Context()
+        # ZeroMQ Context (a reactor's is shared with other connectors)
+        self._reactor = _reactor
+        self._ZMQ_CONTEXT = zmq.Context() if _reactor is None else _reactor._ZMQ_CONTEXT
         
         # TCP Connection URL Template
         self._URL = self._protocol + "://" + self._host + ":"
         
-        # Handlers for received data (pull and sub ports)
+        # Handlers for received data (pull and sub ports), queued to the
+        # dispatcher's workers (when dispatched) if there is one. A
+        # dispatcher passed in may be shared: only our own is shut down.
+        self._own_dispatcher = _dispatcher is True
+        
+        if _dispatcher is True:
+            _dispatcher = DWX_ZMQ_Dispatcher()
+        
+        self._dispatcher = _dispatcher or None
+        
         self._pulldata_handlers = _pulldata_handlers
         self._subdata_handlers = _subdata_handlers
+        
+        # Latency histograms (None = not recorded)
+        if _stats is True:
+            _stats = DWX_ZMQ_Stats()
+        
+        self._stats = _stats or None
 
         # Ports for PUSH, PULL and SUB sockets respectively
         self._PUSH_PORT = _PUSH_PORT
@@ -73,6 +114,7 @@ class DWX_ZeroMQ_Connector():
         # Create Sockets
         self._PUSH_SOCKET = self._ZMQ_CONTEXT.socket(zmq.PUSH)
         self._PUSH_SOCKET.setsockopt(zmq.SNDHWM, 1)        
+        self._PUSH_SOCKET.setsockopt(zmq.SNDTIMEO, _send_timeout)
         self._PUSH_SOCKET_STATUS = {'state': True, 'latest_event': 'N/A'}
         
         self._PULL_SOCKET = self._ZMQ_CONTEXT.socket(zmq.PULL)
@@ -108,17 +150,52 @@ class DWX_ZeroMQ_Connector():
         self._PUSH_Monitor_Thread = None
         self._PULL_Monitor_Thread = None
         
-        # Market Data Dictionary by Symbol (holds tick data)
-        self._Market_Data_DB = {}   # {SYMBOL: {TIMESTAMP: (BID, ASK)}}
+        # Monitor sockets polled by the reactor: {SOCKET_NAME: SOCKET}
+        self._monitor_sockets = {}
+        
+        # Market Data Dictionary by Symbol (holds tick data in ring buffers)
+        self._Market_Data_DB = DWX_ZMQ_TickStore(_tick_capacity)   # {SYMBOL: DWX_ZMQ_TickBuffer}
+        
+        # Latest BID/ASK of symbols subscribed with _conflate (replaced on every tick, never stored)
+        self._Market_Data_Latest = {}   # {SYMBOL: (TIMESTAMP_NS, BID, ASK, MESSAGE)}
+        
+        # Conflated symbols: {SYMBOL: [INTERVAL_NS, NEXT_NOTIFICATION_NS, LAST_NOTIFIED_TIMESTAMP_NS]}
+        self._conflated = {}
+        
+        # Market Rates Dictionary by Instrument (holds OHLC rates, one per bar time)
+        self._Market_Rates_DB = DWX_ZMQ_BarStore(_rates_max_bars)  # {INSTRUMENT: DWX_ZMQ_BarBuffer}
         
         # History Data Dictionary by Symbol (holds historic data of the last HIST request for each symbol)
         self._History_DB = {}   # {SYMBOL_TF: [{'time': TIME, 'open': OPEN_PRICE, 'high': HIGH_PRICE, 
                                 #               'low': LOW_PRICE, 'close': CLOSE_PRICE, 'tick_volume': TICK_VOLUME, 
                                 #               'spread': SPREAD, 'real_volume': REAL_VOLUME}, ...]}
+        
+        # On-disk HIST bar cache (None = no cache)
+        if isinstance(_hist_cache, str):
+            _hist_cache = DWX_ZMQ_HistCache(_hist_cache)
+        
+        self._hist_cache = _hist_cache
                                 
-        # Temporary Order STRUCT for convenience wrappers later.
+        # Default Order STRUCT for convenience wrappers later (copied on
+        # every call, so that wrappers can be used from several threads).
         self.temp_order_dict = self._generate_default_order_dict()
         
+        # Requests waiting for a response: {ID: (RESPONSE_ACTION, Future, SENT_NS)}
+        self._pending_requests = {}
+        self._pending_lock = Lock()
+        self._request_ids = count(1)
+        self._correlation_ids = _correlation_ids
+        
+        # Timed out requests stay pending for a while (see _cancel_response_())
+        self._late_reply_ns = int(_late_reply_timeout * 10**9)
+        self._next_expiry = 0
+        
+        # ZeroMQ sockets are not thread-safe
+        self._PUSH_LOCK = Lock()
+        
+        # Decoder for messages received through the PULL port
+        self._decoder = DWX_ZMQ_Decoder()
+        
         # Thread returns the most recently received DATA block here
         self._thread_data_output = None
         
@@ -131,12 +208,37 @@ class DWX_ZeroMQ_Connector():
         # Global Sleep Delay
         self._sleep_delay = _sleep_delay
         
-        # Begin polling for PULL / SUB data
-        self._MarketData_Thread = Thread(target=self._DWX_ZMQ_Poll_Data_, 
-                                         args=(self._string_delimiter,
-                                               self._poll_timeout,))
-        self._MarketData_Thread.daemon = True
-        self._MarketData_Thread.start()
+        # Poller Drain Mode
+        self._drain = _drain
+        self._drain_limit = _drain_limit
+        
+        # SUB messages may be binary (multipart), see _DWX_MTX_SET_SUB_FORMAT_()
+        self._sub_multipart = False
+        self._sub_zero_copy = _sub_zero_copy
+        
+        # Subscribed prefixes, and topics received so far: {TOPIC: SYMBOL, 
+        # or None if not subscribed}, for binary SUB messages. Both are 
+        # replaced, never modified, on (un)subscription.
+        self._sub_prefixes = frozenset()
+        self._sub_topics = {}
+        
+        # Begin polling for PULL / SUB data, on the reactor's thread if 
+        # there is one
+        if _reactor is None:
+            self._MarketData_Thread = Thread(target=self._DWX_ZMQ_Poll_Data_, 
+                                             args=(self._string_delimiter,
+                                                   self._poll_timeout,))
+            self._MarketData_Thread.daemon = True
+            self._MarketData_Thread.start()
+        
+        else:
+            _reactor._register_(self._PULL_SOCKET, self._DWX_ZMQ_Read_Pull_)
+            _reactor._register_(self._SUB_SOCKET, partial(self._DWX_ZMQ_Read_Sub_,
+                                                          self._string_delimiter))
+            _reactor._add_timer_(self, self._DWX_ZMQ_Reactor_Timer_)
+        
+        if _sub_format != 'TEXT':
+            self._DWX_MTX_SET_SUB_FORMAT_(_sub_format)
         
         ###########################################
         # Enable/Disable ZeroMQ Socket Monitoring #
@@ -160,21 +262,29 @@ class DWX_ZeroMQ_Connector():
             self._PUSH_SOCKET_STATUS['state'] = False
             self._PULL_SOCKET_STATUS['state'] = False
             
-            # PUSH
-            self._PUSH_Monitor_Thread = Thread(target=self._DWX_ZMQ_EVENT_MONITOR_, 
-                                               args=("PUSH",
-                                                     self._PUSH_SOCKET.get_monitor_socket(),))
-            
-            self._PUSH_Monitor_Thread.daemon = True
-            self._PUSH_Monitor_Thread.start()
-            
-            # PULL
-            self._PULL_Monitor_Thread = Thread(target=self._DWX_ZMQ_EVENT_MONITOR_, 
-                                               args=("PULL",
-                                                     self._PULL_SOCKET.get_monitor_socket(),))
+            # Monitor threads, or the reactor polls the monitor sockets
+            if _reactor is None:
+                # PUSH
+                self._PUSH_Monitor_Thread = Thread(target=self._DWX_ZMQ_EVENT_MONITOR_, 
+                                                   args=("PUSH",
+                                                         self._PUSH_SOCKET.get_monitor_socket(),))
+                
+                self._PUSH_Monitor_Thread.daemon = True
+                self._PUSH_Monitor_Thread.start()
+                
+                # PULL
+                self._PULL_Monitor_Thread = Thread(target=self._DWX_ZMQ_EVENT_MONITOR_, 
+                                                   args=("PULL",
+                                                         self._PULL_SOCKET.get_monitor_socket(),))
+                
+                self._PULL_Monitor_Thread.daemon = True
+                self._PULL_Monitor_Thread.start()
             
-            self._PULL_Monitor_Thread.daemon = True
-            self._PULL_Monitor_Thread.start()
+            else:
+                for _name, _socket in (("PUSH", self._PUSH_SOCKET), ("PULL", self._PULL_SOCKET)):
+                    self._monitor_sockets[_name] = _socket.get_monitor_socket()
+                    _reactor._register_(self._monitor_sockets[_name],
+                                        partial(self._DWX_ZMQ_Reactor_Monitor_, _name))
        
     ##########################################################################
     
@@ -193,14 +303,38 @@ class DWX_ZeroMQ_Connector():
         if self._PULL_Monitor_Thread is not None:            
             self._PULL_Monitor_Thread.join()
         
+        # Stop polling the sockets before they are closed
+        if self._reactor is not None:
+            
+            self._reactor._remove_timer_(self)
+            
+            for _socket in [self._PULL_SOCKET, self._SUB_SOCKET] + list(self._monitor_sockets.values()):
+                self._reactor._unregister_(_socket)
+            
+            for _socket in self._monitor_sockets.values():
+                _socket.close(0)
+        
+        # Stop handler workers (a shared dispatcher is left to its owner)
+        if self._own_dispatcher:
+            self._dispatcher._shutdown_()
+        
         # Unregister sockets from Poller
         self._poller.unregister(self._PULL_SOCKET)
         self._poller.unregister(self._SUB_SOCKET)
         print("\n++ [KERNEL] Sockets unregistered from ZMQ Poller()! ++")
         
-        # Terminate context 
-        self._ZMQ_CONTEXT.destroy(0)
-        print("\n++ [KERNEL] ZeroMQ Context Terminated.. shut down safely complete! :)")
+        if self._reactor is not None:
+            
+            # Close sockets, other connectors may still use the context
+            for _socket in (self._PUSH_SOCKET, self._PULL_SOCKET, self._SUB_SOCKET):
+                _socket.close(0)
+            
+            print("\n++ [KERNEL] Sockets closed.. shut down safely complete! :)")
+        
+        else:
+            # Terminate context 
+            self._ZMQ_CONTEXT.destroy(0)
+            print("\n++ [KERNEL] ZeroMQ Context Terminated.. shut down safely complete! :)")
         
     ##########################################################################
     
@@ -216,20 +350,176 @@ class DWX_ZeroMQ_Connector():
     
     """
     Function to send commands to MetaTrader (PUSH)
+    
+    Returns a concurrent.futures.Future that resolves to the decoded 
+    response, or to None for commands the server does not respond to. 
+    The Future is cancelled if the command could not be sent.
     """
     def remote_send(self, _socket, _data):
         
+        _future = Future()
+        
+        if self._stats is not None:
+            _start = perf_counter_ns()
+        
+        _action = self._decoder._reply_action_(_data, self._string_delimiter)
+        
+        if _action is None:
+            _future.set_result(None)
+        
         if self._PUSH_SOCKET_STATUS['state'] == True:
             try:
-                _socket.send_string(_data, zmq.DONTWAIT)
+                # Register and send under the same lock, so that pending 
+                # requests are kept in the order the server receives them.
+                with self._PUSH_LOCK:
+                    
+                    if _action is not None:
+                        _id = str(next(self._request_ids))
+                        
+                        with self._pending_lock:
+                            self._pending_requests[_id] = (_action, _future, perf_counter_ns())
+                        
+                        if self._correlation_ids:
+                            _data = '#' + _id + self._string_delimiter + _data
+                    
+                    # Blocks up to SNDTIMEO if other commands are still queued
+                    _socket.send_string(_data)
+                
+                if self._stats is not None:
+                    self._stats._record_('send', perf_counter_ns() - _start)
+                
+                return _future
             except zmq.error.Again:
                 print("\nResource timeout.. please try again.")
                 sleep(self._sleep_delay)
         else:
             print('\n[KERNEL] NO HANDSHAKE ON PUSH SOCKET.. Cannot SEND data')
+        
+        self._cancel_response_(_future)
+        
+        return _future
       
     ##########################################################################
     
+    """
+    Function to stop waiting for the response of a request, so that it 
+    cannot be matched with a later response. 
+    
+    With _late_response (e.g. after a timeout) the response may still 
+    come: the request stays pending, cancelled (a tombstone), and its 
+    response is discarded when it arrives. Without correlation ids, 
+    removing it would have the next response with the same '_action' 
+    taken for it, and every later request get the previous one's 
+    response. A tombstone is removed by the first response matched to 
+    it, or _late_reply_timeout seconds after the request was sent. 
+    Otherwise (e.g. the command was never sent) it is removed.
+    """
+    def _cancel_response_(self, _future, _late_response=False):
+        
+        with self._pending_lock:
+            
+            if not _late_response:
+                for _id, (_action, _pending, _sent) in self._pending_requests.items():
+                    if _pending is _future:
+                        del self._pending_requests[_id]
+                        break
+            
+            _future.cancel()
+    
+    ##########################################################################
+    
+    """
+    Function to remove, at most once a second, the tombstones of requests
+    sent more than _late_reply_timeout seconds before _now, whose response
+    is not expected any more. Called with _pending_lock held.
+    """
+    def _expire_tombstones_(self, _now):
+        
+        if _now < self._next_expiry:
+            return
+        
+        self._next_expiry = _now + 10**9
+        
+        _expired = [_id for _id, (_action, _future, _sent) in self._pending_requests.items()
+                    if _future.cancelled() and _now - _sent > self._late_reply_ns]
+        
+        for _id in _expired:
+            del self._pending_requests[_id]
+    
+    ##########################################################################
+    
+    """
+    Function to block until the response of a request arrives, or _timeout
+    seconds (monotonic clock) have passed. Wakes up as soon as the poller 
+    thread resolves _future, returns the response, or None on timeout.
+    """
+    def _wait_response_(self, _future, _timeout=1.0):
+        
+        if _future is None:
+            return None
+        
+        try:
+            return _future.result(_timeout)
+        
+        except TimeoutError:
+            # A late response must not be taken for another request's
+            self._cancel_response_(_future, _late_response=True)
+        
+        except CancelledError:
+            pass
+        
+        return None
+    
+    ##########################################################################
+    
+    """
+    Function to resolve the Future of the request a response belongs to: 
+    by its '_id' if the server echoed one, otherwise the oldest pending 
+    request expecting this '_action'. Responses without an '_action' (the 
+    server's errors for commands it did not run, e.g. 
+    TRADING_IS_NOT_ALLOWED__ABORTED_COMMAND) go to the oldest pending 
+    request the server may abort (see _ABORTABLE_ACTIONS): it answers 
+    commands in the order it receives them. Other ones (e.g. 
+    EA_IS_STOPPED) are not responses to a request. Responses to 
+    cancelled requests (tombstones) are discarded. 
+    _received is the perf_counter_ns() the response was received at, for
+    the 'response' latency stats.
+    """
+    def _resolve_response_(self, _data, _received=None):
+        
+        if not isinstance(_data, dict):
+            return
+        
+        _entry = None
+        
+        with self._pending_lock:
+            
+            self._expire_tombstones_(perf_counter_ns())
+            
+            if '_id' in _data:
+                _entry = self._pending_requests.pop(str(_data['_id']), None)
+            
+            else:
+                _reply = _data.get('_action')
+                _aborted = _reply is None and str(_data.get('_response', '')).endswith('_ABORTED_COMMAND')
+                
+                for _id, (_action, _future, _sent) in self._pending_requests.items():
+                    if _action == _reply or (_aborted and _action in _ABORTABLE_ACTIONS):
+                        _entry = self._pending_requests.pop(_id)
+                        break
+
+        if _entry is not None and not _entry[1].cancelled():
+            
+            if self._stats is not None and _received is not None:
+                self._stats._record_('response', _received - _entry[2])
+            
+            try:
+                _entry[1].set_result(_data)
+            except InvalidStateError:
+                pass # Cancelled by the requester in the meantime.
+    
+    ##########################################################################
+    
     def _get_response_(self):
         return self._thread_data_output
     
@@ -284,21 +574,22 @@ class DWX_ZeroMQ_Connector():
             _order = self._generate_default_order_dict()
         
         # Execute
-        self._DWX_MTX_SEND_COMMAND_(**_order)
+        return self._DWX_MTX_SEND_COMMAND_(**_order)
         
     # MODIFY ORDER
     # _SL and _TP given in points. _price is only used for pending orders. 
     def _DWX_MTX_MODIFY_TRADE_BY_TICKET_(self, _ticket, _SL, _TP, _price=0):
         
         try:
-            self.temp_order_dict['_action'] = 'MODIFY'
-            self.temp_order_dict['_ticket'] = _ticket
-            self.temp_order_dict['_SL'] = _SL
-            self.temp_order_dict['_TP'] = _TP
-            self.temp_order_dict['_price'] = _price
+            _order = dict(self.temp_order_dict)
+            _order['_action'] = 'MODIFY'
+            _order['_ticket'] = _ticket
+            _order['_SL'] = _SL
+            _order['_TP'] = _TP
+            _order['_price'] = _price
             
             # Execute
-            self._DWX_MTX_SEND_COMMAND_(**self.temp_order_dict)
+            return self._DWX_MTX_SEND_COMMAND_(**_order)
             
         except KeyError:
             print("[ERROR] Order Ticket {} not found!".format(_ticket))
@@ -307,11 +598,12 @@ class DWX_ZeroMQ_Connector():
     def _DWX_MTX_CLOSE_TRADE_BY_TICKET_(self, _ticket):
         
         try:
-            self.temp_order_dict['_action'] = 'CLOSE'
-            self.temp_order_dict['_ticket'] = _ticket
+            _order = dict(self.temp_order_dict)
+            _order['_action'] = 'CLOSE'
+            _order['_ticket'] = _ticket
             
             # Execute
-            self._DWX_MTX_SEND_COMMAND_(**self.temp_order_dict)
+            return self._DWX_MTX_SEND_COMMAND_(**_order)
             
         except KeyError:
             print("[ERROR] Order Ticket {} not found!".format(_ticket))
@@ -320,12 +612,13 @@ class DWX_ZeroMQ_Connector():
     def _DWX_MTX_CLOSE_PARTIAL_BY_TICKET_(self, _ticket, _lots):
         
         try:
-            self.temp_order_dict['_action'] = 'CLOSE_PARTIAL'
-            self.temp_order_dict['_ticket'] = _ticket
-            self.temp_order_dict['_lots'] = _lots
+            _order = dict(self.temp_order_dict)
+            _order['_action'] = 'CLOSE_PARTIAL'
+            _order['_ticket'] = _ticket
+            _order['_lots'] = _lots
             
             # Execute
-            self._DWX_MTX_SEND_COMMAND_(**self.temp_order_dict)
+            return self._DWX_MTX_SEND_COMMAND_(**_order)
             
         except KeyError:
             print("[ERROR] Order Ticket {} not found!".format(_ticket))
@@ -334,11 +627,12 @@ class DWX_ZeroMQ_Connector():
     def _DWX_MTX_CLOSE_TRADES_BY_MAGIC_(self, _magic):
         
         try:
-            self.temp_order_dict['_action'] = 'CLOSE_MAGIC'
-            self.temp_order_dict['_magic'] = _magic
+            _order = dict(self.temp_order_dict)
+            _order['_action'] = 'CLOSE_MAGIC'
+            _order['_magic'] = _magic
             
             # Execute
-            self._DWX_MTX_SEND_COMMAND_(**self.temp_order_dict)
+            return self._DWX_MTX_SEND_COMMAND_(**_order)
             
         except KeyError:
             pass
@@ -347,10 +641,11 @@ class DWX_ZeroMQ_Connector():
     def _DWX_MTX_CLOSE_ALL_TRADES_(self):
         
         try:
-            self.temp_order_dict['_action'] = 'CLOSE_ALL'
+            _order = dict(self.temp_order_dict)
+            _order['_action'] = 'CLOSE_ALL'
             
             # Execute
-            self._DWX_MTX_SEND_COMMAND_(**self.temp_order_dict)
+            return self._DWX_MTX_SEND_COMMAND_(**_order)
             
         except KeyError:
             pass
@@ -359,10 +654,11 @@ class DWX_ZeroMQ_Connector():
     def _DWX_MTX_GET_ALL_OPEN_TRADES_(self):
         
         try:
-            self.temp_order_dict['_action'] = 'GET_OPEN_TRADES'
+            _order = dict(self.temp_order_dict)
+            _order['_action'] = 'GET_OPEN_TRADES'
                         
             # Execute
-            self._DWX_MTX_SEND_COMMAND_(**self.temp_order_dict)
+            return self._DWX_MTX_SEND_COMMAND_(**_order)
             
         except KeyError:
             pass
@@ -401,8 +697,51 @@ class DWX_ZeroMQ_Connector():
                                      _end)
 
         # Send via PUSH Socket
-        self.remote_send(self._PUSH_SOCKET, _msg)
+        return self.remote_send(self._PUSH_SOCKET, _msg)
+    
+    ##########################################################################
     
+    """
+    Function to get historic bars, from the HIST cache where possible
+    
+    Blocks until the bars from _start to _end (server time, 
+    "YYYY.MM.DD HH:MM:SS" or epoch seconds, _end=None is now) are 
+    available and returns them as an array of BAR_DTYPE records. With a 
+    _hist_cache, only the ranges not cached yet (usually just the tail 
+    since the last call) are requested from the server, and merged into 
+    the cache. Long ranges are fetched in chunks of _chunk_bars bars by a
+    DWX_ZMQ_Backfill (use one directly to get at the bars while they are
+    downloading). Chunks answered without data are requested again, up 
+    to _retries times, chunks without a reply within _timeout seconds are
+    missing from the result.
+    """
+    def _DWX_MTX_GET_HIST_(self,
+                           _symbol='EURUSD',
+                           _timeframe=1440,
+                           _start='2020.01.01 00:00:00',
+                           _end=None,
+                           _timeout=30.0,
+                           _retries=3,
+                           _chunk_bars=10000):
+        
+        _start = _to_epoch_(_start)
+        _end = _to_epoch_(Timestamp.now() if _end is None else _end)
+        
+        if self._hist_cache is None:
+            _missing = [(_start, _end)]
+        else:
+            _missing = self._hist_cache._missing_(_symbol, _timeframe, _start, _end)
+        
+        _fetched = [DWX_ZMQ_Backfill(self, _symbol, _timeframe, _from, _to,
+                                     _chunk_bars=_chunk_bars,
+                                     _retries=_retries,
+                                     _timeout=_timeout)._run_().latest()
+                    for _from, _to in _missing]
+        
+        if self._hist_cache is not None:
+            return self._hist_cache.range(_symbol, _timeframe, _start, _end)
+        
+        return np.concatenate(_fetched) if _fetched else _hist_bars_([])
     
     ##########################################################################
     """
@@ -416,7 +755,7 @@ class DWX_ZeroMQ_Connector():
           _msg = _msg + ";{}".format(s)
 
         # Send via PUSH Socket
-        self.remote_send(self._PUSH_SOCKET, _msg)
+        return self.remote_send(self._PUSH_SOCKET, _msg)
     
     
     ##########################################################################
@@ -431,7 +770,7 @@ class DWX_ZeroMQ_Connector():
           _msg = _msg + ";{};{}".format(i[1], i[2])
           
         # Send via PUSH Socket
-        self.remote_send(self._PUSH_SOCKET, _msg)
+        return self.remote_send(self._PUSH_SOCKET, _msg)
     
     
     ##########################################################################
@@ -453,7 +792,7 @@ class DWX_ZeroMQ_Connector():
                                                          _ticket)
         
         # Send via PUSH Socket
-        self.remote_send(self._PUSH_SOCKET, _msg)
+        _future = self.remote_send(self._PUSH_SOCKET, _msg)
         
         """
          compArray[0] = TRADE or DATA
@@ -482,12 +821,18 @@ class DWX_ZeroMQ_Connector():
          compArray[9] = Magic Number
          compArray[10] = Ticket Number (MODIFY/CLOSE)
          """
-        # pass
+        return _future
     
     ##########################################################################
     
     """
     Function to check Poller for new reponses (PULL) and market data (SUB)
+    
+    In drain mode (default) the thread only ever blocks in poll(), then 
+    reads every queued message on each ready socket (up to _drain_limit 
+    per socket and wakeup, so that neither socket can starve the other). 
+    Otherwise it sleeps _sleep_delay before each poll() and reads one 
+    message per socket, as earlier versions did.
     """
     
     def _DWX_ZMQ_Poll_Data_(self, 
@@ -496,114 +841,493 @@ class DWX_ZeroMQ_Connector():
         
         while self._ACTIVE:
             
-            sleep(self._sleep_delay) # poll timeout is in ms, sleep() is s.
+            if not self._drain:
+                sleep(self._sleep_delay) # poll timeout is in ms, sleep() is s.
             
-            sockets = dict(self._poller.poll(poll_timeout))
+            _timeout = poll_timeout
             
-            # Process response to commands sent to MetaTrader
+            # Notify conflated quotes that are due, wake up for the next one
+            if self._conflated:
+                _timeout = min(_timeout, self._DWX_ZMQ_Flush_Conflated_(poll_timeout))
+            
+            sockets = dict(self._poller.poll(_timeout))
+            
+            # Process responses to commands sent to MetaTrader
             if self._PULL_SOCKET in sockets and sockets[self._PULL_SOCKET] == zmq.POLLIN:
-                
-                if self._PULL_SOCKET_STATUS['state'] == True:
-                    try:
-                        
-                        # msg = self._PULL_SOCKET.recv_string(zmq.DONTWAIT)
-                        msg = self.remote_recv(self._PULL_SOCKET)
-                        
-                        # If data is returned, store as pandas Series
-                        if msg != '' and msg != None:
-                            
-                            try: 
-                                _data = eval(msg)
-                                if '_action' in _data and _data['_action'] == 'HIST':
-                                    _symbol = _data['_symbol']
-                                    if '_data' in _data.keys():
-                                        if _symbol not in self._History_DB.keys():
-                                            self._History_DB[_symbol] = {}
-                                        self._History_DB[_symbol] = _data['_data']
-                                    else:
-                                        print('No data found. MT4 often needs multiple requests when accessing data of symbols without open charts.')
-                                        print('message: ' + msg)
-                                
-                                # invokes data handlers on pull port
-                                for hnd in self._pulldata_handlers:
-                                    hnd.onPullData(_data)
-                                
-                                self._thread_data_output = _data
-                                if self._verbose:
-                                    print(_data) # default logic
-                                    
-                            except Exception as ex:
-                                _exstr = "Exception Type {0}. Args:\n{1!r}"
-                                _msg = _exstr.format(type(ex).__name__, ex.args)
-                                print(_msg)
-                   
-                    except zmq.error.Again:
-                        pass # resource temporarily unavailable, nothing to print
-                    except ValueError:
-                        pass # No data returned, passing iteration.
-                    except UnboundLocalError:
-                        pass # _symbol may sometimes get referenced before being assigned.
-                
-                else:
-                    print('\r[KERNEL] NO HANDSHAKE on PULL SOCKET.. Cannot READ data.', end='', flush=True)
+                self._DWX_ZMQ_Read_Pull_()
             
             # Receive new market data from MetaTrader
             if self._SUB_SOCKET in sockets and sockets[self._SUB_SOCKET] == zmq.POLLIN:
+                self._DWX_ZMQ_Read_Sub_(string_delimiter)
+        
+        print("\n++ [KERNEL] _DWX_ZMQ_Poll_Data_() Signing Out ++")
+    
+    ##########################################################################
+    
+    """
+    Function to read the responses queued on the PULL socket, once it 
+    polled ready (on the poller thread, or the DWX_ZMQ_Reactor's).
+    """
+    def _DWX_ZMQ_Read_Pull_(self):
+        
+        if self._PULL_SOCKET_STATUS['state'] != True:
+            print('\r[KERNEL] NO HANDSHAKE on PULL SOCKET.. Cannot READ data.', end='', flush=True)
+            return
+        
+        for _ in range(self._drain_limit if self._drain else 1):
+            try:
+                msg = self._PULL_SOCKET.recv_string(zmq.NOBLOCK)
+            except zmq.error.Again:
+                break # queue drained
+            
+            self._DWX_ZMQ_Process_Pull_(msg)
+    
+    ##########################################################################
+    
+    """
+    Function to read the market data queued on the SUB socket, once it 
+    polled ready (see _DWX_ZMQ_Read_Pull_()).
+    
+    SUB handlers that define onSubDataBatch(symbol, timestamps, bids, asks)
+    receive BID/ASK ticks once per symbol and wakeup instead of one 
+    onSubData(msg) call per tick (rates still go to onSubData). The arrays
+    are views over the symbol's DWX_ZMQ_TickBuffer (do not modify them), 
+    oldest tick first, valid until the buffer wraps around them.
+    """
+    def _DWX_ZMQ_Read_Sub_(self, string_delimiter=';'):
+        
+        _tick_hnds, _rate_hnds, _batch_hnds = self._DWX_ZMQ_Sub_Handlers_()
+        
+        # Ticks received in this burst: {SYMBOL: COUNT}
+        _burst = {}
+        
+        _multipart = self._sub_multipart
+        
+        for _ in range(self._drain_limit if self._drain else 1):
+            try:
+                if _multipart:
+                    # Frame: no copy, and no RCVMORE call to find the payload
+                    msg = self._SUB_SOCKET.recv(zmq.NOBLOCK, copy=False)
+                else:
+                    msg = self._SUB_SOCKET.recv_string(zmq.NOBLOCK)
+            except zmq.error.Again:
+                break # queue drained
+            
+            if not _multipart:
+                _symbol = self._DWX_ZMQ_Process_Sub_(msg, string_delimiter,
+                                                     _tick_hnds, _rate_hnds)
+            elif msg.more:
+                _symbol = self._DWX_ZMQ_Receive_Sub_Binary_(msg.bytes, string_delimiter,
+                                                            _tick_hnds, _rate_hnds)
+            else:
+                _symbol = self._DWX_ZMQ_Process_Sub_(msg.bytes.decode('utf-8'), string_delimiter,
+                                                     _tick_hnds, _rate_hnds)
+            
+            if _batch_hnds and _symbol is not None:
+                _burst[_symbol] = _burst.get(_symbol, 0) + 1
+        
+        # invokes batch data handlers on sub port, once per symbol
+        for _symbol, _n in _burst.items():
+            
+            if self._stats is not None:
+                _start = perf_counter_ns()
+            
+            _times, _bids, _asks = self._Market_Data_DB[_symbol].latest(_n)
+            
+            # One handler's error must not stop the poller, nor the other handlers
+            for hnd in _batch_hnds:
+                try:
+                    hnd.onSubDataBatch(_symbol, _times, _bids, _asks)
+                except Exception as ex:
+                    self._DWX_ZMQ_Handler_Error_(hnd, ex)
+            
+            if self._stats is not None:
+                self._stats._record_('sub_handlers', perf_counter_ns() - _start)
+    
+    ##########################################################################
+    
+    """
+    Function called by the DWX_ZMQ_Reactor on every wakeup (connectors 
+    created with _reactor): notifies conflated quotes that are due, 
+    returns the time (ms) until the next one.
+    """
+    def _DWX_ZMQ_Reactor_Timer_(self, poll_timeout=1000):
+        
+        if not self._conflated:
+            return poll_timeout
+        
+        return self._DWX_ZMQ_Flush_Conflated_(poll_timeout)
+    
+    ##########################################################################
+    
+    """
+    Function to process one response received through the PULL port
+    """
+    def _DWX_ZMQ_Process_Pull_(self, msg):
+        
+        if msg == '' or msg == None:
+            return
+        
+        _stats = self._stats
+        
+        if _stats is not None:
+            _received = perf_counter_ns()
+        
+        try: 
+            _data = self._decoder._decode_(msg)
+            
+            if _stats is not None:
+                _decoded = perf_counter_ns()
+                _stats._record_('decode', _decoded - _received)
+            
+            if '_action' in _data and _data['_action'] == 'HIST':
+                _symbol = _data['_symbol']
+                if '_data' in _data.keys():
+                    if _symbol not in self._History_DB.keys():
+                        self._History_DB[_symbol] = {}
+                    self._History_DB[_symbol] = _data['_data']
+                else:
+                    print('No data found. MT4 often needs multiple requests when accessing data of symbols without open charts.')
+                    print('message: ' + msg)
+            
+            # resolves the request this response belongs to
+            self._resolve_response_(_data, _received if _stats is not None else None)
+            
+            # invokes data handlers on pull port
+            for hnd in self._DWX_ZMQ_Dispatched_(self._pulldata_handlers):
+                try:
+                    hnd.onPullData(_data)
+                except Exception as ex:
+                    self._DWX_ZMQ_Handler_Error_(hnd, ex)
+            
+            if _stats is not None and self._pulldata_handlers:
+                _stats._record_('pull_handlers', perf_counter_ns() - _decoded)
+            
+            self._thread_data_output = _data
+            if self._verbose:
+                print(_data) # default logic
                 
+        except Exception as ex:
+            _exstr = "Exception Type {0}. Args:\n{1!r}"
+            _msg = _exstr.format(type(ex).__name__, ex.args)
+            print(_msg)
+    
+    ##########################################################################
+    
+    """
+    Function to route handlers through the dispatcher, if any. Wrapped when
+    called, so handlers added to the lists after construction are
+    dispatched too.
+    """
+    def _DWX_ZMQ_Dispatched_(self, _handlers):
+        
+        if self._dispatcher is None:
+            return _handlers
+        
+        return [self._dispatcher._wrap_(hnd) for hnd in _handlers]
+    
+    ##########################################################################
+    
+    """
+    Function to report an exception raised by a data handler. The poller 
+    carries on with the other handlers and messages.
+    """
+    def _DWX_ZMQ_Handler_Error_(self, hnd, ex):
+        
+        _exstr = "Exception Type {0}. Args:\n{1!r}"
+        print(_exstr.format(type(ex).__name__, ex.args))
+    
+    ##########################################################################
+    
+    """
+    Function to split SUB handlers into (per tick, per rate, batched)
+    """
+    def _DWX_ZMQ_Sub_Handlers_(self):
+        
+        _tick_hnds, _rate_hnds, _batch_hnds = [], [], []
+        
+        for hnd in self._DWX_ZMQ_Dispatched_(self._subdata_handlers):
+            
+            if hasattr(hnd, 'onSubDataBatch'):
+                _batch_hnds.append(hnd)
+            elif hasattr(hnd, 'onSubData'):
+                _tick_hnds.append(hnd)
+            
+            if hasattr(hnd, 'onSubData'):
+                _rate_hnds.append(hnd)
+        
+        return _tick_hnds, _rate_hnds, _batch_hnds
+    
+    ##########################################################################
+    
+    """
+    Function to process one message received through the SUB port. Returns
+    the symbol if it was a BID/ASK tick, None otherwise.
+    """
+    def _DWX_ZMQ_Process_Sub_(self, msg, string_delimiter=';',
+                              _tick_handlers=None,
+                              _rate_handlers=None):
+        
+        if msg == "":
+            return None
+        
+        _received = perf_counter_ns() if self._stats is not None else None
+        
+        try:
+            _symbol, _values = self._decoder._decode_sub_(msg, string_delimiter)
+        except ValueError:
+            return None # Not a market data message, passing iteration.
+        
+        return self._DWX_ZMQ_Store_Sub_(_symbol, _values, msg, string_delimiter,
+                                        _tick_handlers, _rate_handlers, _received)
+    
+    ##########################################################################
+    
+    """
+    Function to receive the payload frame of a binary SUB message, once 
+    its _topic frame (bytes) was received, and process it. 
+    
+    Payloads of topics no longer subscribed to (still queued when they 
+    were unsubscribed) are dropped before being decoded. With 
+    _sub_zero_copy, payloads are decoded straight from the ZeroMQ frame 
+    (a memoryview), without copying them: only worth it for payloads 
+    much larger than ticks and rates, which are cheaper to copy.
+    """
+    def _DWX_ZMQ_Receive_Sub_Binary_(self, _topic, string_delimiter=';',
+                                     _tick_handlers=None,
+                                     _rate_handlers=None):
+        
+        # Not checking for more frames (an RCVMORE call costs as much as the 
+        # recv): a third frame would be taken for a message, and ignored.
+        if self._sub_zero_copy:
+            _payload = self._SUB_SOCKET.recv(copy=False).buffer
+        else:
+            _payload = self._SUB_SOCKET.recv()
+        
+        # Before the prefixes: a decision made with stale prefixes can only
+        # go into a stale (replaced) dict
+        _topics = self._sub_topics
+        
+        try:
+            _symbol = _topics[_topic]
+        except KeyError:
+            _symbol = _topics[_topic] = self._DWX_ZMQ_Sub_Topic_(_topic)
+        
+        if _symbol is None:
+            return None
+        
+        return self._DWX_ZMQ_Process_Sub_Binary_(_symbol, _payload, string_delimiter,
+                                                 _tick_handlers, _rate_handlers)
+    
+    ##########################################################################
+    
+    """
+    Function to map a binary SUB topic (bytes) to its symbol, None if it 
+    matches no subscribed prefix (or is not a valid symbol).
+    """
+    def _DWX_ZMQ_Sub_Topic_(self, _topic):
+        
+        if not any(_topic.startswith(_prefix) for _prefix in self._sub_prefixes):
+            return None
+        
+        try:
+            return _topic.decode('ascii')
+        except UnicodeDecodeError:
+            return None
+    
+    ##########################################################################
+    
+    """
+    Function to process one binary message ([TOPIC, PAYLOAD] frames, see 
+    _DWX_MTX_SET_SUB_FORMAT_()) received through the SUB port. _topic may
+    be bytes or str, _payload any buffer. Returns the symbol if it was a 
+    BID/ASK tick, None otherwise.
+    """
+    def _DWX_ZMQ_Process_Sub_Binary_(self, _topic, _payload, string_delimiter=';',
+                                     _tick_handlers=None,
+                                     _rate_handlers=None):
+        
+        _received = perf_counter_ns() if self._stats is not None else None
+        
+        try:
+            _symbol, _values = self._decoder._decode_sub_binary_(_topic, _payload)
+        except UnicodeDecodeError:
+            return None # Not a market data message, passing iteration.
+        
+        return self._DWX_ZMQ_Store_Sub_(_symbol, _values, None, string_delimiter,
+                                        _tick_handlers, _rate_handlers, _received)
+    
+    ##########################################################################
+    
+    """
+    Function to store decoded SUB data and invoke SUB handlers. msg is the 
+    message as text, None if it was received in binary (it is only 
+    rebuilt if verbose or onSubData() handlers need it). _timestamp 
+    (UTC nanoseconds) replaces the receive time, e.g. for replayed ticks.
+    """
+    def _DWX_ZMQ_Store_Sub_(self, _symbol, _values, msg, string_delimiter=';',
+                            _tick_handlers=None,
+                            _rate_handlers=None,
+                            _received=None,
+                            _timestamp=None):
+        
+        # Receive time, UTC nanoseconds (a pandas Timestamp only for printing)
+        _now = time_ns() if _timestamp is None else _timestamp
+        
+        # Conflated symbol: overwrite its latest quote, handlers are 
+        # notified by _DWX_ZMQ_Flush_Conflated_()
+        if _symbol in self._conflated and _values is not None and len(_values) <= 3:
+            self._Market_Data_Latest[_symbol] = (_now,) + _values[:2] + (msg,)
+            return None
+        
+        _stats = self._stats if _received is not None else None
+        
+        if _tick_handlers is None:
+            _tick_handlers = self._DWX_ZMQ_Dispatched_(self._subdata_handlers)
+        
+        if _rate_handlers is None:
+            _rate_handlers = self._DWX_ZMQ_Dispatched_(self._subdata_handlers)
+        
+        # BID, ASK [, SERVER_TIME]
+        if _values is not None and len(_values) <= 3:
+            
+            if msg is None and (self._verbose or _tick_handlers):
+                msg = self._decoder._encode_sub_(_symbol, _values, string_delimiter)
+            
+            if self._verbose:
+                print("\n[" + _symbol + "] " + Timestamp(_now).isoformat(' ', 'microseconds') + " (" + msg.split(" ", 1)[1].replace(string_delimiter, "/") + ") BID/ASK")
+            
+            # Update Market Data DB
+            self._Market_Data_DB._append_(_symbol, _now, *_values)
+            
+            if _stats is not None:
+                _stored = perf_counter_ns()
+                _stats._record_('sub_store', _stored - _received)
+            
+            # invokes data handlers on sub port
+            for hnd in _tick_handlers:
                 try:
-                    msg = self._SUB_SOCKET.recv_string(zmq.DONTWAIT)
-                    
-                    if msg != "":
-
-                        _timestamp = str(Timestamp.now('UTC'))[:-6]
-                        _symbol, _data = msg.split(" ")
-                        if len(_data.split(string_delimiter)) == 2:
-                            _bid, _ask = _data.split(string_delimiter)   
-                                                                   
-                        
-                            if self._verbose:
-                                print("\n[" + _symbol + "] " + _timestamp + " (" + _bid + "/" + _ask + ") BID/ASK")                    
-                    
-                            # Update Market Data DB
-                            if _symbol not in self._Market_Data_DB.keys():
-                                self._Market_Data_DB[_symbol] = {}
-                            
-                            self._Market_Data_DB[_symbol][_timestamp] = (float(_bid), float(_ask))
-
-                        elif len(_data.split(string_delimiter)) == 8:
-                            _time, _open, _high, _low, _close, _tick_vol, _spread, _real_vol = _data.split(string_delimiter)
-                            if self._verbose:
-                                print("\n[" + _symbol + "] " + _timestamp + " (" + _time + "/" + _open + "/" + _high + "/" + _low + "/" + _close + "/" + _tick_vol + "/" + _spread + "/" + _real_vol + ") TIME/OPEN/HIGH/LOW/CLOSE/TICKVOL/SPREAD/VOLUME")                    
-                            # Update Market Rate DB
-                            if _symbol not in self._Market_Data_DB.keys():
-                                self._Market_Data_DB[_symbol] = {}
-                            self._Market_Data_DB[_symbol][_timestamp] = (int(_time), float(_open), float(_high), float(_low), float(_close), int(_tick_vol), int(_spread), int(_real_vol))
-
-                        # invokes data handlers on sub port
-                        for hnd in self._subdata_handlers:
-                            hnd.onSubData(msg)
-
-                except zmq.error.Again:
-                    pass # resource temporarily unavailable, nothing to print
-                except ValueError:
-                    pass # No data returned, passing iteration.
-                except UnboundLocalError:
-                    pass # _symbol may sometimes get referenced before being assigned.
-                    
-        print("\n++ [KERNEL] _DWX_ZMQ_Poll_Data_() Signing Out ++")
+                    hnd.onSubData(msg)
+                except Exception as ex:
+                    self._DWX_ZMQ_Handler_Error_(hnd, ex)
+            
+            if _stats is not None and _tick_handlers:
+                _stats._record_('sub_handlers', perf_counter_ns() - _stored)
+            
+            return _symbol
+        
+        if _values is not None:
+            
+            if msg is None and (self._verbose or _rate_handlers):
+                msg = self._decoder._encode_sub_(_symbol, _values, string_delimiter)
+            
+            if self._verbose:
+                print("\n[" + _symbol + "] " + Timestamp(_now).isoformat(' ', 'microseconds') + " (" + msg.split(" ", 1)[1].replace(string_delimiter, "/") + ") TIME/OPEN/HIGH/LOW/CLOSE/TICKVOL/SPREAD/VOLUME")
+            
+            # Update Market Rate DB
+            self._Market_Rates_DB._append_(_symbol, *_values)
+        
+        elif msg is None:
+            return None # Unknown binary payload
+        
+        if _stats is not None:
+            _stored = perf_counter_ns()
+            _stats._record_('sub_store', _stored - _received)
+        
+        # invokes data handlers on sub port
+        for hnd in _rate_handlers:
+            try:
+                hnd.onSubData(msg)
+            except Exception as ex:
+                self._DWX_ZMQ_Handler_Error_(hnd, ex)
+        
+        if _stats is not None and _rate_handlers:
+            _stats._record_('sub_handlers', perf_counter_ns() - _stored)
+        
+        return None
                 
     ##########################################################################
     
+    """
+    Function to notify SUB handlers of conflated quotes received since 
+    their last notification, if their interval has elapsed. Returns the 
+    time (ms) until the next pending notification is due, or poll_timeout.
+    """
+    def _DWX_ZMQ_Flush_Conflated_(self, poll_timeout=1000):
+        
+        _now = time_ns()
+        _next = None
+        _hnds = None
+        
+        for _symbol, _state in list(self._conflated.items()):
+            
+            _latest = self._Market_Data_Latest.get(_symbol)
+            
+            # Nothing new since the last notification
+            if _latest is None or _latest[0] == _state[2]:
+                continue
+            
+            if _now < _state[1]:
+                _next = _state[1] if _next is None else min(_next, _state[1])
+                continue
+            
+            _state[1] = _now + _state[0]
+            _state[2] = _latest[0]
+            
+            if _hnds is None:
+                _hnds = self._DWX_ZMQ_Sub_Handlers_()
+            
+            # invokes data handlers on sub port
+            for hnd in _hnds[0]:
+                try:
+                    hnd.onSubData(_latest[3] if _latest[3] is not None else
+                                  self._decoder._encode_sub_(_symbol, _latest[1:3],
+                                                             self._string_delimiter))
+                except Exception as ex:
+                    self._DWX_ZMQ_Handler_Error_(hnd, ex)
+            
+            for hnd in _hnds[2]:
+                try:
+                    hnd.onSubDataBatch(_symbol, 
+                                       np.array(_latest[:1], dtype=np.int64),
+                                       np.array(_latest[1:2]),
+                                       np.array(_latest[2:3]))
+                except Exception as ex:
+                    self._DWX_ZMQ_Handler_Error_(hnd, ex)
+        
+        if _next is None:
+            return poll_timeout
+        
+        return ceil((_next - _now) / 1e6)
+    
+    ##########################################################################
+    
     """
     Function to subscribe to given Symbol's BID/ASK feed from MetaTrader
+    
+    With _conflate (seconds), BID/ASK ticks for _symbol are not stored in
+    self._Market_Data_DB: only the latest one is kept, in 
+    self._Market_Data_Latest, and SUB handlers are notified of it at most 
+    once per _conflate seconds (0 = once per poller wakeup).
     """
     def _DWX_MTX_SUBSCRIBE_MARKETDATA_(self, 
-                                       _symbol='EURUSD'):
+                                       _symbol='EURUSD',
+                                       _conflate=None):
+        
+        if _conflate is None:
+            self._conflated.pop(_symbol, None)
+        else:
+            self._conflated[_symbol] = [int(_conflate * 1e9), 0, None]
         
         # Subscribe to SYMBOL first.
         self._SUB_SOCKET.setsockopt_string(zmq.SUBSCRIBE, _symbol)
+        self._sub_prefixes = self._sub_prefixes | {_symbol.encode()}
+        self._sub_topics = {}
         
-        print("[KERNEL] Subscribed to {} BID/ASK updates. See self._Market_Data_DB.".format(_symbol))
+        if _conflate is None:
+            print("[KERNEL] Subscribed to {} BID/ASK updates. See self._Market_Data_DB.".format(_symbol))
+        else:
+            print("[KERNEL] Subscribed to {} BID/ASK updates (conflated, {}s). See self._Market_Data_Latest.".format(_symbol, _conflate))
     
     """
     Function to unsubscribe to given Symbol's BID/ASK feed from MetaTrader
@@ -611,6 +1335,10 @@ class DWX_ZeroMQ_Connector():
     def _DWX_MTX_UNSUBSCRIBE_MARKETDATA_(self, _symbol):
         
         self._SUB_SOCKET.setsockopt_string(zmq.UNSUBSCRIBE, _symbol)
+        self._sub_prefixes = self._sub_prefixes - {_symbol.encode()}
+        self._sub_topics = {}
+        self._conflated.pop(_symbol, None)
+        self._Market_Data_Latest.pop(_symbol, None)
         print("\n**\n[KERNEL] Unsubscribing from " + _symbol + "\n**\n")
         
         
@@ -620,7 +1348,9 @@ class DWX_ZeroMQ_Connector():
     def _DWX_MTX_UNSUBSCRIBE_ALL_MARKETDATA_REQUESTS_(self):
         
         # 31-07-2019 12:22 CEST
-        for _symbol in self._Market_Data_DB.keys():
+        for _symbol in dict.fromkeys(list(self._Market_Data_DB.keys()) 
+                                     + list(self._Market_Rates_DB.keys())
+                                     + list(self._conflated.keys())):
             self._DWX_MTX_UNSUBSCRIBE_MARKETDATA_(_symbol=_symbol)
         
     ##########################################################################
@@ -636,59 +1366,133 @@ class DWX_ZeroMQ_Connector():
             
             # while monitor_socket.poll():
             while monitor_socket.poll(self._poll_timeout):
-                
-                try:
-                    evt = recv_monitor_message(monitor_socket, zmq.DONTWAIT)
-                    evt.update({'description': self._MONITOR_EVENT_MAP[evt['event']]})
-                    
-                    # print(f"\r[{socket_name} Socket] >> {evt['description']}", end='', flush=True)
-                    print(f"\n[{socket_name} Socket] >> {evt['description']}")
-                    
-                    # Set socket status on HANDSHAKE
-                    if evt['event'] == 4096:        # EVENT_HANDSHAKE_SUCCEEDED
-                        
-                        if socket_name == "PUSH":
-                            self._PUSH_SOCKET_STATUS['state'] = True
-                            self._PUSH_SOCKET_STATUS['latest_event'] = 'EVENT_HANDSHAKE_SUCCEEDED'
-                            
-                        elif socket_name == "PULL":
-                            self._PULL_SOCKET_STATUS['state'] = True
-                            self._PULL_SOCKET_STATUS['latest_event'] = 'EVENT_HANDSHAKE_SUCCEEDED'
-                            
-                        # print(f"\n[{socket_name} Socket] >> ..ready for action!\n")
-                            
-                    else:    
-                        # Update 'latest_event'
-                        if socket_name == "PUSH":
-                            self._PUSH_SOCKET_STATUS['state'] = False
-                            self._PUSH_SOCKET_STATUS['latest_event'] = evt['description']
-                            
-                        elif socket_name == "PULL":
-                            self._PULL_SOCKET_STATUS['state'] = False
-                            self._PULL_SOCKET_STATUS['latest_event'] = evt['description']
-                
-                    if evt['event'] == zmq.EVENT_MONITOR_STOPPED:
-                        
-                        # Reinitialize the socket
-                        if socket_name == "PUSH":
-                            monitor_socket = self._PUSH_SOCKET.get_monitor_socket()
-                        elif socket_name == "PULL":
-                            monitor_socket = self._PULL_SOCKET.get_monitor_socket()
-                        
-                except Exception as ex:
-                    _exstr = "Exception Type {0}. Args:\n{1!r}"
-                    _msg = _exstr.format(type(ex).__name__, ex.args)
-                    print(_msg)
+                monitor_socket = self._DWX_ZMQ_Monitor_Event_(socket_name, monitor_socket)
                
         # Close Monitor Socket
         monitor_socket.close()
         
         print(f"\n++ [KERNEL] {socket_name} _DWX_ZMQ_EVENT_MONITOR_() Signing Out ++")
+    
+    ##########################################################################
+    
+    """
+    Function to process one event received on the monitor socket of the
+    PUSH or PULL socket. Returns the monitor socket, reinitialized if 
+    monitoring was stopped.
+    """
+    def _DWX_ZMQ_Monitor_Event_(self, socket_name, monitor_socket):
+        
+        try:
+            evt = recv_monitor_message(monitor_socket, zmq.DONTWAIT)
+            evt.update({'description': self._MONITOR_EVENT_MAP[evt['event']]})
+            
+            # print(f"\r[{socket_name} Socket] >> {evt['description']}", end='', flush=True)
+            print(f"\n[{socket_name} Socket] >> {evt['description']}")
+            
+            # Set socket status on HANDSHAKE
+            if evt['event'] == 4096:        # EVENT_HANDSHAKE_SUCCEEDED
+                
+                if socket_name == "PUSH":
+                    self._PUSH_SOCKET_STATUS['state'] = True
+                    self._PUSH_SOCKET_STATUS['latest_event'] = 'EVENT_HANDSHAKE_SUCCEEDED'
+                    
+                elif socket_name == "PULL":
+                    self._PULL_SOCKET_STATUS['state'] = True
+                    self._PULL_SOCKET_STATUS['latest_event'] = 'EVENT_HANDSHAKE_SUCCEEDED'
+                    
+                # print(f"\n[{socket_name} Socket] >> ..ready for action!\n")
+                    
+            else:    
+                # Update 'latest_event'
+                if socket_name == "PUSH":
+                    self._PUSH_SOCKET_STATUS['state'] = False
+                    self._PUSH_SOCKET_STATUS['latest_event'] = evt['description']
+                    
+                elif socket_name == "PULL":
+                    self._PULL_SOCKET_STATUS['state'] = False
+                    self._PULL_SOCKET_STATUS['latest_event'] = evt['description']
+        
+            if evt['event'] == zmq.EVENT_MONITOR_STOPPED:
+                
+                # Reinitialize the socket
+                if socket_name == "PUSH":
+                    monitor_socket = self._PUSH_SOCKET.get_monitor_socket()
+                elif socket_name == "PULL":
+                    monitor_socket = self._PULL_SOCKET.get_monitor_socket()
+                
+        except Exception as ex:
+            _exstr = "Exception Type {0}. Args:\n{1!r}"
+            _msg = _exstr.format(type(ex).__name__, ex.args)
+            print(_msg)
+        
+        return monitor_socket
+    
+    ##########################################################################
+    
+    """
+    Function called by the DWX_ZMQ_Reactor when a monitor socket is 
+    readable (connectors created with _reactor and _monitor)
+    """
+    def _DWX_ZMQ_Reactor_Monitor_(self, socket_name):
+        
+        monitor_socket = self._monitor_sockets[socket_name]
+        _socket = self._DWX_ZMQ_Monitor_Event_(socket_name, monitor_socket)
+        
+        if _socket is not monitor_socket:
+            self._reactor._unregister_(monitor_socket)
+            monitor_socket.close()
+            
+            self._monitor_sockets[socket_name] = _socket
+            self._reactor._register_(_socket, partial(self._DWX_ZMQ_Reactor_Monitor_, socket_name))
             
     ##########################################################################
     
     def _DWX_ZMQ_HEARTBEAT_(self):
-        self.remote_send(self._PUSH_SOCKET, "HEARTBEAT;")
+        return self.remote_send(self._PUSH_SOCKET, "HEARTBEAT;")
+        
+    ##########################################################################
+    
+    """
+    Function to ask the server to publish SUB messages as 'BINARY' (two 
+    frames: the topic, then a fixed-layout payload, see SUB_TICK and 
+    SUB_RATE in DWX_ZMQ_Decoder) or 'TEXT' (the default). 
+    
+    Sent without waiting for a response (the returned Future resolves to 
+    None): servers that do not know SUB_FORMAT (e.g. 
+    DWX_ZeroMQ_Server_v2.0.1_RC8.mq4) do not respond, and keep publishing
+    text, which is still understood: binary messages are told apart by 
+    their number of frames. Servers that do (e.g. the simulator) respond 
+    with the format in use, received like any unrequested PULL message.
+    """
+    def _DWX_MTX_SET_SUB_FORMAT_(self, _format='BINARY'):
+        
+        # Read multipart messages before the server may start sending them
+        if _format == 'BINARY':
+            self._sub_multipart = True
+        
+        return self.remote_send(self._PUSH_SOCKET, "SUB_FORMAT;" + _format)
+        
+    ##########################################################################
+    
+    """
+    Function to get hot path latency percentiles (microseconds) by stage:
+    
+        send           remote_send() (PUSH lock + send)
+        response       command sent -> its response received
+        decode         decoding of a PULL message
+        pull_handlers  onPullData() handlers, per message
+        sub_store      SUB message received -> stored
+        sub_handlers   onSubData() / onSubDataBatch() handlers, per message / batch
+    
+    Empty unless the connector was created with _stats. Use 
+    self._stats._export_every_() to export them periodically instead.
+    """
+    def stats(self):
+        
+        if self._stats is None:
+            return {}
+        
+        return self._stats.stats()
         
     ##########################################################################
 
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+    benchmarks
+
+    Performance benchmarks for the Python side of the DWX ZeroMQ Connector,
+    run against local stand-ins for the MQL4 server (no MetaTrader needed):
+
+        bench_connector          End-to-end suite (command latency, tick
+                                 ingest, HIST decode, tick store memory),
+                                 with JSON output for regression comparison
+        bench_hist_decode        HIST reply decoding vs. eval()
+        bench_poller_throughput  Poller thread throughput, drain vs. sleep
+
+    Usage (from the v2.0.1/python folder):
+
+        python -m benchmarks.bench_connector --output results.json
+    --
+
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+    bench_connector.py
+
+    End-to-end benchmarks of DWX_ZeroMQ_Connector against the server
+    simulator (simulator/DWX_ZMQ_Server_Simulator.py):
+
+        commands  Round trip latency of _DWX_MTX_SEND_COMMAND_ (p50 / p99 /
+                  p99.9), from the call to the response being available
+        ingest    Sustained BID/ASK tick ingest rate through the SUB port
+        hist      HIST reply decode time per 1,000 bars
+        memory    Memory taken by _Market_Data_DB per million ticks
+
+    Results are printed and, with --output, written as JSON. Pass a previous
+    results file with --compare to print the relative change of every
+    metric.
+
+    Usage (from the v2.0.1/python folder):
+
+        python -m benchmarks.bench_connector --output results.json
+        python -m benchmarks.bench_connector --poll-timeout 100 --compare results.json
+    --
+
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+# Append path for main project folder
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from api.DWX_ZeroMQ_Connector_v2_0_1_RC8 import DWX_ZeroMQ_Connector
+from api.DWX_ZMQ_Decoder import DWX_ZMQ_Decoder
+from simulator.DWX_ZMQ_Server_Simulator import DWX_ZMQ_Server_Simulator
+from benchmarks.bench_hist_decode import _hist_reply_
+
+import json
+import argparse
+import platform
+import tracemalloc
+import zmq
+import numpy as np
+from itertools import cycle
+from datetime import datetime
+from time import perf_counter, perf_counter_ns, sleep
+
+##############################################################################
+
+def _percentiles_(_samples_ns):
+
+    _ms = np.asarray(_samples_ns, dtype=np.float64) / 1e6
+
+    return {'count': len(_ms),
+            'mean_ms': float(_ms.mean()),
+            'p50_ms': float(np.percentile(_ms, 50)),
+            'p99_ms': float(np.percentile(_ms, 99)),
+            'p99.9_ms': float(np.percentile(_ms, 99.9)),
+            'max_ms': float(_ms.max())}
+
+##############################################################################
+
+def _connector_(_port, _config, **_kwargs):
+
+    return DWX_ZeroMQ_Connector(_host='127.0.0.1',
+                                _PUSH_PORT=_port,
+                                _PULL_PORT=_port + 1,
+                                _SUB_PORT=_port + 2,
+                                _verbose=False,
+                                **dict(_config, **_kwargs))
+
+##############################################################################
+
+def _bench_commands_(_port, _config, _n=2000):
+
+    """
+    Sends _n OPEN commands one after the other, each waiting for its reply.
+    """
+
+    _sim = DWX_ZMQ_Server_Simulator(_host='127.0.0.1',
+                                    _PUSH_PORT=_port,
+                                    _PULL_PORT=_port + 1,
+                                    _PUB_PORT=_port + 2,
+                                    _max_orders=_n + 1)
+
+    _zmq = _connector_(_port, _config)
+
+    # Connection warm up
+    for _ in range(10):
+        _zmq._wait_response_(_zmq._DWX_ZMQ_HEARTBEAT_(), 5.0)
+
+    _samples = []
+    _lost = 0
+
+    for _ in range(_n):
+
+        _start = perf_counter_ns()
+        _response = _zmq._wait_response_(_zmq._DWX_MTX_SEND_COMMAND_(_action='OPEN'), 5.0)
+        _samples.append(perf_counter_ns() - _start)
+
+        if _response is None:
+            _lost += 1
+
+    _zmq._wait_response_(_zmq._DWX_MTX_CLOSE_ALL_TRADES_(), 30.0)
+
+    _zmq._DWX_ZMQ_SHUTDOWN_()
+    _sim._DWX_SIM_SHUTDOWN_()
+
+    return dict(_percentiles_(_samples), lost=_lost)
+
+##############################################################################
+
+def _bench_ingest_(_port, _config, _n=200000, _rate=1000000):
+
+    """
+    Replays _n ticks at up to _rate ticks/s and measures how many the
+    connector stores, and how fast.
+    """
+
+    _sim = DWX_ZMQ_Server_Simulator(_host='127.0.0.1',
+                                    _PUSH_PORT=_port,
+                                    _PULL_PORT=_port + 1,
+                                    _PUB_PORT=_port + 2,
+                                    _tick_rate=_rate)
+
+    _zmq = _connector_(_port, _config, _tick_capacity=_n)
+    _zmq._DWX_MTX_SUBSCRIBE_MARKETDATA_('EURUSD')
+    _zmq._DWX_MTX_SUBSCRIBE_MARKETDATA_('WARMUP')
+
+    _count = lambda _symbol: (_zmq._Market_Data_DB[_symbol]._count
+                              if _symbol in _zmq._Market_Data_DB else 0)
+
+    # Wait for the subscription to reach the publisher
+    _sim._tick_source = cycle((('WARMUP', 1.0, 2.0), ('WARMUP', 1.5, 2.5)))
+
+    while _count('WARMUP') == 0:
+        sleep(0.01)
+
+    # Prices alternate so that every tick differs from the previous one
+    _sim._tick_source = (('EURUSD', 1.1 + (i % 100) * 1e-5, 1.1002 + (i % 100) * 1e-5)
+                         for i in range(_n))
+
+    while _count('EURUSD') == 0:
+        sleep(0.0001)
+
+    _start = perf_counter()
+    _last, _last_change = 0, _start
+
+    # Until no tick arrived for 0.5 s
+    while perf_counter() - _last_change < 0.5:
+
+        sleep(0.001)
+
+        if _count('EURUSD') != _last:
+            _last, _last_change = _count('EURUSD'), perf_counter()
+
+    _received = _count('EURUSD')
+    _elapsed = _last_change - _start
+
+    _zmq._DWX_ZMQ_SHUTDOWN_()
+    _sim._DWX_SIM_SHUTDOWN_()
+
+    return {'sent': _n,
+            'received': _received,
+            'dropped_pct': 100.0 * (_n - _received) / _n,
+            'seconds': _elapsed,
+            'ticks_per_s': _received / _elapsed if _elapsed > 0 else float('nan')}
+
+##############################################################################
+
+def _bench_hist_(_sizes=(10000, 50000), _repeat=3):
+
+    _decoder = DWX_ZMQ_Decoder()
+    _results = {}
+
+    for _n_bars in _sizes:
+
+        _msg = _hist_reply_(_n_bars)
+        _best = float('inf')
+
+        for _ in range(_repeat):
+            _start = perf_counter()
+            _decoder._decode_(_msg)
+            _best = min(_best, perf_counter() - _start)
+
+        _results[str(_n_bars)] = {'bars': _n_bars,
+                                  'ms': _best * 1e3,
+                                  'ms_per_1k_bars': _best * 1e3 / (_n_bars / 1000)}
+
+    return _results
+
+##############################################################################
+
+def _bench_memory_(_port, _config, _n=1000000):
+
+    """
+    Feeds _n ticks for one symbol straight into the connector's SUB
+    processing (no sockets involved) and measures memory allocated.
+    """
+
+    _zmq = _connector_(_port, _config, _tick_capacity=_n)
+    _msgs = ['EURUSD {:.5f};{:.5f}'.format(1.1 + (i % 100) * 1e-5, 1.1002 + (i % 100) * 1e-5)
+             for i in range(1000)]
+
+    tracemalloc.start()
+    _before = tracemalloc.get_traced_memory()[0]
+
+    for i in range(_n):
+        _zmq._DWX_ZMQ_Process_Sub_(_msgs[i % 1000], ';')
+
+    _after, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Same again without tracemalloc's overhead, for the processing time
+    _start = perf_counter()
+
+    for i in range(_n):
+        _zmq._DWX_ZMQ_Process_Sub_(_msgs[i % 1000], ';')
+
+    _elapsed = perf_counter() - _start
+
+    _zmq._DWX_ZMQ_SHUTDOWN_()
+
+    return {'ticks': _n,
+            'mb_per_million_ticks': (_after - _before) / 1e6 / (_n / 1e6),
+            'peak_mb': (_peak - _before) / 1e6,
+            'process_us_per_tick': _elapsed / _n * 1e6}
+
+##############################################################################
+
+def _compare_(_old, _new, _path=''):
+
+    """
+    Prints the relative change of every numeric metric in _new vs _old.
+    """
+
+    for _key, _value in _new.items():
+
+        if _key not in _old:
+            continue
+
+        if isinstance(_value, dict):
+            _compare_(_old[_key], _value, _path + _key + '.')
+
+        elif isinstance(_value, (int, float)) and isinstance(_old[_key], (int, float)) and _old[_key]:
+            print('  {:<45} {:>14.4f} -> {:>14.4f} ({:+.1f}%)'.format(
+                _path + _key, _old[_key], _value, 100.0 * (_value - _old[_key]) / abs(_old[_key])))
+
+##############################################################################
+
+def _run_(_args):
+
+    _config = {'_poll_timeout': _args.poll_timeout,
+               '_sleep_delay': _args.sleep_delay,
+               '_drain': not _args.no_drain,
+               '_sub_format': _args.sub_format}
+
+    _results = {'timestamp': datetime.utcnow().isoformat(),
+                'python': platform.python_version(),
+                'pyzmq': zmq.pyzmq_version(),
+                'libzmq': zmq.zmq_version(),
+                'config': _config,
+                'results': {}}
+
+    print('[BENCH] Commands ({})..'.format(_args.commands))
+    _results['results']['commands'] = _bench_commands_(_args.base_port, _config, _args.commands)
+
+    print('[BENCH] Tick ingest ({})..'.format(_args.ticks))
+    _results['results']['ingest'] = _bench_ingest_(_args.base_port + 3, _config, _args.ticks)
+
+    print('[BENCH] HIST decode..')
+    _results['results']['hist'] = _bench_hist_()
+
+    print('[BENCH] Tick store memory ({})..'.format(_args.memory_ticks))
+    _results['results']['memory'] = _bench_memory_(_args.base_port + 6, _config, _args.memory_ticks)
+
+    print(json.dumps(_results, indent=4))
+
+    if _args.output:
+        with open(_args.output, 'w') as _file:
+            json.dump(_results, _file, indent=4)
+
+    if _args.compare:
+        with open(_args.compare) as _file:
+            print('\n[BENCH] Change vs. {}:'.format(_args.compare))
+            _compare_(json.load(_file)['results'], _results['results'])
+
+    return _results
+
+##############################################################################
+
+if __name__ == "__main__":
+
+    _parser = argparse.ArgumentParser(description='DWX ZeroMQ Connector benchmarks')
+    _parser.add_argument('--output', help='write results to this JSON file')
+    _parser.add_argument('--compare', help='previous JSON results to compare with')
+    _parser.add_argument('--commands', type=int, default=2000)
+    _parser.add_argument('--ticks', type=int, default=200000)
+    _parser.add_argument('--memory-ticks', type=int, default=1000000)
+    _parser.add_argument('--poll-timeout', type=int, default=1000, help='_poll_timeout (ms)')
+    _parser.add_argument('--sleep-delay', type=float, default=0.001, help='_sleep_delay (s)')
+    _parser.add_argument('--no-drain', action='store_true', help='_drain=False')
+    _parser.add_argument('--sub-format', default='TEXT', choices=('TEXT', 'BINARY'), help='_sub_format')
+    _parser.add_argument('--base-port', type=int, default=53768)
+
+    _run_(_parser.parse_args())
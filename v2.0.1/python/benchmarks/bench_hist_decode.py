@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+    bench_hist_decode.py
+    
+    Compares the throughput of DWX_ZMQ_Decoder against eval() and
+    ast.literal_eval() on HIST replies built exactly as DWX_GetHist() builds
+    them in the MQL4 server.
+    
+    Usage (from the v2.0.1/python folder):
+        
+        python benchmarks/bench_hist_decode.py [N_BARS ...]
+    --
+    
+    @author: Darwinex Labs (www.darwinex.com)
+    
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+    
+    Licensed under the BSD 3-Clause License, you may not use this file except 
+    in compliance with the License. 
+    
+    You may obtain a copy of the License at:    
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+# Append path for main project folder
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from api.DWX_ZMQ_Decoder import DWX_ZMQ_Decoder
+
+import ast
+import random
+from time import perf_counter
+
+##############################################################################
+
+def _hist_reply_(_n_bars, _symbol='EURUSD_M1', _seed=42):
+    
+    _rnd = random.Random(_seed)
+    _price = 1.10000
+    _bars = []
+    
+    for i in range(_n_bars):
+        
+        _open = _price
+        _close = _open + _rnd.gauss(0, 0.0002)
+        _high = max(_open, _close) + abs(_rnd.gauss(0, 0.0001))
+        _low = min(_open, _close) - abs(_rnd.gauss(0, 0.0001))
+        _price = _close
+        
+        _minutes = i % 1440
+        _bars.append("{'time':'2020.%02d.%02d %02d:%02d', 'open':%.8f, 'high':%.8f, "
+                     "'low':%.8f, 'close':%.8f, 'tick_volume':%d, 'spread':%d, "
+                     "'real_volume':0}" % (1 + (i // 40320) % 12, 1 + (i // 1440) % 28,
+                                           _minutes // 60, _minutes % 60,
+                                           _open, _high, _low, _close,
+                                           _rnd.randint(1, 500), _rnd.randint(0, 20)))
+    
+    return "{'_action': 'HIST', '_symbol': '" + _symbol + "', '_data': [" + ", ".join(_bars) + "]}"
+
+##############################################################################
+
+def _time_(_func, _msg, _repeat):
+    
+    _best = float('inf')
+    
+    for _ in range(_repeat):
+        _start = perf_counter()
+        _func(_msg)
+        _best = min(_best, perf_counter() - _start)
+    
+    return _best
+
+##############################################################################
+
+def _run_(_sizes=(10000, 50000), _repeat=3):
+    
+    _decoder = DWX_ZMQ_Decoder()
+    
+    for _n_bars in _sizes:
+        
+        _msg = _hist_reply_(_n_bars)
+        
+        # Sanity check before timing anything
+        assert _decoder._decode_(_msg) == eval(_msg)
+        
+        print('\n[HIST] {} bars, {:.1f} MB reply'.format(_n_bars, len(_msg) / 1e6))
+        
+        for _name, _func in (('eval', eval),
+                             ('ast.literal_eval', ast.literal_eval),
+                             ('DWX_ZMQ_Decoder', _decoder._decode_)):
+            
+            _t = _time_(_func, _msg, _repeat)
+            print('  {:<18} {:>10.2f} ms {:>14,.0f} bars/s'.format(_name, _t * 1e3, _n_bars / _t))
+
+##############################################################################
+
+if __name__ == "__main__":
+    
+    _sizes = [int(_arg) for _arg in sys.argv[1:]] or [10000, 50000]
+    _run_(_sizes)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+    bench_poller_throughput.py
+    
+    Measures how many messages per second DWX_ZeroMQ_Connector's poller 
+    thread processes, with and without drain mode, against a local stand-in 
+    for the MQL4 server: a PUB socket publishing BID/ASK ticks and a PUSH 
+    socket sending replies, both as fast as ZeroMQ accepts them.
+    
+    Usage (from the v2.0.1/python folder):
+        
+        python benchmarks/bench_poller_throughput.py [N_MESSAGES]
+    --
+    
+    @author: Darwinex Labs (www.darwinex.com)
+    
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+    
+    Licensed under the BSD 3-Clause License, you may not use this file except 
+    in compliance with the License. 
+    
+    You may obtain a copy of the License at:    
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+# Append path for main project folder
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from api.DWX_ZeroMQ_Connector_v2_0_1_RC8 import DWX_ZeroMQ_Connector
+
+import zmq
+from time import perf_counter, sleep
+
+##############################################################################
+
+class _Counter_():
+    
+    """
+    PULL data handler counting the replies processed by the poller thread.
+    """
+    
+    def __init__(self):
+        self._count = 0
+    
+    def onPullData(self, _data):
+        self._count += 1
+
+##############################################################################
+
+def _wait_(_done, _timeout=60.0):
+    
+    _start = perf_counter()
+    
+    while not _done():
+        if perf_counter() - _start > _timeout:
+            return False
+        sleep(0.0005)
+    
+    return True
+
+##############################################################################
+
+def _run_(_n=20000, _base_port=52768):
+    
+    _context = zmq.Context()
+    
+    # Stand-in server: PULL (commands), PUSH (replies), PUB (market data)
+    _commands = _context.socket(zmq.PULL)
+    _commands.bind('tcp://127.0.0.1:{}'.format(_base_port))
+    
+    _replies = _context.socket(zmq.PUSH)
+    _replies.bind('tcp://127.0.0.1:{}'.format(_base_port + 1))
+    
+    _market = _context.socket(zmq.PUB)
+    _market.setsockopt(zmq.SNDHWM, 0)
+    _market.bind('tcp://127.0.0.1:{}'.format(_base_port + 2))
+    
+    _tick = 'EURUSD 1.10234;1.10236'
+    _reply = "{'_action': 'heartbeat', '_response': 'loop'}"
+    
+    for _drain in (False, True):
+        
+        _counter = _Counter_()
+        _zmq = DWX_ZeroMQ_Connector(_host='127.0.0.1',
+                                    _PUSH_PORT=_base_port,
+                                    _PULL_PORT=_base_port + 1,
+                                    _SUB_PORT=_base_port + 2,
+                                    _pulldata_handlers=[_counter],
+                                    _verbose=False,
+                                    _drain=_drain,
+                                    _tick_capacity=_n)
+        
+        _zmq._SUB_SOCKET.setsockopt(zmq.RCVHWM, 0)
+        _zmq._DWX_MTX_SUBSCRIBE_MARKETDATA_('EURUSD')
+        
+        # Wait for the subscription to reach the publisher
+        _ticks = lambda: (_zmq._Market_Data_DB['EURUSD']._count
+                          if 'EURUSD' in _zmq._Market_Data_DB else 0)
+        
+        while _ticks() == 0:
+            _market.send_string(_tick)
+            sleep(0.01)
+        
+        _offset = _ticks()
+        
+        print('\n[{}]'.format('DRAIN' if _drain else 'SLEEP + ONE MESSAGE PER WAKEUP'))
+        
+        # SUB: BID/ASK ticks
+        _start = perf_counter()
+        
+        for _ in range(_n):
+            _market.send_string(_tick)
+        
+        _ok = _wait_(lambda: _ticks() - _offset >= _n)
+        _t = perf_counter() - _start
+        
+        print('  SUB  {:>8,} ticks   {:>8.3f} s {:>12,.0f} msg/s{}'.format(
+            _ticks() - _offset, _t, (_ticks() - _offset) / _t, '' if _ok else ' (timed out)'))
+        
+        # PULL: replies (PUSH blocks instead of dropping, nothing is lost)
+        _start = perf_counter()
+        
+        for _ in range(_n):
+            _replies.send_string(_reply)
+        
+        _ok = _wait_(lambda: _counter._count >= _n)
+        _t = perf_counter() - _start
+        
+        print('  PULL {:>8,} replies {:>8.3f} s {:>12,.0f} msg/s{}'.format(
+            _counter._count, _t, _counter._count / _t, '' if _ok else ' (timed out)'))
+        
+        _zmq._DWX_ZMQ_SHUTDOWN_()
+    
+    _context.destroy(0)
+
+##############################################################################
+
+if __name__ == "__main__":
+    
+    _n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    _run_(_n)
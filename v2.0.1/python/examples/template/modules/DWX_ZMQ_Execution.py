@@ -13,8 +13,6 @@
     https://opensource.org/licenses/BSD-3-Clause
 """
 
-from pandas import to_datetime
-from time import sleep
 
 class DWX_ZMQ_Execution():
     
@@ -31,40 +29,31 @@ class DWX_ZMQ_Execution():
         
         _check = ''
         
-        # Reset thread data output
-        self._zmq._set_response_(None)
+        # Response to this request only (other threads may be executing too)
+        _future = None
         
         # OPEN TRADE
         if _exec_dict['_action'] == 'OPEN':
             
             _check = '_action'
-            self._zmq._DWX_MTX_NEW_TRADE_(_order=_exec_dict)
+            _future = self._zmq._DWX_MTX_NEW_TRADE_(_order=_exec_dict)
             
         # CLOSE TRADE
         elif _exec_dict['_action'] == 'CLOSE':
             
             _check = '_response_value'
-            self._zmq._DWX_MTX_CLOSE_TRADE_BY_TICKET_(_exec_dict['_ticket'])
+            _future = self._zmq._DWX_MTX_CLOSE_TRADE_BY_TICKET_(_exec_dict['_ticket'])
             
         if _verbose:
             print('\n[{}] {} -> MetaTrader'.format(_exec_dict['_comment'],
                                                    str(_exec_dict)))
             
-        # While loop start time reference            
-        _ws = to_datetime('now')
+        # Wait for the response, up to (_delay * _wbreak) seconds
+        _response = self._zmq._wait_response_(_future, _delay * _wbreak)
         
-        # While data not received, sleep until timeout
-        while self._zmq._valid_response_('zmq') == False:
-            sleep(_delay)
-            
-            if (to_datetime('now') - _ws).total_seconds() > (_delay * _wbreak):
-                break
-        
-        # If data received, return DataFrame
-        if self._zmq._valid_response_('zmq'):
-            
-            if _check in self._zmq._get_response_().keys():
-                return self._zmq._get_response_()
+        # If data received, return it
+        if self._zmq._valid_response_(_response) and _check in _response.keys():
+            return _response
                 
         # Default
         return None
@@ -13,8 +13,7 @@
     https://opensource.org/licenses/BSD-3-Clause
 """
 
-from pandas import DataFrame, to_datetime
-from time import sleep
+from pandas import DataFrame
 
 class DWX_ZMQ_Reporting():
     
@@ -26,34 +25,20 @@ class DWX_ZMQ_Reporting():
     def _get_open_trades_(self, _trader='Trader_SYMBOL', 
                           _delay=0.1, _wbreak=10):
         
-        # Reset data output
-        self._zmq._set_response_(None)
-        
-        # Get open trades from MetaTrader
-        self._zmq._DWX_MTX_GET_ALL_OPEN_TRADES_()
+        # Get open trades from MetaTrader (response to this request only)
+        _future = self._zmq._DWX_MTX_GET_ALL_OPEN_TRADES_()
 
-        # While loop start time reference            
-        _ws = to_datetime('now')
-        
-        # While data not received, sleep until timeout
-        while self._zmq._valid_response_('zmq') == False:
-            
-            sleep(_delay)
-            
-            if (to_datetime('now') - _ws).total_seconds() > (_delay * _wbreak):
-                break
+        # Wait for the response, up to (_delay * _wbreak) seconds
+        _response = self._zmq._wait_response_(_future, _delay * _wbreak)
         
         # If data received, return DataFrame
-        if self._zmq._valid_response_('zmq'):
-            
-            _response = self._zmq._get_response_()
+        if (self._zmq._valid_response_(_response)
+            and '_trades' in _response.keys()
+            and len(_response['_trades']) > 0):
             
-            if ('_trades' in _response.keys()
-                and len(_response['_trades']) > 0):
-                
-                _df = DataFrame(data=_response['_trades'].values(),
-                                index=_response['_trades'].keys())
-                return _df[_df['_comment'] == _trader]
+            _df = DataFrame(data=_response['_trades'].values(),
+                            index=_response['_trades'].keys())
+            return _df[_df['_comment'] == _trader]
             
         # Default
         return DataFrame()
@@ -32,16 +32,24 @@ class DWX_ZMQ_Strategy(object):
                  _broker_gmt=3,                 # Darwinex GMT offset
                  _pulldata_handlers = [],       # Handlers to process data received through PULL port.
                  _subdata_handlers = [],        # Handlers to process data received through SUB port.
-                 _verbose=False):               # Print ZeroMQ messages
+                 _verbose=False,                # Print ZeroMQ messages
+                 _zmq=None):                    # Connector to use instead of a new one (e.g. DWX_ZMQ_Replay_Connector)
                  
         self._name = _name
         self._symbols = _symbols
         self._broker_gmt = _broker_gmt
         
         # Not entirely necessary here.
-        self._zmq = DWX_ZeroMQ_Connector(_pulldata_handlers=_pulldata_handlers,
-                                         _subdata_handlers=_subdata_handlers,
-                                         _verbose=_verbose)
+        if _zmq is None:
+            _zmq = DWX_ZeroMQ_Connector(_pulldata_handlers=_pulldata_handlers,
+                                        _subdata_handlers=_subdata_handlers,
+                                        _verbose=_verbose)
+        else:
+            # Replaced, not modified: the poller may be iterating them
+            _zmq._pulldata_handlers = _zmq._pulldata_handlers + list(_pulldata_handlers)
+            _zmq._subdata_handlers = _zmq._subdata_handlers + list(_subdata_handlers)
+        
+        self._zmq = _zmq
         
         # Modules
         self._execution = DWX_ZMQ_Execution(self._zmq)
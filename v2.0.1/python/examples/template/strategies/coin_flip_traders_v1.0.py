@@ -45,7 +45,7 @@ sys.path.append('../../..')
 from examples.template.strategies.base.DWX_ZMQ_Strategy import DWX_ZMQ_Strategy
 
 from pandas import Timedelta, to_datetime
-from threading import Thread, Lock
+from threading import Thread, Lock, Semaphore
 from time import sleep
 import random
 
@@ -66,12 +66,14 @@ class coin_flip_traders(DWX_ZMQ_Strategy):
                  _verbose=False, 
                  
                  _max_trades=1,
-                 _close_t_delta=5):
+                 _close_t_delta=5,
+                 _zmq=None):
         
         super().__init__(_name,
                          _symbols,
                          _broker_gmt,
-                         _verbose)
+                         _verbose=_verbose,
+                         _zmq=_zmq)
         
         # This strategy's variables
         self._traders = []
@@ -81,8 +83,15 @@ class coin_flip_traders(DWX_ZMQ_Strategy):
         self._delay = _delay
         self._verbose = _verbose
         
-        # lock for acquire/release of ZeroMQ connector
-        self._lock = Lock()
+        # lock for acquire/release of ZeroMQ connector. Without correlation
+        # ids, responses are told apart by their '_action' only: traders 
+        # take turns. With them, each request waits for its own response,
+        # so there is a permit for every trader (and the updater) to have 
+        # commands in flight concurrently.
+        if self._zmq._correlation_ids:
+            self._lock = Semaphore(len(self._symbols) + 1)
+        else:
+            self._lock = Lock()
         
     ##########################################################################
     
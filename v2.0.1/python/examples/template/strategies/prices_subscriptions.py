@@ -77,7 +77,8 @@ class prices_subscriptions(DWX_ZMQ_Strategy):
                  _symbols=['EURUSD','GDAXI'],
                  _delay=0.1,
                  _broker_gmt=3,
-                 _verbose=False):
+                 _verbose=False,
+                 _zmq=None):
         
         # call DWX_ZMQ_Strategy constructor and passes itself as data processor for handling
         # received data on PULL and SUB ports 
@@ -86,7 +87,8 @@ class prices_subscriptions(DWX_ZMQ_Strategy):
                          _broker_gmt,
                          [self],      # Registers itself as handler of pull data via self.onPullData()
                          [self],      # Registers itself as handler of sub data via self.onSubData()
-                         _verbose)
+                         _verbose,
+                         _zmq)        # e.g. a DWX_ZMQ_Replay_Connector to backtest on recorded ticks
         
         # This strategy's variables
         self._symbols = _symbols
@@ -10,7 +10,7 @@
     
     After receiving 5 rates from EURUSD_M1 it cancels its feed 
     and waits 3 rates from GDAXI. At this point it cancels all rate feeds. Then it prints 
-    _zmq._Market_Data_DB dictionary and finishes. 
+    _zmq._Market_Rates_DB dictionary and finishes. 
 
     
     -------------------
@@ -141,7 +141,7 @@ class rates_subscriptions(DWX_ZMQ_Strategy):
           # finishes (removes all subscriptions)  
           self.stop()
           #prints dictionary
-          print(self._zmq._Market_Data_DB)
+          print(self._zmq._Market_Rates_DB)
         
         
     ##########################################################################    
@@ -0,0 +1,508 @@
+# -*- coding: utf-8 -*-
+"""
+    DWX_ZMQ_Replay.py
+
+    Offline replay of recorded ticks through the connector's interface, to
+    backtest strategies written against DWX_ZeroMQ_Connector without a
+    MetaTrader terminal (or any socket):
+
+        _zmq = DWX_ZMQ_Replay_Connector(DWX_ZMQ_Journal('journal').ticks('2020.01.02'),
+                                        _speed=None)
+
+        _strategy = prices_subscriptions(_zmq=_zmq)
+        _strategy.run()
+
+        _zmq._DWX_REPLAY_START_()
+        _zmq._DWX_REPLAY_WAIT_()
+
+        print(_zmq._DWX_REPLAY_TRADES_())
+
+    DWX_ZMQ_Replay_Connector is a DWX_ZeroMQ_Connector whose commands are
+    answered in-process by DWX_ZMQ_Replay_Server (the server simulator's
+    command handling, filling orders at the replayed BID/ASK) and whose
+    SUB data comes from the recorded ticks, stamped with their recorded
+    times. The _DWX_MTX_* methods, handlers, _Market_Data_DB, futures and
+    stats all work as they do live.
+    --
+
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+import numpy as np
+from itertools import islice
+from threading import Thread, Lock, Event
+from concurrent.futures import Future
+from time import perf_counter, perf_counter_ns, sleep
+from pandas import DataFrame, Timestamp, to_datetime
+
+from api.DWX_ZeroMQ_Connector_v2_0_1_RC8 import DWX_ZeroMQ_Connector
+from simulator.DWX_ZMQ_Server_Simulator import DWX_ZMQ_Server_Simulator, SYMBOLS, _ORDER_TYPES_MARKET
+
+##############################################################################
+
+# Pending order types: {TYPE: (MARKET TYPE, TRIGGER)}, as in MetaTrader
+_PENDING = {2: (0, lambda _bid, _ask, _price: _ask <= _price),     # OP_BUYLIMIT
+            3: (1, lambda _bid, _ask, _price: _bid >= _price),     # OP_SELLLIMIT
+            4: (0, lambda _bid, _ask, _price: _ask >= _price),     # OP_BUYSTOP
+            5: (1, lambda _bid, _ask, _price: _bid <= _price)}     # OP_SELLSTOP
+
+##############################################################################
+
+class DWX_ZMQ_Replay_Server(DWX_ZMQ_Server_Simulator):
+
+    """
+    In-process server for replays: the simulator's command handling, with
+    the replayed quotes and clock instead of simulated ones.
+
+    Market orders are filled at the last replayed BID/ASK (no quote yet:
+    error 136, off quotes). On every tick of a symbol with open orders,
+    pending orders whose price was reached become market orders, and
+    market orders whose SL / TP was reached are closed at the tick's
+    price, as the trade server would do. Closed trades are kept in
+    _closed. HIST is not available.
+    """
+
+    def __init__(self,
+                 _symbols=SYMBOLS,          # {SYMBOL: (BASE_PRICE, SPREAD_POINTS, DIGITS, CONTRACT_SIZE)}
+                 _track_prices=(),          # Symbols tracked before any TRACK_PRICES command
+                 _max_orders=1,             # MaximumOrders input of the EA
+                 _max_lot_size=0.01,        # MaximumLotSize input of the EA
+                 _dma_mode=True,            # DMA_MODE input of the EA
+                 _broker_gmt=0,             # Server time offset from UTC (hours)
+                 _verbose=False):           # Print commands and responses
+
+        super().__init__(_symbols=_symbols,
+                         _tick_rate=0,
+                         _track_prices=(),
+                         _max_orders=_max_orders,
+                         _max_lot_size=_max_lot_size,
+                         _dma_mode=_dma_mode,
+                         _verbose=_verbose,
+                         _bind=False)
+
+        # Unknown symbols are added with their first tick
+        self._track_prices = list(_track_prices)
+        self._broker_offset = int(_broker_gmt * 3600)
+
+        # Replay clock (UTC nanoseconds) and last quotes: {SYMBOL: (BID, ASK)}
+        self._time_ns = 0
+        self._quotes = {}
+
+        # Closed trades: [{'_ticket': .., '_symbol': .., ..}]
+        self._closed = []
+        self._close_reason = 'CLOSE'
+
+    ##########################################################################
+
+    def _server_time_(self):
+        return self._time_ns // 10**9 + self._broker_offset
+
+    ##########################################################################
+
+    def _bid_ask_(self, _symbol):
+        return self._quotes.get(_symbol, (0.0, 0.0))
+
+    ##########################################################################
+
+    def _tick_(self, _time_ns, _symbol, _bid, _ask):
+
+        self._time_ns = _time_ns
+        self._quotes[_symbol] = (_bid, _ask)
+
+        if _symbol not in self._symbols:
+            self._symbols[_symbol] = (_bid, 0, 5, 100000)
+
+        if self._orders:
+            self._trigger_(_symbol, _bid, _ask)
+
+    ##########################################################################
+
+    def _trigger_(self, _symbol, _bid, _ask):
+
+        for _ticket, _order in list(self._orders.items()):
+
+            if _order['_symbol'] != _symbol:
+                continue
+
+            _type = _order['_type']
+
+            if _type in _PENDING:
+
+                _market, _reached = _PENDING[_type]
+
+                if _reached(_bid, _ask, _order['_open_price']):
+                    _order['_type'] = _market
+                    _order['_open_price'] = _ask if _market == 0 else _bid
+                    _order['_open_time'] = self._server_time_()
+
+                continue
+
+            _price = _bid if _type == 0 else _ask
+            _dir = 1 if _type == 0 else -1
+
+            if _order['_SL'] and (_price - _order['_SL']) * _dir <= 0:
+                self._close_reason = 'SL'
+            elif _order['_TP'] and (_price - _order['_TP']) * _dir >= 0:
+                self._close_reason = 'TP'
+            else:
+                continue
+
+            self._close_at_market_(_ticket)
+            self._close_reason = 'CLOSE'
+
+    ##########################################################################
+
+    def _open_order_(self, _comp):
+
+        _symbol = _comp[3] if _comp[3] != 'NULL' else next(iter(self._symbols))
+
+        if self._to_int_(_comp[2]) in _ORDER_TYPES_MARKET and _symbol not in self._quotes:
+            return "'_action': 'EXECUTION', '_response': '136', 'response_value': 'off quotes'"
+
+        return super()._open_order_(_comp)
+
+    ##########################################################################
+
+    def _close_at_market_(self, _ticket, _lots=-1):
+
+        _order = self._orders[_ticket]
+        _ret = super()._close_at_market_(_ticket, _lots)
+
+        _price = self._close_price_(_order)
+        _closed = _order['_lots'] if _lots < 0.01 or _lots > _order['_lots'] else _lots
+        _dir = 1 if _order['_type'] == 0 else -1
+
+        self._closed.append(dict(_order,
+                                 _ticket=_ticket,
+                                 _lots=_closed,
+                                 _close_price=_price,
+                                 _close_time=self._server_time_(),
+                                 _reason=self._close_reason,
+                                 _pnl=round((_price - _order['_open_price']) * _dir * _closed
+                                            * self._symbols[_order['_symbol']][3], 2)))
+
+        return _ret
+
+    ##########################################################################
+
+    def _track_prices_(self, _symbols):
+
+        # Any symbol may be in the recorded ticks
+        for _symbol in _symbols:
+            self._symbols.setdefault(_symbol, (0.0, 0, 5, 100000))
+
+        return super()._track_prices_(_symbols)
+
+    ##########################################################################
+
+    def _get_hist_(self, _comp):
+        return "'_action': 'HIST', '_symbol': '%s', '_response': 'NOT_AVAILABLE'" % _comp[1]
+
+##############################################################################
+
+class DWX_ZMQ_Replay_Connector(DWX_ZeroMQ_Connector):
+
+    """
+    DWX_ZeroMQ_Connector replaying _ticks: an array of TICK_RECORDs (e.g.
+    DWX_ZMQ_Journal.ticks()), a list of them (e.g. one per day) or an
+    iterable of (TIMESTAMP_NS, SYMBOL, BID, ASK), in time order.
+
+    Once _DWX_REPLAY_START_() is called, a thread feeds the ticks of the
+    symbols that are both tracked (TRACK_PRICES, or _track_prices) and
+    subscribed to (_DWX_MTX_SUBSCRIBE_MARKETDATA_) to _Market_Data_DB and
+    the SUB handlers, exactly as the poller thread would: at the recorded
+    pace (_speed=1), _speed times faster, or as fast as possible
+    (_speed=None). onSubDataBatch() handlers receive up to _batch ticks
+    per call.
+
+    Commands are answered synchronously, at the current replayed quotes:
+    their Future is resolved (and PULL handlers called) before the
+    _DWX_MTX_* method returns. Strategies that time themselves with the
+    wall clock (sleep(), 'now') only make sense at _speed=1; others can
+    use _DWX_REPLAY_TIME_(). TRACK_RATES instruments are not replayed.
+    """
+
+    def __init__(self,
+                 _ticks,
+                 _speed=None,               # Replay speed (1 = recorded pace, None = as fast as possible)
+                 _batch=1000,               # Max. ticks per onSubDataBatch() call
+                 _symbols=SYMBOLS,          # {SYMBOL: (BASE_PRICE, SPREAD_POINTS, DIGITS, CONTRACT_SIZE)}
+                 _track_prices=(),          # Symbols tracked before any TRACK_PRICES command
+                 _max_orders=1,             # MaximumOrders input of the EA
+                 _max_lot_size=0.01,        # MaximumLotSize input of the EA
+                 _broker_gmt=0,             # Server time offset from UTC (hours)
+                 _verbose=False,            # Print ZeroMQ messages
+                 **_kwargs):                # DWX_ZeroMQ_Connector arguments (not ports)
+
+        self._server = DWX_ZMQ_Replay_Server(_symbols=_symbols,
+                                             _track_prices=_track_prices,
+                                             _max_orders=_max_orders,
+                                             _max_lot_size=_max_lot_size,
+                                             _broker_gmt=_broker_gmt)
+
+        # Commands (strategy threads) vs. ticks (replay thread)
+        self._server_lock = Lock()
+
+        self._ticks = _ticks
+        self._speed = _speed
+        self._batch = _batch
+
+        self._replay_thread = None
+        self._replay_stop = Event()
+        self._replay_done = Event()
+        self._replayed = 0
+
+        # First exception raised by a handler (or the replay itself), if any
+        self._replay_error = None
+
+        # Sockets over an in-process endpoint nobody binds: never any traffic
+        super().__init__(_protocol='inproc',
+                         _host='dwx-replay-{}'.format(id(self)),
+                         _verbose=_verbose,
+                         **_kwargs)
+
+    ##########################################################################
+
+    """
+    Function to answer a command in-process (instead of sending it through
+    the PUSH port). Returns a resolved Future, as remote_send() would
+    once the response arrives.
+    """
+    def remote_send(self, _socket, _data):
+
+        _future = Future()
+
+        _action = self._decoder._reply_action_(_data, self._string_delimiter)
+
+        if _action is None:
+            _future.set_result(None)
+
+        else:
+            _id = str(next(self._request_ids))
+
+            with self._pending_lock:
+                self._pending_requests[_id] = (_action, _future, perf_counter_ns())
+
+            if self._correlation_ids:
+                _data = '#' + _id + self._string_delimiter + _data
+
+        with self._server_lock:
+            _reply = self._server._DWX_SIM_Handle_(_data)
+
+        if _reply is not None:
+            self._DWX_ZMQ_Process_Pull_(_reply)
+
+        return _future
+
+    ##########################################################################
+
+    def _DWX_REPLAY_START_(self):
+
+        if self._replay_thread is not None:
+            return
+
+        self._replay_thread = Thread(target=self._DWX_REPLAY_Run_, name='DWX_ZMQ_Replay')
+        self._replay_thread.daemon = True
+        self._replay_thread.start()
+
+    ##########################################################################
+
+    def _DWX_REPLAY_WAIT_(self, _timeout=None):
+
+        """
+        Blocks until all ticks were replayed (or _timeout seconds). Returns
+        True if the replay is over. Handlers' exceptions do not stop the
+        replay: the first one is kept in self._replay_error.
+        """
+
+        return self._replay_done.wait(_timeout)
+
+    ##########################################################################
+
+    def _DWX_REPLAY_STOP_(self):
+
+        self._replay_stop.set()
+
+        if self._replay_thread is not None:
+            self._replay_thread.join()
+
+    ##########################################################################
+
+    def _DWX_REPLAY_TIME_(self):
+
+        """
+        Returns the replay clock: the time of the last replayed tick (UTC).
+        """
+
+        return Timestamp(self._server._time_ns)
+
+    ##########################################################################
+
+    def _DWX_REPLAY_TRADES_(self):
+
+        """
+        Returns the trades closed so far (by command, SL or TP) as a
+        DataFrame indexed by ticket, with _open_time and _close_time as
+        (broker) server time Timestamps.
+        """
+
+        with self._server_lock:
+            _closed = list(self._server._closed)
+
+        if len(_closed) == 0:
+            return DataFrame()
+
+        _trades = DataFrame(_closed).set_index('_ticket')
+
+        # Kept as epoch seconds by the server
+        for _column in ('_open_time', '_close_time'):
+            _trades[_column] = to_datetime(_trades[_column], unit='s')
+
+        return _trades
+
+    ##########################################################################
+
+    def _DWX_ZMQ_SHUTDOWN_(self):
+
+        self._DWX_REPLAY_STOP_()
+
+        super()._DWX_ZMQ_SHUTDOWN_()
+
+    ##########################################################################
+
+    def _chunks_(self):
+
+        """
+        (TIMESTAMPS, SYMBOLS, BIDS, ASKS) lists of up to _batch ticks.
+        """
+
+        _arrays = [self._ticks] if isinstance(self._ticks, np.ndarray) else self._ticks
+
+        if isinstance(_arrays, (list, tuple)) and all(isinstance(_array, np.ndarray) for _array in _arrays):
+
+            for _array in _arrays:
+                for _start in range(0, len(_array), self._batch):
+
+                    _chunk = _array[_start:_start + self._batch]
+
+                    yield (_chunk['time'].tolist(),
+                           np.char.decode(_chunk['symbol'], 'ascii').tolist(),
+                           _chunk['bid'].tolist(),
+                           _chunk['ask'].tolist())
+
+        else:
+            _ticks = iter(self._ticks)
+
+            while True:
+
+                _chunk = list(islice(_ticks, self._batch))
+
+                if len(_chunk) == 0:
+                    return
+
+                yield tuple(map(list, zip(*_chunk)))
+
+    ##########################################################################
+
+    def _DWX_REPLAY_Run_(self):
+
+        _delimiter = self._string_delimiter
+        _server = self._server
+
+        # Tracked (server) and subscribed (client) symbols, cached until changed
+        _tracked, _prefixes, _published = None, None, {}
+
+        _start_ns = _start_wall = None
+
+        try:
+            for _times, _symbols, _bids, _asks in self._chunks_():
+
+                _tick_hnds, _rate_hnds, _batch_hnds = self._DWX_ZMQ_Sub_Handlers_()
+                _burst = {}
+
+                for _time, _symbol, _bid, _ask in zip(_times, _symbols, _bids, _asks):
+
+                    if self._replay_stop.is_set() or not self._ACTIVE:
+                        return
+
+                    # Recorded pace: wait for the tick's time (handlers get what is due first)
+                    if self._speed:
+
+                        if _start_ns is None:
+                            _start_ns, _start_wall = _time, perf_counter()
+
+                        _wait = _start_wall + (_time - _start_ns) / 1e9 / self._speed - perf_counter()
+
+                        if _wait > 0:
+                            self._DWX_REPLAY_Notify_(_burst, _batch_hnds)
+                            _burst = {}
+                            sleep(_wait)
+
+                    with self._server_lock:
+                        _server._tick_(_time, _symbol, _bid, _ask)
+
+                    if _server._track_prices is not _tracked or self._sub_prefixes is not _prefixes:
+                        _tracked, _prefixes, _published = _server._track_prices, self._sub_prefixes, {}
+
+                    try:
+                        _publish = _published[_symbol]
+                    except KeyError:
+                        _publish = _published[_symbol] = (_symbol in _tracked and
+                                                          self._DWX_ZMQ_Sub_Topic_(_symbol.encode()) is not None)
+
+                    if not _publish:
+                        continue
+
+                    _received = perf_counter_ns() if self._stats is not None else None
+
+                    if self._DWX_ZMQ_Store_Sub_(_symbol, (_bid, _ask), None, _delimiter,
+                                                _tick_hnds, _rate_hnds, _received, _time) is not None:
+                        _burst[_symbol] = _burst.get(_symbol, 0) + 1
+
+                    self._replayed += 1
+
+                self._DWX_REPLAY_Notify_(_burst, _batch_hnds)
+
+        except Exception as ex:
+            self._DWX_ZMQ_Handler_Error_(None, ex)
+
+        finally:
+            self._replay_done.set()
+
+    ##########################################################################
+
+    def _DWX_REPLAY_Notify_(self, _burst, _batch_hnds):
+
+        # invokes batch data handlers on sub port, once per symbol
+        for _symbol, _n in _burst.items():
+
+            if _batch_hnds:
+                _times, _bids, _asks = self._Market_Data_DB[_symbol].latest(_n)
+
+                # One handler's error must not stop the replay, nor the other handlers
+                for hnd in _batch_hnds:
+                    try:
+                        hnd.onSubDataBatch(_symbol, _times, _bids, _asks)
+                    except Exception as ex:
+                        self._DWX_ZMQ_Handler_Error_(hnd, ex)
+
+    ##########################################################################
+
+    def _DWX_ZMQ_Handler_Error_(self, hnd, ex):
+
+        super()._DWX_ZMQ_Handler_Error_(hnd, ex)
+
+        if self._replay_error is None:
+            self._replay_error = ex
+
+    ##########################################################################
+
+##############################################################################
@@ -0,0 +1,889 @@
+# -*- coding: utf-8 -*-
+"""
+    DWX_ZMQ_Server_Simulator.py
+
+    Pure Python stand-in for DWX_ZeroMQ_Server_v2.0.1_RC8.mq4, to run the
+    connector, the example strategies and the benchmarks without a
+    MetaTrader terminal.
+
+    It binds the same PUSH / PULL / PUB ports, understands the same commands
+    (TRADE, HIST, TRACK_PRICES, TRACK_RATES, HEARTBEAT, with an optional
+    "#ID;" correlation prefix) and replies in the same format. It also 
+    understands SUB_FORMAT;BINARY|TEXT, after which market data is 
+    published as [TOPIC, PAYLOAD] frames (see SUB_TICK / SUB_RATE in 
+    api/DWX_ZMQ_Decoder.py) instead of "TOPIC VALUES" strings. Orders are
+    kept in memory and filled at the simulated BID/ASK. Prices are a
+    deterministic function of (symbol, time), so HIST replies for
+    overlapping ranges always agree.
+
+    Ticks for the symbols tracked with TRACK_PRICES are published at
+    _tick_rate ticks per second and symbol, or replayed from _tick_source
+    (an iterable of (SYMBOL, BID, ASK)) at _tick_rate messages per second.
+
+    With _bind=False no ports are bound and nothing is published: commands
+    are answered in-process by _DWX_SIM_Handle_() (see DWX_ZMQ_Replay.py).
+
+    Usage (from the v2.0.1/python folder):
+
+        python simulator/DWX_ZMQ_Server_Simulator.py --tick-rate 1000
+    --
+
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+import zmq
+import struct
+import numpy as np
+from zlib import crc32
+from threading import Thread
+from datetime import datetime, timezone
+from time import time, perf_counter
+
+##############################################################################
+
+# Symbols known to the simulated terminal:
+# {SYMBOL: (BASE_PRICE, SPREAD_POINTS, DIGITS, CONTRACT_SIZE)}
+SYMBOLS = {'EURUSD': (1.10000, 2, 5, 100000),
+           'GBPUSD': (1.27000, 3, 5, 100000),
+           'USDJPY': (108.000, 3, 3, 100000),
+           'AUDNZD': (1.04000, 5, 5, 100000),
+           'EURGBP': (0.86000, 3, 5, 100000),
+           'XAUUSD': (1500.00, 30, 2, 100),
+           'XTIUSD': (55.000, 3, 3, 1000),
+           'GDAXI': (12000.0, 10, 1, 1),
+           'NDX': (8000.00, 100, 2, 1),
+           'SPX500': (3000.0, 5, 1, 1),
+           'UK100': (7000.0, 10, 1, 1),
+           'STOXX50E': (3500.0, 20, 1, 1)}
+
+# Timeframes (minutes) as named by GetTimeframeText() in the server
+TIMEFRAMES = {1: 'M1', 5: 'M5', 15: 'M15', 30: 'M30', 60: 'H1',
+              240: 'H4', 1440: 'D1', 10080: 'W1', 43200: 'MN1'}
+
+_ORDER_TYPES_MARKET = (0, 1)    # OP_BUY, OP_SELL
+
+# Binary SUB payloads (same layout as the connector's DWX_ZMQ_Decoder)
+_SUB_TICK = struct.Struct('<2d')                # BID, ASK
+_SUB_TICK_TIME = struct.Struct('<2dq')          # BID, ASK, TIME
+_SUB_RATE = struct.Struct('<q4d3q')             # TIME, OPEN, HIGH, LOW, CLOSE, TICKVOL, SPREAD, REALVOL
+
+##############################################################################
+
+def _noise_(_key, _index):
+
+    """
+    Deterministic noise in [-1, 1) for integer (array) _index: splitmix64
+    of the index, seeded with _key.
+    """
+
+    with np.errstate(over='ignore'):
+        _z = np.asarray(_index, dtype=np.int64).astype(np.uint64) + np.uint64(_key)
+        _z = (_z + np.uint64(0x9E3779B97F4A7C15))
+        _z = (_z ^ (_z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        _z = (_z ^ (_z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        _z = _z ^ (_z >> np.uint64(31))
+
+    return (_z >> np.uint64(11)).astype(np.float64) / float(1 << 52) - 1.0
+
+##############################################################################
+
+def _weekday_(_times):
+
+    """
+    Day of the week (Monday = 0 .. Sunday = 6) of epoch seconds _times
+    (the epoch was a Thursday).
+    """
+
+    return (np.asarray(_times, dtype=np.int64) // 86400 + 3) % 7
+
+##############################################################################
+
+class DWX_ZMQ_Server_Simulator():
+
+    def __init__(self,
+                 _host='*',                 # Interface to bind to
+                 _protocol='tcp',           # Connection protocol
+                 _PUSH_PORT=32768,          # Port the client sends commands to
+                 _PULL_PORT=32769,          # Port the client receives responses on
+                 _PUB_PORT=32770,           # Port the client subscribes to
+                 _symbols=SYMBOLS,          # {SYMBOL: (BASE_PRICE, SPREAD_POINTS, DIGITS, CONTRACT_SIZE)}
+                 _tick_rate=10,             # Ticks per second and tracked symbol (0 = none)
+                 _tick_source=None,         # Iterable of (SYMBOL, BID, ASK) to replay instead
+                 _track_prices=(),          # Symbols tracked before any TRACK_PRICES command
+                 _max_orders=1,             # MaximumOrders input of the EA
+                 _max_lot_size=0.01,        # MaximumLotSize input of the EA
+                 _dma_mode=True,            # DMA_MODE input of the EA
+                 _tick_time=False,          # PUBLISH_TICK_TIME input of the EA
+                 _verbose=False,            # Print commands and responses
+                 _bind=True):               # Bind the ports and serve them from a thread
+
+        self._symbols = dict(_symbols)
+        self._tick_rate = _tick_rate
+        self._tick_source = iter(_tick_source) if _tick_source is not None else None
+        self._max_orders = _max_orders
+        self._max_lot_size = _max_lot_size
+        self._dma_mode = _dma_mode
+        self._tick_time = _tick_time
+        self._verbose = _verbose
+
+        # Tracked symbols and instruments, as set by TRACK_PRICES / TRACK_RATES
+        self._track_prices = [s for s in _track_prices if s in self._symbols]
+        self._track_rates = []      # [(INSTRUMENT, SYMBOL, TIMEFRAME)]
+
+        # Last published tick by symbol, and bar time by instrument
+        self._last_tick = {}
+        self._last_rate = {}
+
+        # Open orders: {TICKET: {'_magic': .., '_symbol': .., '_lots': .., ...}}
+        self._orders = {}
+        self._next_ticket = 10000001
+
+        # Correlation id of the command being processed
+        self._correlation_id = ''
+
+        # Market data format, as set by SUB_FORMAT
+        self._sub_binary = False
+
+        # Messages sent, for load tests
+        self._commands = 0
+        self._published = 0
+
+        self._ACTIVE = False
+        self._Server_Thread = None
+        self._ZMQ_CONTEXT = None
+
+        if not _bind:
+            return
+
+        _URL = _protocol + "://" + _host + ":"
+
+        self._ZMQ_CONTEXT = zmq.Context()
+
+        self._PUSH_SOCKET = self._ZMQ_CONTEXT.socket(zmq.PUSH)
+        self._PUSH_SOCKET.setsockopt(zmq.LINGER, 0)
+        self._PUSH_SOCKET.bind(_URL + str(_PULL_PORT))
+
+        self._PULL_SOCKET = self._ZMQ_CONTEXT.socket(zmq.PULL)
+        self._PULL_SOCKET.setsockopt(zmq.LINGER, 0)
+        self._PULL_SOCKET.bind(_URL + str(_PUSH_PORT))
+
+        self._PUB_SOCKET = self._ZMQ_CONTEXT.socket(zmq.PUB)
+        self._PUB_SOCKET.setsockopt(zmq.LINGER, 0)
+        self._PUB_SOCKET.bind(_URL + str(_PUB_PORT))
+
+        print("[SIM] Listening for commands (PULL): " + str(_PUSH_PORT))
+        print("[SIM] Sending responses (PUSH): " + str(_PULL_PORT))
+        print("[SIM] Publishing market data (PUB): " + str(_PUB_PORT))
+
+        self._ACTIVE = True
+
+        # Sockets are only ever used by this thread
+        self._Server_Thread = Thread(target=self._DWX_SIM_Loop_)
+        self._Server_Thread.daemon = True
+        self._Server_Thread.start()
+
+    ##########################################################################
+
+    def _DWX_SIM_SHUTDOWN_(self):
+
+        self._ACTIVE = False
+
+        if self._Server_Thread is None:
+            return
+
+        self._Server_Thread.join()
+
+        self._ZMQ_CONTEXT.destroy(0)
+        print("\n++ [SIM] Server simulator shut down ++")
+
+    ##########################################################################
+
+    def _DWX_SIM_Loop_(self):
+
+        _start = perf_counter()
+        _sent = 0
+
+        _poller = zmq.Poller()
+        _poller.register(self._PULL_SOCKET, zmq.POLLIN)
+
+        while self._ACTIVE:
+
+            # Ticks due since the start, at _tick_rate per second
+            _timeout = 100
+
+            if self._tick_rate > 0 and (self._track_prices or self._tick_source is not None):
+
+                _due = int((perf_counter() - _start) * self._tick_rate)
+
+                if _due > _sent:
+                    self._publish_ticks_(_due - _sent)
+                    _sent = _due
+
+                _timeout = min(_timeout, 1000.0 * (_sent + 1) / self._tick_rate
+                                         - 1000.0 * (perf_counter() - _start))
+            else:
+                _start, _sent = perf_counter(), 0
+
+            if self._track_rates:
+                self._publish_rates_()
+
+            if _poller.poll(max(0, _timeout)):
+
+                while True:
+                    try:
+                        msg = self._PULL_SOCKET.recv_string(zmq.NOBLOCK)
+                    except zmq.error.Again:
+                        break
+
+                    self._commands += 1
+
+                    _reply = self._DWX_SIM_Handle_(msg)
+
+                    if _reply is not None:
+                        if self._verbose:
+                            print('[SIM] {} -> {}'.format(msg, _reply[:200]))
+                        self._PUSH_SOCKET.send_string(_reply)
+
+    ##########################################################################
+
+    def _server_time_(self):
+        return int(time())
+
+    ##########################################################################
+
+    def _price_(self, _symbol, _times):
+
+        """
+        BID price of _symbol at _times (epoch seconds, scalar or array):
+        two slow cycles plus noise, rounded to the symbol's digits.
+        """
+
+        _base, _spread, _digits, _contract = self._symbols[_symbol]
+        _key = crc32(_symbol.encode())
+        _times = np.asarray(_times, dtype=np.int64)
+
+        _phase = (_key % 1000) / 1000.0 * 2 * np.pi
+        _cycle = (0.02 * np.sin(2 * np.pi * _times / (30 * 86400) + _phase)
+                  + 0.005 * np.sin(2 * np.pi * _times / 86400 + _phase)
+                  + 0.0005 * _noise_(_key, _times))
+
+        return np.round(_base * (1 + _cycle), _digits)
+
+    ##########################################################################
+
+    def _bid_ask_(self, _symbol):
+
+        _bid = float(self._price_(_symbol, self._server_time_()))
+        _base, _spread, _digits, _contract = self._symbols[_symbol]
+
+        # Sub-second movement, so that consecutive ticks differ
+        _bid = round(_bid + float(_noise_(self._published, perf_counter() * 1e6)) * 10 ** -_digits, _digits)
+
+        return _bid, round(_bid + _spread * 10 ** -_digits, _digits)
+
+    ##########################################################################
+
+    def _publish_ticks_(self, _n):
+
+        for _ in range(_n):
+
+            if self._tick_source is not None:
+                try:
+                    _symbol, _bid, _ask = next(self._tick_source)
+                except StopIteration:
+                    self._tick_source = None
+                    return
+                self._publish_tick_(_symbol, _bid, _ask)
+
+            else:
+                for _symbol in self._track_prices:
+                    self._publish_tick_(_symbol, *self._bid_ask_(_symbol))
+
+    ##########################################################################
+
+    def _publish_tick_(self, _symbol, _bid, _ask):
+
+        # Same format as GetBidAsk(): "%f;%f", only sent if it changed
+        _tick = '%f;%f' % (_bid, _ask)
+
+        if self._last_tick.get(_symbol) == _tick:
+            return
+
+        self._last_tick[_symbol] = _tick
+
+        if self._sub_binary:
+            self._PUB_SOCKET.send(_symbol.encode(), zmq.SNDMORE)
+            if self._tick_time:
+                self._PUB_SOCKET.send(_SUB_TICK_TIME.pack(_bid, _ask, self._server_time_()))
+            else:
+                self._PUB_SOCKET.send(_SUB_TICK.pack(_bid, _ask))
+        elif self._tick_time:
+            self._PUB_SOCKET.send_string('%s %s;%u' % (_symbol, _tick, self._server_time_()))
+        else:
+            self._PUB_SOCKET.send_string('%s %s' % (_symbol, _tick))
+
+        self._published += 1
+
+    ##########################################################################
+
+    def _publish_rates_(self):
+
+        _now = self._server_time_()
+
+        for _instrument, _symbol, _timeframe in self._track_rates:
+
+            _time = self._bar_open_(_timeframe, _now)
+
+            # New bar: publish it as it opens, as OnTick() does
+            if _time > self._last_rate.get(_instrument, 0):
+
+                self._last_rate[_instrument] = _time
+                _price = float(self._price_(_symbol, _time))
+
+                _rate = (_time, _price, _price, _price, _price, 1, self._symbols[_symbol][1], 0)
+
+                if self._sub_binary:
+                    self._PUB_SOCKET.send(_instrument.encode(), zmq.SNDMORE)
+                    self._PUB_SOCKET.send(_SUB_RATE.pack(*_rate))
+                else:
+                    self._PUB_SOCKET.send_string('%s %u;%f;%f;%f;%f;%d;%d;%d' % ((_instrument,) + _rate))
+
+                self._published += 1
+
+    ##########################################################################
+
+    def _bar_open_(self, _timeframe, _time):
+
+        """
+        Open time (epoch seconds) of the _timeframe bar containing _time.
+        """
+
+        if _timeframe == 43200:
+            return int(np.datetime64(_time, 's').astype('datetime64[M]').astype('datetime64[s]').astype(np.int64))
+
+        # Weekly bars open on Sundays (the epoch was a Thursday)
+        _offset = 4 * 86400 if _timeframe == 10080 else 0
+
+        return _time - (_time + _offset) % (60 * _timeframe)
+
+    ##########################################################################
+
+    def _bar_times_(self, _timeframe, _start, _end):
+
+        """
+        Open times (epoch seconds) of the _timeframe bars opening in
+        [_start, _end].
+        """
+
+        if _timeframe == 43200:
+            _times = np.arange(np.datetime64(_start, 's').astype('datetime64[M]'),
+                               np.datetime64(_end, 's').astype('datetime64[M]') + 1)
+            _times = _times.astype('datetime64[s]').astype(np.int64)
+
+        else:
+            _first = self._bar_open_(_timeframe, _start)
+            _times = np.arange(_first, _end + 1, 60 * _timeframe, dtype=np.int64)
+
+            # No intraday / daily bars on weekends
+            if _timeframe <= 1440:
+                _times = _times[_weekday_(_times) < 5]
+
+        return _times[(_times >= _start) & (_times <= _end)]
+
+    ##########################################################################
+
+    def _DWX_SIM_Handle_(self, msg):
+
+        """
+        Returns the response to the command msg, None if it has none.
+        """
+
+        # Strip the optional correlation id: "#ID;COMMAND;..."
+        self._correlation_id = ''
+
+        if msg.startswith('#') and ';' in msg:
+            self._correlation_id, msg = msg[1:].split(';', 1)
+
+        # components[11] in MessageHandler()
+        _comp = msg.split(';')
+        _comp += [''] * (11 - len(_comp))
+
+        _reply = None
+
+        if _comp[0] == 'HEARTBEAT':
+            _reply = "{'_action': 'heartbeat', '_response': 'loud and clear!'}"
+
+        elif _comp[0] == 'TRADE':
+
+            _handler = {'OPEN': self._open_order_,
+                        'MODIFY': self._modify_order_,
+                        'CLOSE': self._close_order_,
+                        'CLOSE_PARTIAL': self._close_partial_,
+                        'CLOSE_MAGIC': self._close_magic_,
+                        'CLOSE_ALL': self._close_all_,
+                        'GET_OPEN_TRADES': self._get_open_orders_}.get(_comp[1])
+
+            if _handler is not None:
+                _reply = '{' + _handler(_comp) + '}'
+
+        elif _comp[0] == 'HIST':
+            _reply = '{' + self._get_hist_(_comp) + '}'
+
+        elif _comp[0] == 'TRACK_PRICES':
+            _reply = '{' + self._track_prices_(msg.split(';')[1:]) + '}'
+
+        elif _comp[0] == 'TRACK_RATES':
+            _reply = '{' + self._track_rates_(msg.split(';')[1:]) + '}'
+
+        elif _comp[0] == 'SUB_FORMAT':
+            _reply = '{' + self._sub_format_(_comp[1]) + '}'
+
+        # Echo the correlation id, as InformPullClient() does
+        if _reply is not None and self._correlation_id:
+            _reply = "{'_id': '" + self._correlation_id + "', " + _reply[1:]
+
+        return _reply
+
+    ##########################################################################
+
+    def _time_str_(self, _time, _seconds=True):
+        return datetime.fromtimestamp(_time, timezone.utc).strftime(
+            '%Y.%m.%d %H:%M:%S' if _seconds else '%Y.%m.%d %H:%M')
+
+    ##########################################################################
+
+    def _to_time_(self, _str):
+
+        # StrToTime() accepts "yyyy.mm.dd [hh:mi[:ss]]"
+        for _fmt in ('%Y.%m.%d %H:%M:%S', '%Y.%m.%d %H:%M', '%Y.%m.%d'):
+            try:
+                return int(datetime.strptime(_str.strip(), _fmt).replace(tzinfo=timezone.utc).timestamp())
+            except ValueError:
+                pass
+
+        return 0
+
+    ##########################################################################
+
+    def _to_float_(self, _str):
+        try:
+            return float(_str)
+        except ValueError:
+            return 0.0
+
+    def _to_int_(self, _str):
+        try:
+            return int(float(_str))
+        except ValueError:
+            return 0
+
+    ##########################################################################
+
+    def _stops_(self, _order, _SL, _TP):
+
+        # SL / TP are distances in points from the open price
+        _base, _spread, _digits, _contract = self._symbols[_order['_symbol']]
+        _point = 10 ** -_digits
+        _dir = 1 if _order['_type'] in (0, 2, 4) else -1
+
+        return (round(_order['_open_price'] - _SL * _dir * _point, _digits),
+                round(_order['_open_price'] + _TP * _dir * _point, _digits))
+
+    ##########################################################################
+
+    def _open_order_(self, _comp):
+
+        _ret = "'_action': 'EXECUTION'"
+
+        _symbol = _comp[3] if _comp[3] != 'NULL' else next(iter(self._symbols))
+        _type = self._to_int_(_comp[2])
+        _lots = self._to_float_(_comp[8])
+        _SL, _TP = self._to_int_(_comp[5]), self._to_int_(_comp[6])
+        _magic = self._to_int_(_comp[9])
+
+        if _lots > self._max_lot_size:
+            return _ret + ", '_response': 'LOT_SIZE_ERROR', 'response_value': 'MAX_LOT_SIZE_EXCEEDED'"
+
+        if len(self._orders) >= self._max_orders:
+            return _ret + ", '_response': 'NUM_ORDERS_ERROR', 'response_value': 'MAX_NUMBER_OF_ORDERS_EXCEEDED'"
+
+        if _symbol not in self._symbols:
+            return _ret + ", '_response': '4106', 'response_value': 'unknown symbol'"
+
+        _bid, _ask = self._bid_ask_(_symbol)
+        _price = _ask if _type == 0 else _bid if _type == 1 else self._to_float_(_comp[4])
+
+        _ticket = self._next_ticket
+        self._next_ticket += 1
+
+        _order = self._orders[_ticket] = {'_magic': _magic,
+                                          '_symbol': _symbol,
+                                          '_lots': _lots,
+                                          '_type': _type,
+                                          '_open_price': _price,
+                                          '_open_time': self._server_time_(),
+                                          '_SL': 0.0,
+                                          '_TP': 0.0,
+                                          '_comment': _comp[7]}
+
+        _ret += ", '_symbol': '%s', '_magic': %d, '_ticket': %d, '_open_time': '%s', '_open_price': %.8f" % (
+            _symbol, _magic, _ticket, self._time_str_(_order['_open_time']), _price)
+
+        # Stops are only sent with the order in non-DMA mode, and then not reported
+        if not self._dma_mode:
+            _order['_SL'], _order['_TP'] = self._stops_(_order, _SL, _TP)
+
+        elif _SL != 0 or _TP != 0:
+            _order['_SL'], _order['_TP'] = self._stops_(_order, _SL, _TP)
+            _ret += ", '_sl': %.8f, '_tp': %.8f" % (_order['_SL'], _order['_TP'])
+
+        return _ret
+
+    ##########################################################################
+
+    def _modify_order_(self, _comp):
+
+        _ret = "'_action': 'MODIFY'"
+        _order = self._orders.get(self._to_int_(_comp[10]))
+
+        if _order is None:
+            return _ret + ", '_response': 'NOT_FOUND'"
+
+        if _order['_type'] not in _ORDER_TYPES_MARKET and self._to_float_(_comp[4]) != 0.0:
+            _order['_open_price'] = self._to_float_(_comp[4])
+
+        _order['_SL'], _order['_TP'] = self._stops_(_order,
+                                                    self._to_float_(_comp[5]),
+                                                    self._to_float_(_comp[6]))
+
+        return _ret + ", '_sl': %.8f, '_tp': %.8f" % (_order['_SL'], _order['_TP'])
+
+    ##########################################################################
+
+    def _close_price_(self, _order):
+
+        _bid, _ask = self._bid_ask_(_order['_symbol'])
+
+        return _bid if _order['_type'] == 0 else _ask
+
+    ##########################################################################
+
+    def _close_at_market_(self, _ticket, _lots=-1):
+
+        _order = self._orders[_ticket]
+        _price = self._close_price_(_order)
+
+        if _lots < 0.01 or _lots > _order['_lots']:
+            _lots = _order['_lots']
+
+        del self._orders[_ticket]
+
+        # The remainder of a partial close is a new order, as in MetaTrader
+        if round(_order['_lots'] - _lots, 2) > 0:
+            _remainder = dict(_order, _lots=round(_order['_lots'] - _lots, 2),
+                              _comment='from #%d' % _ticket)
+            self._orders[self._next_ticket] = _remainder
+            self._next_ticket += 1
+
+        return ", '_close_price': %.8f, '_close_lots': %.8f" % (_price, _lots)
+
+    ##########################################################################
+
+    def _close_order_(self, _comp):
+
+        _ticket = self._to_int_(_comp[10])
+        _ret = "'_action': 'CLOSE', '_ticket': %d" % _ticket
+
+        if _ticket not in self._orders:
+            return _ret + ", '_response': 'NOT_FOUND'"
+
+        if self._orders[_ticket]['_type'] in _ORDER_TYPES_MARKET:
+            _ret += self._close_at_market_(_ticket) + ", '_response': 'CLOSE_MARKET'"
+        else:
+            del self._orders[_ticket]
+            _ret += ", '_response': 'CLOSE_PENDING'"
+
+        return _ret + ", '_response_value': 'SUCCESS'"
+
+    ##########################################################################
+
+    def _close_partial_(self, _comp):
+
+        _ticket = self._to_int_(_comp[10])
+        _ret = "'_action': 'CLOSE', '_ticket': %d" % _ticket
+
+        if _ticket not in self._orders:
+            return _ret + ", '_response': 'CLOSE_PARTIAL_FAILED'"
+
+        _ret += ", '_response': 'CLOSE_PARTIAL'"
+
+        if self._orders[_ticket]['_type'] not in _ORDER_TYPES_MARKET:
+            return _ret
+
+        return _ret + self._close_at_market_(_ticket, self._to_float_(_comp[8]))
+
+    ##########################################################################
+
+    def _close_many_(self, _tickets, _with_magic):
+
+        _responses = []
+
+        for _ticket in _tickets:
+
+            _order = self._orders[_ticket]
+            _ret = "%d: {'_symbol':'%s'" % (_ticket, _order['_symbol'])
+
+            if _with_magic:
+                _ret += ", '_magic': %d" % _order['_magic']
+
+            if _order['_type'] in _ORDER_TYPES_MARKET:
+                _ret += self._close_at_market_(_ticket) + ", '_response': 'CLOSE_MARKET'"
+            else:
+                del self._orders[_ticket]
+                _ret += ", '_response': 'CLOSE_PENDING'"
+
+            _responses.append(_ret + '}')
+
+        _ret = ", '_responses': {" + ', '.join(_responses) + "}"
+
+        if len(_tickets) == 0:
+            return _ret + ", '_response': 'NOT_FOUND'"
+
+        return _ret + ", '_response_value': 'SUCCESS'"
+
+    ##########################################################################
+
+    def _close_magic_(self, _comp):
+
+        _magic = self._to_int_(_comp[9])
+
+        # Newest first, as the server loops from OrdersTotal()-1 down
+        _tickets = [t for t in reversed(list(self._orders))
+                    if self._orders[t]['_magic'] == _magic]
+
+        return ("'_action': 'CLOSE_ALL_MAGIC', '_magic': %d" % _magic
+                + self._close_many_(_tickets, False))
+
+    ##########################################################################
+
+    def _close_all_(self, _comp):
+
+        return "'_action': 'CLOSE_ALL'" + self._close_many_(list(reversed(list(self._orders))), True)
+
+    ##########################################################################
+
+    def _get_open_orders_(self, _comp):
+
+        _trades = []
+
+        for _ticket in reversed(list(self._orders)):
+
+            _order = self._orders[_ticket]
+            _dir = 1 if _order['_type'] in (0, 2, 4) else -1
+            _pnl = 0.0
+
+            # P&L in quote currency
+            if _order['_type'] in _ORDER_TYPES_MARKET:
+                _pnl = round((self._close_price_(_order) - _order['_open_price'])
+                             * _dir * _order['_lots'] * self._symbols[_order['_symbol']][3], 2)
+
+            _trades.append("%d: {'_magic': %d, '_symbol': '%s', '_lots': %.8f, '_type': %d, "
+                           "'_open_price': %.8f, '_open_time': '%s', '_SL': %.8f, '_TP': %.8f, "
+                           "'_pnl': %.8f, '_comment': '%s'}" % (
+                               _ticket, _order['_magic'], _order['_symbol'], _order['_lots'],
+                               _order['_type'], _order['_open_price'],
+                               self._time_str_(_order['_open_time']),
+                               _order['_SL'], _order['_TP'], _pnl, _order['_comment']))
+
+        return "'_action': 'OPEN_TRADES', '_trades': {" + ', '.join(_trades) + "}"
+
+    ##########################################################################
+
+    def _get_hist_(self, _comp):
+
+        # HIST;SYMBOL;TIMEFRAME;START_DATETIME;END_DATETIME
+        _symbol = _comp[1]
+        _timeframe = self._to_int_(_comp[2])
+
+        _ret = "'_action': 'HIST', '_symbol': '%s_%s'" % (_symbol, TIMEFRAMES.get(_timeframe, 'UNKNOWN'))
+
+        _start, _end = self._to_time_(_comp[3]), self._to_time_(_comp[4])
+
+        if (_symbol not in self._symbols or _timeframe not in TIMEFRAMES
+            or _start == 0 or _end < _start):
+            return _ret + ", '_response': 'NOT_AVAILABLE'"
+
+        # No bars in the future
+        _times = self._bar_times_(_timeframe, _start, min(_end, self._server_time_()))
+
+        if len(_times) == 0:
+            return _ret + ", '_response': 'NOT_AVAILABLE'"
+
+        _base, _spread, _digits, _contract = self._symbols[_symbol]
+        _key = crc32((_symbol + str(_timeframe)).encode())
+
+        _open = self._price_(_symbol, _times)
+        _close = self._price_(_symbol, _times + 60 * _timeframe - 1)
+        _range = np.abs(_noise_(_key, _times)) * _base * 0.0005 * np.sqrt(_timeframe)
+        _high = np.round(np.maximum(_open, _close) + _range, _digits)
+        _low = np.round(np.minimum(_open, _close) - _range, _digits)
+        _tick_vol = (1 + np.abs(_noise_(_key + 1, _times)) * 30 * _timeframe).astype(np.int64)
+
+        _bars = ["{'time':'%s', 'open':%.8f, 'high':%.8f, 'low':%.8f, 'close':%.8f, "
+                 "'tick_volume':%d, 'spread':%d, 'real_volume':0}" % (
+                     self._time_str_(_t, False), _o, _h, _l, _c, _v, _spread)
+                 for _t, _o, _h, _l, _c, _v in zip(_times.tolist(), _open.tolist(),
+                                                    _high.tolist(), _low.tolist(),
+                                                    _close.tolist(), _tick_vol.tolist())]
+
+        return _ret + ", '_data': [" + ', '.join(_bars) + "]"
+
+    ##########################################################################
+
+    def _sub_format_(self, _format):
+
+        if _format in ('BINARY', 'TEXT'):
+            self._sub_binary = (_format == 'BINARY')
+            _ret = "'_action': 'SUB_FORMAT'"
+        else:
+            _ret = "'_action': 'SUB_FORMAT', '_response': 'NOT_AVAILABLE'"
+
+        return _ret + ", '_format': '%s'" % ('BINARY' if self._sub_binary else 'TEXT')
+
+    ##########################################################################
+
+    def _track_prices_(self, _symbols):
+
+        _ret = "'_action': 'TRACK_PRICES'"
+
+        if len(_symbols) == 0:
+            self._track_prices = []
+            return _ret + ", '_data': {'symbol_count': 0}"
+
+        self._track_prices = [s for s in _symbols if s in self._symbols]
+        self._last_tick = {}
+        _errors = ', '.join("'%s'" % s for s in _symbols if s not in self._symbols)
+
+        return _ret + ", '_data': {'symbol_count':%d, 'error_symbols':[%s]}" % (len(_symbols), _errors)
+
+    ##########################################################################
+
+    def _track_rates_(self, _args):
+
+        _ret = "'_action': 'TRACK_RATES'"
+        _count = len(_args) // 2
+
+        if _count == 0:
+            self._track_rates = []
+            return _ret + ", '_data': {'instrument_count': 0}"
+
+        self._track_rates = []
+        self._last_rate = {}
+        _errors = []
+
+        for _symbol, _timeframe in zip(_args[0::2], _args[1::2]):
+
+            if _symbol in self._symbols:
+                _timeframe = self._to_int_(_timeframe)
+                self._track_rates.append((_symbol + '_' + TIMEFRAMES.get(_timeframe, 'UNKNOWN'),
+                                          _symbol, _timeframe if _timeframe in TIMEFRAMES else 1))
+            else:
+                _errors.append("'%s'" % _symbol)
+
+        return _ret + ", '_data': {'instrument_count':%d, 'error_symbols':[%s]}" % (_count, ', '.join(_errors))
+
+    ##########################################################################
+
+##############################################################################
+
+def _check_calendar_():
+
+    """
+    Checks that a week of D1 bars (HIST for 2020.01.05 - 2020.01.12, Sunday
+    to Sunday) opens Monday to Friday, and that W1 bars open on Sundays.
+    Raises AssertionError otherwise.
+    """
+
+    _sim = DWX_ZMQ_Server_Simulator(_bind=False)
+
+    _start = int(np.datetime64('2020-01-05', 's').astype(np.int64))
+    _days = _sim._bar_times_(1440, _start, _start + 7 * 86400)
+
+    _expected = np.arange('2020-01-06', '2020-01-11', dtype='datetime64[D]')
+
+    assert np.array_equal(_days.astype('datetime64[s]').astype('datetime64[D]'), _expected), \
+        'D1 bars open on {}'.format(_days.astype('datetime64[s]'))
+
+    assert _weekday_(_sim._bar_open_(10080, _start + 3 * 86400)) == 6, 'W1 bars do not open on Sundays'
+
+##############################################################################
+
+def _read_ticks_(_path):
+
+    """
+    Ticks to replay from a CSV file with SYMBOL,BID,ASK rows.
+    """
+
+    with open(_path) as _file:
+        for _line in _file:
+            _fields = _line.strip().split(',')
+            if len(_fields) >= 3:
+                try:
+                    yield _fields[0], float(_fields[1]), float(_fields[2])
+                except ValueError:
+                    pass # header
+
+##############################################################################
+
+if __name__ == "__main__":
+
+    import sys
+    import argparse
+    from time import sleep
+
+    _parser = argparse.ArgumentParser(description='DWX ZeroMQ MT4 server simulator')
+    _parser.add_argument('--host', default='*')
+    _parser.add_argument('--push-port', type=int, default=32768)
+    _parser.add_argument('--pull-port', type=int, default=32769)
+    _parser.add_argument('--pub-port', type=int, default=32770)
+    _parser.add_argument('--tick-rate', type=float, default=10,
+                         help='ticks per second and tracked symbol (messages per second with --ticks)')
+    _parser.add_argument('--ticks', help='CSV file of SYMBOL,BID,ASK rows to replay')
+    _parser.add_argument('--track', nargs='*', default=[], help='symbols tracked from the start')
+    _parser.add_argument('--max-orders', type=int, default=1)
+    _parser.add_argument('--max-lot-size', type=float, default=0.01)
+    _parser.add_argument('--tick-time', action='store_true', help='publish tick times (PUBLISH_TICK_TIME)')
+    _parser.add_argument('--verbose', action='store_true')
+    _parser.add_argument('--check', action='store_true', help='check the bar calendar and exit')
+    _args = _parser.parse_args()
+
+    if _args.check:
+        _check_calendar_()
+        print('[SIM] Calendar OK: D1 bars Monday to Friday, W1 bars from Sunday')
+        sys.exit(0)
+
+    _sim = DWX_ZMQ_Server_Simulator(_host=_args.host,
+                                    _PUSH_PORT=_args.push_port,
+                                    _PULL_PORT=_args.pull_port,
+                                    _PUB_PORT=_args.pub_port,
+                                    _tick_rate=_args.tick_rate,
+                                    _tick_source=_read_ticks_(_args.ticks) if _args.ticks else None,
+                                    _track_prices=_args.track,
+                                    _max_orders=_args.max_orders,
+                                    _max_lot_size=_args.max_lot_size,
+                                    _tick_time=_args.tick_time,
+                                    _verbose=_args.verbose)
+
+    try:
+        while True:
+            sleep(1)
+    except KeyboardInterrupt:
+        _sim._DWX_SIM_SHUTDOWN_()
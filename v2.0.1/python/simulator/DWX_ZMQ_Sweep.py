@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+    DWX_ZMQ_Sweep.py
+
+    Parameter sweeps of a DWX_ZMQ_Strategy subclass over recorded ticks:
+    every combination of a parameter grid is replayed (DWX_ZMQ_Replay) in
+    a pool of processes, and the metrics of each run are collected in one
+    DataFrame, e.g.:
+
+        _sweep = DWX_ZMQ_Sweep('my_strategies.breakout:breakout',
+                               {'_window': [50, 100, 200], '_threshold': [1, 2]},
+                               _path='journal',
+                               _replay_kwargs={'_track_prices': ['EURUSD']})
+
+        _results = _sweep._run_()
+
+    Workers memory-map the journal's tick files (DWX_ZMQ_Journal.ticks()):
+    the operating system shares their pages between processes instead of
+    each worker loading its own copy.
+
+    The strategy (a class, or 'module:Class') must be importable by the
+    workers and accept _zmq (a DWX_ZMQ_Replay_Connector) plus the grid's
+    parameters as keyword arguments. Each run calls its _start method,
+    replays the ticks, then calls its _stop method (if it has one).
+
+    Usage (from the v2.0.1/python folder):
+
+        python -m simulator.DWX_ZMQ_Sweep module:Class --grid '{"_delay": [0, 0.1]}'
+            --journal journal --start run --output results.csv
+    --
+
+    @author: Darwinex Labs (www.darwinex.com)
+
+    Copyright (c) 2019 onwards, Darwinex. All rights reserved.
+
+    Licensed under the BSD 3-Clause License, you may not use this file except
+    in compliance with the License.
+
+    You may obtain a copy of the License at:
+    https://opensource.org/licenses/BSD-3-Clause
+"""
+
+# Append path for main project folder
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import io
+import numpy as np
+from importlib import import_module
+from itertools import product
+from contextlib import redirect_stdout
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+from pandas import DataFrame
+
+from api.DWX_ZMQ_Journal import DWX_ZMQ_Journal
+from simulator.DWX_ZMQ_Replay import DWX_ZMQ_Replay_Connector
+
+##############################################################################
+
+def _strategy_class_(_strategy):
+
+    if not isinstance(_strategy, str):
+        return _strategy
+
+    _module, _name = _strategy.split(':')
+
+    return getattr(import_module(_module), _name)
+
+##############################################################################
+
+def _metrics_(_zmq, _seconds):
+
+    """
+    Metrics of one run, from the trades closed during the replay (in the
+    account currency, as the P&L of DWX_ZMQ_Replay_Server).
+    """
+
+    _trades = _zmq._DWX_REPLAY_TRADES_()
+    _pnl = _trades['_pnl'].to_numpy() if len(_trades) > 0 else np.zeros(0)
+
+    _gains = _pnl[_pnl > 0].sum()
+    _losses = -_pnl[_pnl < 0].sum()
+
+    # Drawdown of the closed trades' cumulative P&L, from 0
+    _equity = np.concatenate(([0.0], np.cumsum(_pnl)))
+
+    return {'trades': len(_pnl),
+            'pnl': float(_pnl.sum()),
+            'win_rate': float((_pnl > 0).mean()) if len(_pnl) else float('nan'),
+            'avg_pnl': float(_pnl.mean()) if len(_pnl) else float('nan'),
+            'profit_factor': float(_gains / _losses) if _losses > 0 else float('nan'),
+            'max_drawdown': float((np.maximum.accumulate(_equity) - _equity).max()),
+            'open_trades': len(_zmq._server._orders),
+            'ticks': _zmq._replayed,
+            'seconds': _seconds}
+
+##############################################################################
+
+def _sweep_run_(_strategy, _params, _path, _days, _replay_kwargs,
+                _start, _stop, _metrics, _timeout, _quiet):
+
+    """
+    One run of the sweep (in a worker process): returns the parameters
+    and the run's metrics, or the error it raised.
+    """
+
+    _row = dict(_params)
+    _output = io.StringIO() if _quiet else sys.stdout
+
+    try:
+        with redirect_stdout(_output):
+
+            _journal = DWX_ZMQ_Journal(_path)
+            _ticks = [_journal.ticks(_day) for _day in _days]
+
+            _zmq = DWX_ZMQ_Replay_Connector(_ticks, **_replay_kwargs)
+
+            try:
+                _instance = _strategy_class_(_strategy)(_zmq=_zmq, **_params)
+
+                _begin = perf_counter()
+
+                getattr(_instance, _start)()
+                _zmq._DWX_REPLAY_START_()
+
+                if not _zmq._DWX_REPLAY_WAIT_(_timeout):
+                    _row['error'] = 'timeout'
+
+                elif _zmq._replay_error is not None:
+                    _ex = _zmq._replay_error
+                    _row['error'] = '{}: {}'.format(type(_ex).__name__, _ex)
+
+                if _stop is not None and hasattr(_instance, _stop):
+                    getattr(_instance, _stop)()
+
+                _row.update(_metrics_(_zmq, perf_counter() - _begin))
+
+                if _metrics is not None:
+                    _row.update(_metrics(_instance, _zmq))
+
+            finally:
+                _zmq._DWX_ZMQ_SHUTDOWN_()
+
+    except Exception as ex:
+        _row['error'] = '{}: {}'.format(type(ex).__name__, ex)
+
+    return _row
+
+##############################################################################
+
+class DWX_ZMQ_Sweep():
+
+    def __init__(self,
+                 _strategy,                 # DWX_ZMQ_Strategy subclass, or 'module:Class'
+                 _grid,                     # {PARAMETER: [VALUES]} or [{PARAMETER: VALUE}, ..]
+                 _path='journal',           # DWX_ZMQ_Journal folder
+                 _days=None,                # Days to replay (None = all in the journal)
+                 _processes=None,           # Worker processes (None = one per CPU)
+                 _replay_kwargs=None,       # DWX_ZMQ_Replay_Connector arguments
+                 _start='_run_',            # Strategy method starting it
+                 _stop='_stop_',            # Strategy method stopping it (skipped if missing)
+                 _metrics=None,             # Callable(strategy, zmq) -> {METRIC: VALUE}, picklable
+                 _timeout=None,             # Max. seconds per replay
+                 _quiet=True):              # Discard what runs print
+
+        self._strategy = _strategy
+        self._grid = _grid
+        self._path = _path
+        self._days = _days
+        self._processes = _processes
+        self._replay_kwargs = dict(_replay_kwargs or {})
+        self._start = _start
+        self._stop = _stop
+        self._metrics = _metrics
+        self._timeout = _timeout
+        self._quiet = _quiet
+
+    ##########################################################################
+
+    def _combinations_(self):
+
+        if isinstance(self._grid, dict):
+            _names = list(self._grid)
+            return [dict(zip(_names, _values))
+                    for _values in product(*(self._grid[_name] for _name in _names))]
+
+        return [dict(_params) for _params in self._grid]
+
+    ##########################################################################
+
+    def _run_(self, _on_result=None):
+
+        """
+        Runs every combination and returns their metrics, one row per
+        combination (in grid order). _on_result(ROW) is called as runs
+        complete, e.g. to report progress.
+        """
+
+        _days = self._days
+
+        if _days is None:
+            _days = DWX_ZMQ_Journal(self._path).days()
+
+        _combinations = self._combinations_()
+        _rows = [None] * len(_combinations)
+
+        # Not forked: the parent may have ZeroMQ contexts and threads
+        with ProcessPoolExecutor(self._processes, mp_context=get_context('spawn')) as _pool:
+
+            _futures = {_pool.submit(_sweep_run_, self._strategy, _params, self._path, _days,
+                                     self._replay_kwargs, self._start, self._stop,
+                                     self._metrics, self._timeout, self._quiet): _i
+                        for _i, _params in enumerate(_combinations)}
+
+            for _future in as_completed(_futures):
+
+                _row = _rows[_futures[_future]] = _future.result()
+
+                if _on_result is not None:
+                    _on_result(_row)
+
+        return DataFrame(_rows)
+
+##############################################################################
+
+if __name__ == "__main__":
+
+    import json
+    import argparse
+
+    _parser = argparse.ArgumentParser(description='DWX ZeroMQ strategy parameter sweep')
+    _parser.add_argument('strategy', help='module:Class of the DWX_ZMQ_Strategy subclass')
+    _parser.add_argument('--grid', required=True, help='JSON {PARAMETER: [VALUES]}')
+    _parser.add_argument('--journal', default='journal', help='DWX_ZMQ_Journal folder')
+    _parser.add_argument('--days', nargs='*', help='days to replay (YYYYMMDD, default: all)')
+    _parser.add_argument('--processes', type=int)
+    _parser.add_argument('--speed', type=float, help='replay speed (default: as fast as possible)')
+    _parser.add_argument('--track', nargs='*', default=[], help='symbols tracked from the start')
+    _parser.add_argument('--start', default='_run_')
+    _parser.add_argument('--stop', default='_stop_')
+    _parser.add_argument('--timeout', type=float)
+    _parser.add_argument('--output', help='write results to this CSV file')
+    _args = _parser.parse_args()
+
+    _sweep = DWX_ZMQ_Sweep(_args.strategy,
+                           json.loads(_args.grid),
+                           _path=_args.journal,
+                           _days=_args.days,
+                           _processes=_args.processes,
+                           _replay_kwargs={'_speed': _args.speed, '_track_prices': _args.track},
+                           _start=_args.start,
+                           _stop=_args.stop,
+                           _timeout=_args.timeout)
+
+    _results = _sweep._run_(lambda _row: print('[SWEEP] {}'.format(_row)))
+
+    print(_results.to_string())
+
+    if _args.output:
+        _results.to_csv(_args.output, index=False)